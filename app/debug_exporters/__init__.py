@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from exporters import DataExporter
+
+
+class DebugConfig:
+    enabled: bool
+    max_profile_seconds: float
+    sample_interval_seconds: float
+    tracemalloc_frames: int
+
+    def __init__(self, enabled: bool = False, max_profile_seconds: float = 60, sample_interval_seconds: float = 0.005,
+                 tracemalloc_frames: int = 1):
+        if max_profile_seconds is None or max_profile_seconds <= 0:
+            raise ValueError("max_profile_seconds must be positive")
+        if sample_interval_seconds is None or sample_interval_seconds <= 0:
+            raise ValueError("sample_interval_seconds must be positive")
+        if tracemalloc_frames is None or tracemalloc_frames < 1:
+            raise ValueError("tracemalloc_frames must be at least 1")
+        self.enabled = enabled
+        self.max_profile_seconds = max_profile_seconds
+        self.sample_interval_seconds = sample_interval_seconds
+        self.tracemalloc_frames = tracemalloc_frames
+
+    @staticmethod
+    def from_env():
+        return DebugConfig(
+            enabled=os.getenv('DEBUG_ENDPOINTS_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes'),
+            max_profile_seconds=float(os.getenv('DEBUG_PROFILE_MAX_SECONDS', '60').strip()),
+            sample_interval_seconds=float(os.getenv('DEBUG_PROFILE_INTERVAL_MS', '5').strip()) / 1000,
+            tracemalloc_frames=int(os.getenv('DEBUG_TRACEMALLOC_FRAMES', '1').strip())
+        )
+
+
+class StackSampler:
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._stacks = Counter()
+        self._samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def get_samples(self) -> int:
+        return self._samples
+
+    def get_stacks(self) -> Counter:
+        return self._stacks
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self._interval):
+            self._samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame) -> tuple:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+
+def format_collapsed(stacks: Counter) -> str:
+    return ''.join(f'{";".join(stack)} {count}\n' for stack, count in stacks.most_common())
+
+
+def format_top(stacks: Counter, samples: int, interval: float) -> str:
+    own = Counter()
+    cumulative = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for function in set(stack):
+            cumulative[function] += count
+    lines = [f'{samples} samples every {interval * 1000:g} ms across all threads',
+             '',
+             f'{"own":>8} {"cumulative":>11}  function']
+    for function, count in cumulative.most_common():
+        lines.append(f'{own[function]:>8} {count:>11}  {function}')
+    return '\n'.join(lines) + '\n'
+
+
+class ProfileDataExporter(DataExporter):
+
+    def __init__(self, config: DebugConfig):
+        self._name = self.__class__.__name__
+        self._logger = logging.getLogger(self._name)
+        self._config = config
+        self._lock = threading.Lock()
+
+    def export(self):
+        return self._profile(1.0, 'top')
+
+    def export_request(self, request):
+        try:
+            seconds = float(request.query_params.get('seconds', '10'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail='seconds must be a number')
+        if seconds <= 0 or seconds > self._config.max_profile_seconds:
+            raise HTTPException(status_code=400,
+                                detail=f'seconds must be between 0 and {self._config.max_profile_seconds}')
+        output_format = request.query_params.get('format', 'collapsed')
+        if output_format not in ('collapsed', 'top'):
+            raise HTTPException(status_code=400, detail='format must be collapsed or top')
+        return self._profile(seconds, output_format)
+
+    async def _profile(self, seconds: float, output_format: str):
+        if not self._lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail='A profile is already running')
+        try:
+            self._logger.info('Profiling all threads for %s seconds', seconds)
+            sampler = StackSampler(self._config.sample_interval_seconds)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                sampler.stop()
+        finally:
+            self._lock.release()
+        if output_format == 'top':
+            return PlainTextResponse(format_top(sampler.get_stacks(), sampler.get_samples(),
+                                                self._config.sample_interval_seconds))
+        return PlainTextResponse(format_collapsed(sampler.get_stacks()))
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return '/debug/profile'
+
+    def get_export_endpoint_response_class(self):
+        return PlainTextResponse
+
+
+class MemoryDataExporter(DataExporter):
+
+    def __init__(self, config: DebugConfig):
+        self._name = self.__class__.__name__
+        self._logger = logging.getLogger(self._name)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(config.tracemalloc_frames)
+        self._reset_baseline()
+
+    def export(self):
+        return self._export(25, False)
+
+    def export_request(self, request):
+        try:
+            limit = int(request.query_params.get('limit', '25'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail='limit must be an integer')
+        reset = request.query_params.get('reset', 'false').lower() in ('1', 'true', 'yes')
+        return self._export(limit, reset)
+
+    def _export(self, limit: int, reset: bool):
+        snapshot = self._take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            'traced_memory_bytes': current,
+            'peak_traced_memory_bytes': peak,
+            'baseline_age_seconds': round(time.monotonic() - self._baseline_time, 3),
+            'top': [{
+                'location': str(stat.traceback),
+                'size_bytes': stat.size,
+                'count': stat.count
+            } for stat in snapshot.statistics('lineno')[:limit]],
+            'diff': [{
+                'location': str(stat.traceback),
+                'size_bytes': stat.size,
+                'size_diff_bytes': stat.size_diff,
+                'count_diff': stat.count_diff
+            } for stat in snapshot.compare_to(self._baseline, 'lineno')[:limit]]
+        }
+        if reset:
+            self._reset_baseline(snapshot)
+        return result
+
+    def _reset_baseline(self, snapshot=None) -> None:
+        self._baseline = snapshot or self._take_snapshot()
+        self._baseline_time = time.monotonic()
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return '/debug/memory'
+
+    def get_export_endpoint_response_class(self):
+        return JSONResponse
+
+
+def create_debug_exporters(config: DebugConfig) -> list[DataExporter]:
+    if not config.enabled:
+        return []
+    return [ProfileDataExporter(config), MemoryDataExporter(config)]
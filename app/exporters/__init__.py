@@ -1,18 +1,77 @@
 import re
+import threading
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Mapping
 from logging import getLogger
 
-from fastapi.responses import JSONResponse
-
+from exporters.delta import DeltaConfig, SnapshotVersions, json_patch
+from exporters.encoding import JSON_MEDIA_TYPE, choose_encoding, encode_json
 from gatherers import DataGatherer
 
 
+# Encoded responses kept per exporter, keyed by snapshot version, fields, media type and base version
+ENCODED_CACHE_SIZE = 32
+
+
+def to_exportable(value):
+    if type(value) is list:
+        return [v._asdict() if hasattr(v, '_asdict') else v for v in value]
+    elif hasattr(value, '_asdict'):
+        return value._asdict()
+    return value
+
+
+class FieldError(ValueError):
+    pass
+
+
+def parse_fields(fields: str) -> dict:
+    tree = {}
+    for field in fields.split(','):
+        if not field.strip():
+            continue
+        node = tree
+        for key in field.strip().split('.'):
+            if not key:
+                raise FieldError(f'Invalid field {field.strip()}')
+            node = node.setdefault(key, {})
+    if not tree:
+        raise FieldError('fields must name at least one field')
+    return tree
+
+
+def project(value, fields: dict, path: str = ''):
+    # Only the requested keys are read, so lazily mapped values only map what is asked for
+    if not fields:
+        return to_exportable(value)
+    if type(value) is list:
+        return [project(v, fields, path) for v in value]
+    if not isinstance(value, Mapping) and hasattr(value, '_asdict'):
+        value = value._asdict()
+    if not isinstance(value, Mapping):
+        raise FieldError(f'{path.rstrip(".")} has no fields')
+    result = {}
+    for key, subfields in fields.items():
+        if key not in value:
+            raise FieldError(f'Unknown field {path}{key}')
+        result[key] = project(value[key], subfields, f'{path}{key}.')
+    return result
+
+
+def normalize_gatherer_name(name: str) -> str:
+    return re.sub(r'(?<!^)(?=[A-Z])', '-', name).lower().replace('-gatherer', '')
+
+
 class DataExporter(ABC):
 
     @abstractmethod
     def export(self):
         pass
 
+    def export_request(self, request):
+        return self.export()
+
     @abstractmethod
     def get_name(self) -> str:
         pass
@@ -28,18 +87,68 @@ class DataExporter(ABC):
 
 class DataGathererExporter(DataExporter):
 
-    def __init__(self, gatherer: DataGatherer):
+    def __init__(self, gatherer: DataGatherer, delta_config: DeltaConfig = DeltaConfig()):
         self._gatherer = gatherer
         self._name = f'{self.__class__.__name__}({self._gatherer.get_name()})'
         self._logger = getLogger(self._name)
+        self._versions = SnapshotVersions(delta_config.window)
+        self._encoded: OrderedDict[tuple, bytes] = OrderedDict()
+        self._encoded_lock = threading.Lock()
 
     def export(self):
+        return to_exportable(self._gatherer.gather())
+
+    def export_request(self, request):
+        from fastapi import HTTPException
+        from fastapi.responses import Response
+        params = request.query_params
+        try:
+            fields = parse_fields(params['fields']) if params.get('fields') else {}
+        except FieldError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        since_version = params.get('since_version')
+        if since_version is not None and not (since_version.isascii() and since_version.isdigit()):
+            raise HTTPException(status_code=400, detail='since_version must be a snapshot version')
+        encode, media_type = choose_encoding(request.headers.get('accept'))
         value = self._gatherer.gather()
-        if type(value) is list:
-            return [v._asdict() if hasattr(v, '_asdict') else v for v in value]
-        elif hasattr(value, '_asdict'):
-            return value._asdict()
-        return value
+        version = self._versions.observe(value)
+        headers = {'X-Snapshot-Version': str(version), 'Vary': 'Accept'}
+        age = self._gatherer.get_snapshot_age()
+        if age is not None:
+            headers['Age'] = str(int(age))
+        # No version given, or one that has left the window, gets the full document
+        base = self._versions.get(int(since_version)) if since_version is not None else None
+        if base is not None:
+            headers['X-Snapshot-Base-Version'] = since_version
+        key = (version, params.get('fields', ''), media_type, since_version if base is not None else None)
+        with self._encoded_lock:
+            body = self._encoded.get(key)
+        if body is None:
+            try:
+                body = self._encode(value, base, fields, encode)
+            except FieldError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            with self._encoded_lock:
+                self._encoded[key] = body
+                while len(self._encoded) > ENCODED_CACHE_SIZE:
+                    self._encoded.popitem(last=False)
+        if base is not None and media_type == JSON_MEDIA_TYPE:
+            media_type = 'application/json-patch+json'
+        return Response(body, media_type=media_type, headers=headers)
+
+    @staticmethod
+    def _encode(value, base, fields: dict, encode) -> bytes:
+        if encode is None:
+            from fastapi.encoders import jsonable_encoder
+            # JSON has no dates or durations, so they become strings and seconds before diffing
+            document = jsonable_encoder(project(value, fields))
+            if base is None:
+                return encode_json(document)
+            return encode_json(json_patch(jsonable_encoder(project(base, fields)), document))
+        document = project(value, fields)
+        if base is None:
+            return encode(document)
+        return encode(json_patch(project(base, fields), document))
 
     def get_name(self) -> str:
         return self._name
@@ -48,8 +157,8 @@ class DataGathererExporter(DataExporter):
         return '/gatherer/' + self._normalize_name()
 
     def get_export_endpoint_response_class(self):
+        from fastapi.responses import JSONResponse
         return JSONResponse
 
     def _normalize_name(self) -> str:
-        return re.sub(r'(?<!^)(?=[A-Z])', '-', self._gatherer.get_name()).lower().replace('-gatherer', '')
-
+        return normalize_gatherer_name(self._gatherer.get_name())
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DeltaConfig:
+    window: int
+
+    def __init__(self, window: int = 32):
+        if window is None or window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+
+    @staticmethod
+    def from_env():
+        return DeltaConfig(int(os.getenv('SNAPSHOT_VERSION_WINDOW', '32').strip()))
+
+
+def _escape(key) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def json_patch(old, new, path: str = '') -> list[dict]:
+    # RFC 6902 operations turning old into new; lists that changed length are replaced as a whole
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = [{'op': 'remove', 'path': f'{path}/{_escape(k)}'} for k in old if k not in new]
+        for k, v in new.items():
+            if k in old:
+                patch.extend(json_patch(old[k], v, f'{path}/{_escape(k)}'))
+            else:
+                patch.append({'op': 'add', 'path': f'{path}/{_escape(k)}', 'value': v})
+        return patch
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        return [op for i, (o, n) in enumerate(zip(old, new)) for op in json_patch(o, n, f'{path}/{i}')]
+    if type(old) is not type(new) or old != new:
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+
+class SnapshotVersions:
+
+    def __init__(self, window: int):
+        self._window = window
+        self._snapshots: OrderedDict[int, object] = OrderedDict()
+        self._version = 0
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def observe(self, value) -> int:
+        with self._lock:
+            if not self._snapshots or value is not self._latest:
+                # Versions are the millisecond a snapshot was first seen, kept increasing, so a version handed out by
+                # another worker or an earlier process is unlikely to name a different snapshot here
+                self._version = max(self._version + 1, time.time_ns() // 1_000_000)
+                self._latest = value
+                self._snapshots[self._version] = value
+                while len(self._snapshots) > self._window:
+                    self._snapshots.popitem(last=False)
+            return self._version
+
+    def get(self, version: int):
+        with self._lock:
+            return self._snapshots.get(version)
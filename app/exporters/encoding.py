@@ -0,0 +1,234 @@
+import json
+import struct
+from collections.abc import Mapping
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Optional
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+CBOR_MEDIA_TYPE = 'application/cbor'
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, 'application/vnd.msgpack', 'application/x-msgpack')
+
+# MessagePack extension types: -1 is the standard timestamp, 1 is a duration with the timestamp's 96-bit layout
+MSGPACK_TIMESTAMP = -1
+MSGPACK_DURATION = 1
+# CBOR tags: 1 is epoch-based date/time, 1002 is a duration (RFC 9581) keyed like tag 1001
+CBOR_EPOCH_DATETIME = 1
+CBOR_DURATION = 1002
+
+_DOUBLE = struct.Struct('>d')
+_TIMESTAMP96 = struct.Struct('>Iq')
+
+
+def parse_accept(accept_header: str) -> list[tuple[float, int, str, dict]]:
+    media_ranges = []
+    for position, accepted in enumerate((accept_header or '').split(',')):
+        media_type, *raw_params = [p.strip() for p in accepted.split(';')]
+        if not media_type:
+            continue
+        params = dict(p.split('=', 1) for p in raw_params if '=' in p)
+        try:
+            quality = float(params.pop('q', '1'))
+        except ValueError:
+            quality = 0.0
+        media_ranges.append((quality, position, media_type.lower(), params))
+    media_ranges.sort(key=lambda r: (-r[0], r[1]))
+    return media_ranges
+
+
+def _split_seconds(value) -> tuple[int, int]:
+    # Whole seconds, rounded down, and the nanoseconds after them
+    if isinstance(value, timedelta):
+        microseconds = value // timedelta(microseconds=1)
+    else:
+        # Naive modem times are taken to be in the exporter's time zone, as datetime.timestamp() does
+        microseconds = round(value.timestamp() * 1_000_000)
+    seconds, microseconds = divmod(microseconds, 1_000_000)
+    return seconds, microseconds * 1000
+
+
+def _to_mapping(value):
+    if hasattr(value, '_asdict'):
+        return value._asdict()
+    if hasattr(value, '__dict__'):
+        return vars(value)
+    raise TypeError(f'{type(value).__name__} cannot be encoded')
+
+
+def _pack_msgpack(value, out: bytearray) -> None:
+    if value is None:
+        out.append(0xc0)
+    elif value is True:
+        out.append(0xc3)
+    elif value is False:
+        out.append(0xc2)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80:
+            out.append(value)
+        elif -32 <= value < 0:
+            out.append(value & 0xff)
+        elif value >= 0:
+            if value <= 0xff:
+                out += struct.pack('>BB', 0xcc, value)
+            elif value <= 0xffff:
+                out += struct.pack('>BH', 0xcd, value)
+            elif value <= 0xffffffff:
+                out += struct.pack('>BI', 0xce, value)
+            else:
+                out += struct.pack('>BQ', 0xcf, value)
+        elif value >= -0x80:
+            out += struct.pack('>Bb', 0xd0, value)
+        elif value >= -0x8000:
+            out += struct.pack('>Bh', 0xd1, value)
+        elif value >= -0x80000000:
+            out += struct.pack('>Bi', 0xd2, value)
+        else:
+            out += struct.pack('>Bq', 0xd3, value)
+    elif isinstance(value, str):
+        data = value.encode()
+        size = len(data)
+        if size < 32:
+            out.append(0xa0 | size)
+        elif size <= 0xff:
+            out += struct.pack('>BB', 0xd9, size)
+        elif size <= 0xffff:
+            out += struct.pack('>BH', 0xda, size)
+        else:
+            out += struct.pack('>BI', 0xdb, size)
+        out += data
+    elif isinstance(value, float):
+        out.append(0xcb)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, Mapping):
+        size = len(value)
+        if size < 16:
+            out.append(0x80 | size)
+        elif size <= 0xffff:
+            out += struct.pack('>BH', 0xde, size)
+        else:
+            out += struct.pack('>BI', 0xdf, size)
+        for k, v in value.items():
+            _pack_msgpack(k, out)
+            _pack_msgpack(v, out)
+    elif isinstance(value, (list, tuple)):
+        size = len(value)
+        if size < 16:
+            out.append(0x90 | size)
+        elif size <= 0xffff:
+            out += struct.pack('>BH', 0xdc, size)
+        else:
+            out += struct.pack('>BI', 0xdd, size)
+        for v in value:
+            _pack_msgpack(v, out)
+    elif isinstance(value, (datetime, timedelta)):
+        seconds, nanoseconds = _split_seconds(value)
+        if isinstance(value, timedelta):
+            out += struct.pack('>BBb', 0xc7, 12, MSGPACK_DURATION) + _TIMESTAMP96.pack(nanoseconds, seconds)
+        elif nanoseconds == 0 and 0 <= seconds <= 0xffffffff:
+            out += struct.pack('>BbI', 0xd6, MSGPACK_TIMESTAMP, seconds)
+        elif 0 <= seconds < 1 << 34:
+            out += struct.pack('>BbQ', 0xd7, MSGPACK_TIMESTAMP, nanoseconds << 34 | seconds)
+        else:
+            out += struct.pack('>BBb', 0xc7, 12, MSGPACK_TIMESTAMP) + _TIMESTAMP96.pack(nanoseconds, seconds)
+    elif isinstance(value, (bytes, bytearray)):
+        size = len(value)
+        if size <= 0xff:
+            out += struct.pack('>BB', 0xc4, size)
+        elif size <= 0xffff:
+            out += struct.pack('>BH', 0xc5, size)
+        else:
+            out += struct.pack('>BI', 0xc6, size)
+        out += value
+    elif isinstance(value, (date, time)):
+        _pack_msgpack(value.isoformat(), out)
+    else:
+        _pack_msgpack(_to_mapping(value), out)
+
+
+def encode_msgpack(value) -> bytes:
+    out = bytearray()
+    _pack_msgpack(value, out)
+    return bytes(out)
+
+
+def _cbor_head(major: int, n: int, out: bytearray) -> None:
+    if n < 24:
+        out.append(major << 5 | n)
+    elif n <= 0xff:
+        out += struct.pack('>BB', major << 5 | 24, n)
+    elif n <= 0xffff:
+        out += struct.pack('>BH', major << 5 | 25, n)
+    elif n <= 0xffffffff:
+        out += struct.pack('>BI', major << 5 | 26, n)
+    else:
+        out += struct.pack('>BQ', major << 5 | 27, n)
+
+
+def _pack_cbor(value, out: bytearray) -> None:
+    if value is None:
+        out.append(0xf6)
+    elif value is True:
+        out.append(0xf5)
+    elif value is False:
+        out.append(0xf4)
+    elif isinstance(value, int):
+        if value >= 0:
+            _cbor_head(0, value, out)
+        else:
+            _cbor_head(1, -1 - value, out)
+    elif isinstance(value, str):
+        data = value.encode()
+        _cbor_head(3, len(data), out)
+        out += data
+    elif isinstance(value, float):
+        out.append(0xfb)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, Mapping):
+        _cbor_head(5, len(value), out)
+        for k, v in value.items():
+            _pack_cbor(k, out)
+            _pack_cbor(v, out)
+    elif isinstance(value, (list, tuple)):
+        _cbor_head(4, len(value), out)
+        for v in value:
+            _pack_cbor(v, out)
+    elif isinstance(value, datetime):
+        _cbor_head(6, CBOR_EPOCH_DATETIME, out)
+        seconds, nanoseconds = _split_seconds(value)
+        _pack_cbor(seconds + nanoseconds / 1e9 if nanoseconds else seconds, out)
+    elif isinstance(value, timedelta):
+        _cbor_head(6, CBOR_DURATION, out)
+        seconds, nanoseconds = _split_seconds(value)
+        _pack_cbor({1: seconds, -9: nanoseconds} if nanoseconds else {1: seconds}, out)
+    elif isinstance(value, (bytes, bytearray)):
+        _cbor_head(2, len(value), out)
+        out += value
+    elif isinstance(value, (date, time)):
+        _pack_cbor(value.isoformat(), out)
+    else:
+        _pack_cbor(_to_mapping(value), out)
+
+
+def encode_cbor(value) -> bytes:
+    out = bytearray()
+    _pack_cbor(value, out)
+    return bytes(out)
+
+
+def encode_json(value) -> bytes:
+    # Same output as JSONResponse for values already made JSON-compatible
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+
+
+def choose_encoding(accept_header: Optional[str]) -> tuple[Optional[Callable[[object], bytes]], str]:
+    # None stands for JSON, which callers encode themselves after converting dates and durations to JSON values
+    for quality, _, media_type, _ in parse_accept(accept_header):
+        if quality <= 0:
+            continue
+        if media_type in MSGPACK_MEDIA_TYPES:
+            return encode_msgpack, media_type
+        if media_type == CBOR_MEDIA_TYPE:
+            return encode_cbor, CBOR_MEDIA_TYPE
+        if media_type in (JSON_MEDIA_TYPE, 'application/*', '*/*'):
+            return None, JSON_MEDIA_TYPE
+    return None, JSON_MEDIA_TYPE
@@ -0,0 +1,293 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+from itertools import filterfalse
+from typing import Optional
+
+NAN = float('nan')
+OPS = ('sum', 'mean', 'min', 'max', 'count')
+
+
+class AggregateError(ValueError):
+    pass
+
+
+class FleetConfig:
+    enabled: bool
+    max_modems: int
+    max_age: timedelta
+
+    def __init__(self, enabled: bool = False, max_modems: int = 1024, max_age: timedelta = timedelta(minutes=10)):
+        if max_modems is None or max_modems < 1:
+            raise ValueError("max_modems must be at least 1")
+        if max_age is None or max_age.total_seconds() <= 0:
+            raise ValueError("max_age must be positive")
+        self.enabled = enabled
+        self.max_modems = max_modems
+        self.max_age = max_age
+
+    @staticmethod
+    def from_env():
+        return FleetConfig(
+            enabled=os.getenv('FLEET_AGGREGATES_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes'),
+            max_modems=int(os.getenv('FLEET_MAX_MODEMS', '1024').strip()),
+            max_age=timedelta(seconds=float(os.getenv('FLEET_MAX_AGE_SECONDS', '600').strip()))
+        )
+
+
+def flatten_row(value, prefix: str = '', row: dict = None) -> dict:
+    row = {} if row is None else row
+    if not isinstance(value, Mapping) and hasattr(value, '_asdict'):
+        value = value._asdict()
+    if isinstance(value, Mapping):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        if isinstance(value, timedelta):
+            value = value.total_seconds()
+        elif isinstance(value, datetime):
+            value = value.timestamp()
+        if value is not None:
+            row[prefix] = value
+        return row
+    for k, v in items:
+        flatten_row(v, f'{prefix}.{k}' if prefix else str(k), row)
+    return row
+
+
+def flatten_rows(value) -> list[dict]:
+    # A list, such as the LAN ports, gives a row per element and anything else a single row
+    if isinstance(value, list):
+        return [flatten_row(v) for v in value]
+    return [flatten_row(value)]
+
+
+def percentile(values: list[float], q: float) -> float:
+    # Linear interpolation between the closest ranks
+    values = sorted(values)
+    position = q / 100 * (len(values) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def parse_op(op: str) -> tuple[str, Optional[float]]:
+    if op in OPS:
+        return op, None
+    match = re.fullmatch(r'p(\d+(?:\.\d+)?)', op)
+    if match and 0 <= float(match.group(1)) <= 100:
+        return 'percentile', float(match.group(1))
+    raise AggregateError(f"Unknown op {op}, expected one of {', '.join(OPS)} or pXX such as p95")
+
+
+def apply_op(op: str, q: Optional[float], values: list) -> Optional[float]:
+    if op == 'count':
+        return len(values)
+    if not values:
+        return None
+    if op == 'sum':
+        return math.fsum(values)
+    if op == 'mean':
+        return math.fsum(values) / len(values)
+    if op == 'min':
+        return min(values)
+    if op == 'max':
+        return max(values)
+    return percentile(values, q)
+
+
+class FleetColumns:
+
+    def __init__(self):
+        self._rows: dict[tuple[str, int], int] = {}
+        self._free: list[int] = []
+        self._modem_ids: list[Optional[str]] = []
+        self._updated = array('d')
+        # Numeric fields and their per-second rates are columns of doubles with a row per modem, or per modem
+        # and element for lists such as the LAN ports; text fields such as the port state are lists
+        self._values: dict[str, array] = {}
+        self._rates: dict[str, array] = {}
+        self._labels: dict[str, list] = {}
+
+    def update(self, modem_id: str, rows: list[dict], now: float) -> None:
+        for index, fields in enumerate(rows):
+            self._update_row(self._get_row((modem_id, index)), fields, now)
+        index = len(rows)
+        while (modem_id, index) in self._rows:
+            self._free_row((modem_id, index))
+            index += 1
+
+    def remove(self, modem_id: str) -> None:
+        index = 0
+        while (modem_id, index) in self._rows:
+            self._free_row((modem_id, index))
+            index += 1
+
+    def get_fields(self) -> list[str]:
+        return sorted(set(self._values) | set(self._labels))
+
+    def aggregate(self, field: str, op: str, rate: bool, group_by: Optional[str]) -> dict:
+        op, q = parse_op(op)
+        if field in self._values:
+            column = (self._rates if rate else self._values)[field]
+            present = self._present_numbers
+        elif field in self._labels and op == 'count' and not rate:
+            column = self._labels[field]
+            present = self._present_labels
+        elif field in self._labels:
+            raise AggregateError(f'{field} is not numeric, only op=count without rate applies to it')
+        else:
+            raise AggregateError(f'Unknown field {field}')
+        if group_by is None:
+            return {'value': apply_op(op, q, present(column))}
+        groups = {}
+        for key, v in zip(self._get_group_keys(group_by), column):
+            groups.setdefault(key, []).append(v)
+        groups = {key: present(values) for key, values in groups.items()}
+        return {'groups': {key: apply_op(op, q, values) for key, values in groups.items() if values}}
+
+    @staticmethod
+    def _present_numbers(values: Sequence[float]) -> Sequence[float]:
+        # Rows of modems that are gone, and fields a modem did not report, are NaN. A column without any is
+        # passed on as is, so fsum, min, max and sorted in apply_op run over the array without a Python loop
+        return list(filterfalse(math.isnan, values)) if math.isnan(sum(values)) else values
+
+    @staticmethod
+    def _present_labels(values: Sequence[Optional[str]]) -> list[str]:
+        return [v for v in values if v is not None]
+
+    def _get_group_keys(self, group_by: str) -> list:
+        if group_by == 'modem_id':
+            return self._modem_ids
+        if group_by in self._labels:
+            return self._labels[group_by]
+        if group_by in self._values:
+            return [None if math.isnan(v) else f'{v:g}' for v in self._values[group_by]]
+        raise AggregateError(f'Unknown group_by field {group_by}')
+
+    def _get_row(self, key: tuple[str, int]) -> int:
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        if self._free:
+            row = self._free.pop()
+            self._modem_ids[row] = key[0]
+        else:
+            row = len(self._modem_ids)
+            self._modem_ids.append(key[0])
+            self._updated.append(NAN)
+            for columns in (self._values, self._rates):
+                for column in columns.values():
+                    column.append(NAN)
+            for column in self._labels.values():
+                column.append(None)
+        self._rows[key] = row
+        return row
+
+    def _update_row(self, row: int, fields: dict, now: float) -> None:
+        elapsed = now - self._updated[row]
+        for name, column in self._values.items():
+            value = fields.pop(name, None)
+            value = NAN if value is None or isinstance(value, str) else float(value)
+            previous = column[row]
+            # A counter that went down was reset, so it has no rate until the next update
+            self._rates[name][row] = (value - previous) / elapsed if elapsed > 0 and value >= previous else NAN
+            column[row] = value
+        for name, column in self._labels.items():
+            value = fields.pop(name, None)
+            column[row] = value if isinstance(value, str) else None
+        for name, value in fields.items():
+            if isinstance(value, str):
+                column = self._labels[name] = [None] * len(self._modem_ids)
+                column[row] = value
+            else:
+                column = self._values[name] = array('d', [NAN]) * len(self._modem_ids)
+                self._rates[name] = array('d', [NAN]) * len(self._modem_ids)
+                column[row] = float(value)
+        self._updated[row] = now
+
+    def _free_row(self, key: tuple[str, int]) -> None:
+        row = self._rows.pop(key)
+        self._modem_ids[row] = None
+        self._updated[row] = NAN
+        for columns in (self._values, self._rates):
+            for column in columns.values():
+                column[row] = NAN
+        for column in self._labels.values():
+            column[row] = None
+        self._free.append(row)
+
+
+class Fleet:
+
+    def __init__(self, config: FleetConfig):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._config = config
+        self._tables: dict[str, FleetColumns] = {}
+        self._modems: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, modem_id: str, name: str, value, now: float = None) -> None:
+        now = time.time() if now is None else now
+        rows = flatten_rows(value)
+        with self._lock:
+            self._expire(now)
+            if modem_id not in self._modems and len(self._modems) >= self._config.max_modems:
+                self._logger.warning('Not recording modem %s, the fleet already holds %s modems', modem_id,
+                                     self._config.max_modems)
+                return
+            self._modems[modem_id] = now
+            self._modems.move_to_end(modem_id)
+            table = self._tables.get(name)
+            if table is None:
+                table = self._tables[name] = FleetColumns()
+            table.update(modem_id, rows, now)
+
+    def get_table_names(self) -> list[str]:
+        return list(self._tables)
+
+    def get_fields(self, name: str) -> list[str]:
+        with self._lock:
+            return self._tables[name].get_fields()
+
+    def aggregate(self, name: str, field: str, op: str, rate: bool = False, group_by: Optional[str] = None,
+                  now: float = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            table = self._tables.get(name)
+            if table is None:
+                raise AggregateError(f'Unknown table {name}')
+            return table.aggregate(field, op, rate, group_by)
+
+    def _expire(self, now: float) -> None:
+        # Modems are kept in the order they were last recorded, so stop at the first one still recorded recently
+        while self._modems:
+            modem_id, recorded = next(iter(self._modems.items()))
+            if now - recorded <= self._config.max_age.total_seconds():
+                break
+            del self._modems[modem_id]
+            for table in self._tables.values():
+                table.remove(modem_id)
+            self._logger.info('Expired modem %s from the fleet', modem_id)
+
+
+_fleet: Optional[Fleet] = None
+
+
+def configure_fleet(config: Optional[FleetConfig]) -> Optional[Fleet]:
+    global _fleet
+    _fleet = Fleet(config) if config is not None and config.enabled else None
+    return _fleet
+
+
+def get_fleet() -> Optional[Fleet]:
+    return _fleet
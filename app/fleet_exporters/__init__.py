@@ -0,0 +1,44 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from exporters import DataExporter, normalize_gatherer_name
+from fleet import AggregateError, Fleet
+
+
+class FleetAggregateExporter(DataExporter):
+
+    def __init__(self, fleet: Fleet):
+        self._name = self.__class__.__name__
+        self._fleet = fleet
+
+    def export(self):
+        raise HTTPException(status_code=400, detail='field is required')
+
+    def export_request(self, request):
+        params = request.query_params
+        field = params.get('field', '').strip()
+        op = params.get('op', 'sum').strip().lower()
+        group_by = params.get('group_by', '').strip() or None
+        rate = params.get('rate', 'false').strip().lower() in ('1', 'true', 'yes')
+        # Fields are named after the data endpoints, such as home-network-status.receive_errors
+        table, _, column = field.partition('.')
+        if not column:
+            raise HTTPException(status_code=400, detail='field must be a gatherer name and a field, such as '
+                                                        'home-network-status.receive_errors')
+        names = {normalize_gatherer_name(name): name for name in self._fleet.get_table_names()}
+        if table not in names:
+            raise HTTPException(status_code=400, detail=f'Unknown gatherer {table}, expected one of {sorted(names)}')
+        try:
+            result = self._fleet.aggregate(names[table], column, op, rate, group_by)
+        except AggregateError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        return {'field': field, 'op': op, 'rate': rate, **({'group_by': group_by} if group_by else {}), **result}
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return '/fleet/aggregate'
+
+    def get_export_endpoint_response_class(self):
+        return JSONResponse
@@ -1,8 +1,17 @@
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 from logging import getLogger
+from typing import Optional
 from cachetools import TTLCache, cached
 
+from fleet import get_fleet
+from instrumentation import get_instrumentation
+from tracing import get_tracer
+
+class DataUnavailableError(Exception):
+    pass
+
+
 class DataGatherer(ABC):
 
     @abstractmethod
@@ -12,29 +21,54 @@ class DataGatherer(ABC):
     def get_name(self) -> str:
         return self.__class__.__name__
 
+    def get_source_id(self) -> str:
+        return ''
+
+    def get_snapshot_age(self) -> Optional[float]:
+        return None
+
 
 class CachingDataGatherer(DataGatherer):
 
     def __init__(self, gatherer: DataGatherer, cache_duration: timedelta = timedelta(seconds=5)):
         self._gatherer = gatherer
         self._cache = TTLCache(maxsize=1, ttl=cache_duration.seconds)
+        self._loaded = False
         self._logger = getLogger(self.__class__.__name__)
         self._logger.info("Initialized CachingDataGatherer for %s with cache_duration=%s", gatherer.get_name(), cache_duration)
 
     def gather(self):
         key = self.get_name()
-        value = self._cache.get(key, None)
-        if not value:
-            self._logger.debug('Cache expired for gatherer %s', key)
-            value = self._gatherer.gather()
-            self._cache[key] = value
-        else:
-            self._logger.debug('Using cached value for gatherer %s', key)
+        with get_tracer().span('cache', gatherer=key, modem_id=self.get_source_id()) as span:
+            value = self._cache.get(key, None)
+            if not value:
+                self._logger.debug('Cache expired for gatherer %s', key)
+                result = 'stale' if self._loaded else 'miss'
+                get_instrumentation().count_cache_request(key, self.get_source_id(), result)
+                value = self._gatherer.gather()
+                self._cache[key] = value
+                fleet = get_fleet()
+                if fleet is not None:
+                    try:
+                        fleet.record(self.get_source_id(), key, value)
+                    except Exception as e:
+                        # Fleet aggregates are bookkeeping; the value is still returned to whoever asked for it
+                        self._logger.error('Error recording %s in the fleet: %s', key, e, exc_info=True)
+                self._loaded = True
+            else:
+                self._logger.debug('Using cached value for gatherer %s', key)
+                result = 'hit'
+                get_instrumentation().count_cache_request(key, self.get_source_id(), result)
+            if span is not None:
+                span.attributes['result'] = result
         return value
 
     def get_name(self) -> str:
         return self._gatherer.get_name()
 
+    def get_source_id(self) -> str:
+        return self._gatherer.get_source_id()
+
     def get_gatherer(self) -> DataGatherer:
         return self._gatherer
                 
@@ -0,0 +1,207 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import timedelta
+from fnmatch import fnmatchcase
+
+from fastapi import HTTPException
+
+from exporters import DataExporter, normalize_gatherer_name, to_exportable
+from gatherers import DataGatherer
+from history_exporters.storage import ColumnTier
+from stream_exporters import flatten_snapshot
+
+# name, resolution in seconds (0 means one row per recording), segment length in seconds
+HISTORY_TIERS = (('raw', 0, 3600), ('1m', 60, 86400), ('1h', 3600, 30 * 86400), ('1d', 86400, 366 * 86400))
+
+
+class HistoryConfig:
+    directory: str
+    interval: timedelta
+    retention: dict[str, timedelta]
+    max_points: int
+
+    def __init__(self, directory: str, interval: timedelta = timedelta(seconds=30), retention: dict = None,
+                 max_points: int = 1000):
+        retention = retention or {'raw': timedelta(days=2), '1m': timedelta(days=30),
+                                  '1h': timedelta(days=365), '1d': timedelta(days=5 * 365)}
+        if not directory:
+            raise ValueError("directory is required")
+        if interval is None or interval.total_seconds() <= 0:
+            raise ValueError("interval must be positive")
+        for tier, _, _ in HISTORY_TIERS:
+            if tier not in retention or retention[tier].total_seconds() <= 0:
+                raise ValueError(f"retention for tier {tier} must be positive")
+        if max_points is None or max_points < 1:
+            raise ValueError("max_points must be at least 1")
+        self.directory = directory
+        self.interval = interval
+        self.retention = retention
+        self.max_points = max_points
+
+    @staticmethod
+    def from_env():
+        directory = os.getenv('HISTORY_DIR', '').strip()
+        if not directory:
+            return None
+        defaults = {'raw': '2', '1m': '30', '1h': '365', '1d': '1825'}
+        retention = {tier: timedelta(days=float(os.getenv(f'HISTORY_RETENTION_{tier.upper()}_DAYS', days).strip()))
+                     for tier, days in defaults.items()}
+        return HistoryConfig(
+            directory=directory,
+            interval=timedelta(seconds=float(os.getenv('HISTORY_INTERVAL_SECONDS', '30').strip())),
+            retention=retention,
+            max_points=int(os.getenv('HISTORY_MAX_POINTS', '1000').strip())
+        )
+
+
+def flatten_numeric(name: str, value) -> dict[str, float]:
+    return {k: float(v) for k, v in flatten_snapshot(to_exportable(value), name).items()
+            if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+class HistoryStore:
+
+    def __init__(self, directory: str, config: HistoryConfig):
+        self._config = config
+        self._tiers = []
+        for name, resolution, segment_seconds in HISTORY_TIERS:
+            self._tiers.append(ColumnTier(os.path.join(directory, name), name,
+                                          resolution or config.interval.total_seconds(), segment_seconds,
+                                          config.retention[name].total_seconds()))
+        # Rollup tiers keep the last value per series of the bucket that is still filling
+        self._pending = {tier.name: None for tier in self._tiers[1:]}
+        self._lock = threading.Lock()
+
+    def record(self, timestamp: float, values: dict[str, float]) -> None:
+        with self._lock:
+            self._tiers[0].append(timestamp, values)
+            for tier in self._tiers[1:]:
+                bucket = timestamp // tier.resolution * tier.resolution
+                pending = self._pending[tier.name]
+                if pending and pending[0] != bucket:
+                    tier.append(*pending)
+                    pending = None
+                if pending is None:
+                    pending = self._pending[tier.name] = (bucket, {})
+                pending[1].update(values)
+
+    def choose_tier(self, start: float, end: float, now: float) -> ColumnTier:
+        for tier in self._tiers:
+            if start >= now - tier.retention_seconds and (end - start) / tier.resolution <= self._config.max_points:
+                return tier
+        return self._tiers[-1]
+
+    def get_tier(self, name: str) -> ColumnTier:
+        for tier in self._tiers:
+            if tier.name == name:
+                return tier
+        raise ValueError(f"Unknown tier {name}, expected one of {', '.join(t.name for t in self._tiers)}")
+
+    def query(self, start: float, end: float, patterns: list[str], tier: str = None, now: float = None) -> dict:
+        column_tier = self.get_tier(tier) if tier else self.choose_tier(start, end, now or time.time())
+        timestamps, series = column_tier.query(start, end, patterns)
+        with self._lock:
+            pending = self._pending.get(column_tier.name)
+            if pending and start <= pending[0] <= end and (not timestamps or pending[0] > timestamps[-1]):
+                for name, values in series.items():
+                    values.append(pending[1].get(name))
+                for name, value in pending[1].items():
+                    if name not in series and any(fnmatchcase(name, p) for p in patterns):
+                        series[name] = [None] * len(timestamps) + [value]
+                timestamps.append(pending[0])
+        return {
+            'tier': column_tier.name,
+            'resolution_seconds': column_tier.resolution,
+            'start': start,
+            'end': end,
+            'timestamps': timestamps,
+            'series': series
+        }
+
+    def close(self) -> None:
+        for tier in self._tiers:
+            tier.close()
+
+
+class HistoryRecorder:
+
+    def __init__(self, gatherers: list[DataGatherer], store: HistoryStore, config: HistoryConfig):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._gatherers = gatherers
+        self._store = store
+        self._config = config
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def record(self) -> None:
+        values = {}
+        for gatherer in self._gatherers:
+            try:
+                values.update(flatten_numeric(normalize_gatherer_name(gatherer.get_name()), gatherer.gather()))
+            except Exception as exc:
+                self._logger.error('Error gathering %s for history: %s', gatherer.get_name(), exc)
+        if values:
+            self._store.record(time.time(), values)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        interval = self._config.interval.total_seconds()
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            self.record()
+            self._stopped.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def _parse_time(value: str, name: str, now: float) -> float:
+    try:
+        parsed = float(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'{name} must be a unix timestamp or negative seconds from now')
+    if math.isnan(parsed) or math.isinf(parsed):
+        raise HTTPException(status_code=400, detail=f'{name} must be finite')
+    return now + parsed if parsed <= 0 else parsed
+
+
+class HistoryDataExporter(DataExporter):
+
+    def __init__(self, name: str, endpoint: str, store: HistoryStore):
+        self._name = name
+        self._endpoint = endpoint
+        self._store = store
+
+    def export(self):
+        return self._store.query(time.time() - 3600, time.time(), ['*'])
+
+    def export_request(self, request):
+        now = time.time()
+        params = request.query_params
+        start = _parse_time(params.get('start', '-3600'), 'start', now)
+        end = _parse_time(params.get('end', '0'), 'end', now)
+        if start > end:
+            raise HTTPException(status_code=400, detail='start must not be after end')
+        patterns = [p.strip() for p in params.get('series', '*').split(',') if p.strip()]
+        try:
+            return self._store.query(start, end, patterns, params.get('tier'), now)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return self._endpoint
+
+    def get_export_endpoint_response_class(self):
+        from fastapi.responses import JSONResponse
+        return JSONResponse
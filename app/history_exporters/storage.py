@@ -0,0 +1,240 @@
+import bisect
+import json
+import logging
+import math
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zlib
+from array import array
+from fnmatch import fnmatchcase
+from urllib.parse import quote, unquote
+
+_TIMESTAMP_COLUMN = '_timestamp'
+_COLUMN_SUFFIX = '.f64'
+_OPEN_SUFFIX = '.open'
+_SEALED_SUFFIX = '.seg'
+_SEALED_MAGIC = b'ATTH'
+_SEALED_HEADER = struct.Struct('<4sI')
+_NAN = float('nan')
+
+
+def _shuffle(data: bytes) -> bytes:
+    # Grouping the n-th byte of every double together lets zlib find the runs in slowly changing counters
+    return b''.join(data[i::8] for i in range(8))
+
+
+def _unshuffle(data: bytes) -> bytes:
+    rows = len(data) // 8
+    output = bytearray(len(data))
+    for i in range(8):
+        output[i::8] = data[i * rows:(i + 1) * rows]
+    return bytes(output)
+
+
+def _column_file(name: str) -> str:
+    return quote(name, safe='') + _COLUMN_SUFFIX
+
+
+def _match_any(name: str, patterns: list[str]) -> bool:
+    return any(fnmatchcase(name, p) for p in patterns)
+
+
+def _select(column_timestamps, columns: dict, start: float, end: float, timestamps: list, series: dict) -> None:
+    first = bisect.bisect_left(column_timestamps, start)
+    last = bisect.bisect_right(column_timestamps, end)
+    if first >= last:
+        return
+    offset = len(timestamps)
+    timestamps.extend(column_timestamps[first:last])
+    for name, column in columns.items():
+        values = series.setdefault(name, [None] * offset)
+        values.extend(None if math.isnan(v) else v for v in column[first:last])
+    for name, values in series.items():
+        if name not in columns:
+            values.extend([None] * (last - first))
+
+
+class OpenSegment:
+
+    def __init__(self, path: str, start: int):
+        self._path = path
+        self.start = start
+        os.makedirs(path, exist_ok=True)
+        self._files = {}
+        timestamp_path = os.path.join(path, _column_file(_TIMESTAMP_COLUMN))
+        self.rows = os.path.getsize(timestamp_path) // 8 if os.path.exists(timestamp_path) else 0
+        self._open_column(_TIMESTAMP_COLUMN)
+        for file in os.listdir(path):
+            if file.endswith(_COLUMN_SUFFIX):
+                self._open_column(unquote(file[:-len(_COLUMN_SUFFIX)]))
+        self.last_timestamp = struct.unpack('<d', self._read_column(_TIMESTAMP_COLUMN)[-8:])[0] if self.rows else None
+
+    def append(self, timestamp: float, values: dict) -> None:
+        for name in values:
+            if name not in self._files:
+                self._open_column(name)
+        for name, file in self._files.items():
+            if name != _TIMESTAMP_COLUMN:
+                file.write(struct.pack('<d', values.get(name, _NAN)))
+        # The timestamp column is written last and defines the row count, so a torn append is repaired on reopen
+        self._open_column(_TIMESTAMP_COLUMN).write(struct.pack('<d', timestamp))
+        self.rows += 1
+        self.last_timestamp = timestamp
+
+    def select(self, start: float, end: float, patterns: list[str], timestamps: list, series: dict) -> None:
+        if not self.rows:
+            return
+        names = [n for n in self._files if n != _TIMESTAMP_COLUMN and _match_any(n, patterns)]
+        maps, views = [], {}
+        try:
+            for name in [_TIMESTAMP_COLUMN] + names:
+                with open(os.path.join(self._path, _column_file(name)), 'rb') as f:
+                    maps.append(mmap.mmap(f.fileno(), self.rows * 8, access=mmap.ACCESS_READ))
+                views[name] = memoryview(maps[-1]).cast('d')
+            columns = {n: v for n, v in views.items() if n != _TIMESTAMP_COLUMN}
+            _select(views[_TIMESTAMP_COLUMN], columns, start, end, timestamps, series)
+        finally:
+            for view in views.values():
+                view.release()
+            for mapped in maps:
+                mapped.close()
+
+    def seal(self, path: str) -> None:
+        names = sorted(self._files)
+        blobs = [zlib.compress(_shuffle(self._read_column(n)), 6) for n in names]
+        index, offset = {}, 0
+        for name, blob in zip(names, blobs):
+            index[name] = [offset, len(blob)]
+            offset += len(blob)
+        header = json.dumps({'start': self.start, 'rows': self.rows, 'columns': index}).encode()
+        with open(path + '.tmp', 'wb') as f:
+            f.write(_SEALED_HEADER.pack(_SEALED_MAGIC, len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(path + '.tmp', path)
+        self.close()
+        shutil.rmtree(self._path)
+
+    def close(self) -> None:
+        for file in self._files.values():
+            file.close()
+        self._files.clear()
+
+    def _open_column(self, name: str):
+        file = self._files.get(name)
+        if file is None:
+            path = os.path.join(self._path, _column_file(name))
+            with open(path, 'ab') as f:
+                size = f.tell()
+                expected = self.rows * 8
+                if size > expected:
+                    f.truncate(expected)
+                elif size < expected:
+                    f.write(struct.pack('<d', _NAN) * ((expected - size) // 8))
+            file = self._files[name] = open(path, 'ab', buffering=0)
+        return file
+
+    def _read_column(self, name: str) -> bytes:
+        with open(os.path.join(self._path, _column_file(name)), 'rb') as f:
+            return f.read(self.rows * 8)
+
+
+class SealedSegment:
+
+    def __init__(self, path: str):
+        self._path = path
+
+    def select(self, start: float, end: float, patterns: list[str], timestamps: list, series: dict) -> None:
+        with open(self._path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, header_size = _SEALED_HEADER.unpack_from(mapped, 0)
+                if magic != _SEALED_MAGIC:
+                    raise ValueError(f'{self._path} is not a history segment')
+                base = _SEALED_HEADER.size + header_size
+                header = json.loads(mapped[_SEALED_HEADER.size:base])
+                view = memoryview(mapped)
+                try:
+                    def decode(column):
+                        offset, length = header['columns'][column]
+                        raw = zlib.decompress(view[base + offset:base + offset + length])
+                        return array('d', _unshuffle(raw))
+                    column_timestamps = decode(_TIMESTAMP_COLUMN)
+                    columns = {n: decode(n) for n in header['columns']
+                               if n != _TIMESTAMP_COLUMN and _match_any(n, patterns)}
+                finally:
+                    view.release()
+        _select(column_timestamps, columns, start, end, timestamps, series)
+
+
+class ColumnTier:
+
+    def __init__(self, directory: str, name: str, resolution: float, segment_seconds: int, retention_seconds: float):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._directory = directory
+        self.name = name
+        self.resolution = resolution
+        self.retention_seconds = retention_seconds
+        self._segment_seconds = segment_seconds
+        self._active = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        for start in sorted(self._list(_OPEN_SUFFIX)):
+            if self._active:
+                self._seal(self._active)
+            self._active = OpenSegment(self._open_path(start), start)
+
+    def append(self, timestamp: float, values: dict) -> bool:
+        with self._lock:
+            if self._active and self._active.last_timestamp is not None and timestamp <= self._active.last_timestamp:
+                return False
+            start = int(timestamp // self._segment_seconds * self._segment_seconds)
+            if self._active and self._active.start != start:
+                self._seal(self._active)
+                self._active = None
+                self._apply_retention(timestamp)
+            if self._active is None:
+                self._active = OpenSegment(self._open_path(start), start)
+            self._active.append(timestamp, values)
+            return True
+
+    def query(self, start: float, end: float, patterns: list[str]) -> tuple[list, dict]:
+        timestamps, series = [], {}
+        with self._lock:
+            segments = [(s, SealedSegment(self._sealed_path(s))) for s in self._list(_SEALED_SUFFIX)]
+            if self._active:
+                segments.append((self._active.start, self._active))
+            segments.sort(key=lambda s: s[0])
+            for segment_start, segment in segments:
+                if segment_start > end or segment_start + self._segment_seconds < start:
+                    continue
+                segment.select(start, end, patterns, timestamps, series)
+        return timestamps, series
+
+    def close(self) -> None:
+        with self._lock:
+            if self._active:
+                self._active.close()
+                self._active = None
+
+    def _seal(self, segment: OpenSegment) -> None:
+        self._logger.debug('Sealing %s segment %s with %s rows', self.name, segment.start, segment.rows)
+        segment.seal(self._sealed_path(segment.start))
+
+    def _apply_retention(self, now: float) -> None:
+        for start in self._list(_SEALED_SUFFIX):
+            if start + self._segment_seconds < now - self.retention_seconds:
+                self._logger.info('Dropping %s segment %s past retention', self.name, start)
+                os.remove(self._sealed_path(start))
+
+    def _list(self, suffix: str) -> list[int]:
+        return [int(f[:-len(suffix)]) for f in os.listdir(self._directory) if f.endswith(suffix)]
+
+    def _open_path(self, start: int) -> str:
+        return os.path.join(self._directory, f'{start:012d}{_OPEN_SUFFIX}')
+
+    def _sealed_path(self, start: int) -> str:
+        return os.path.join(self._directory, f'{start:012d}{_SEALED_SUFFIX}')
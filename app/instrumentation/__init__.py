@@ -0,0 +1,118 @@
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from tracing import get_tracer
+
+
+STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class ExporterInstrumentation:
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        self._enabled = registry is not None
+        self._children = {}
+        if not self._enabled:
+            return
+        self._stage_duration = Histogram('att_modem_exporter_stage_duration_seconds',
+                                         'Time spent in each stage of producing modem data',
+                                         ['stage', 'gatherer', 'modem_id'], registry=registry, buckets=STAGE_BUCKETS)
+        self._cache_requests = Counter('att_modem_exporter_cache_requests',
+                                       'Cached gatherer lookups by result (hit, miss or stale)',
+                                       ['gatherer', 'modem_id', 'result'], registry=registry)
+        self._response_size = Histogram('att_modem_exporter_response_size_bytes',
+                                        'Size of modem page responses',
+                                        ['gatherer', 'modem_id'], registry=registry, buckets=SIZE_BUCKETS)
+        self._scrape_errors = Counter('att_modem_exporter_scrape_errors',
+                                      'Errors gathering modem data by exception type',
+                                      ['gatherer', 'modem_id', 'exception'], registry=registry)
+        self._active_series = Gauge('att_modem_exporter_active_series',
+                                    'Series currently exported by a mapper, including stale ones not yet evicted',
+                                    ['gatherer', 'modem_id'], registry=registry)
+        self._evicted_series = Counter('att_modem_exporter_evicted_series',
+                                       'Series removed after not being refreshed for SERIES_STALE_CYCLES refreshes',
+                                       ['gatherer', 'modem_id'], registry=registry)
+        self._budget_violations = Counter('att_modem_exporter_series_budget_violations',
+                                          'Refreshes that produced more series than SERIES_BUDGET_PER_MODEM allows',
+                                          ['modem_id'], registry=registry)
+        self._push_dropped = Counter('att_modem_exporter_push_dropped_batches',
+                                     'Push batches dropped, because the receiver rejected them or the queue was full',
+                                     ['reason'], registry=registry)
+        # Position of the modem_id label of each metric that has one, for removing the series of a modem
+        self._modem_label_positions = {id(metric): (metric, position) for metric, position in (
+            (self._stage_duration, 2), (self._cache_requests, 1), (self._response_size, 1), (self._scrape_errors, 1),
+            (self._active_series, 1), (self._evicted_series, 1), (self._budget_violations, 0))}
+
+    def is_enabled(self) -> bool:
+        return self._enabled
+
+    @contextmanager
+    def time_stage(self, stage: str, gatherer: str = '', modem_id: str = ''):
+        with get_tracer().span(stage, gatherer=gatherer, modem_id=modem_id):
+            if not self._enabled:
+                yield
+                return
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._child(self._stage_duration, stage, gatherer, modem_id).observe(time.perf_counter() - started)
+
+    def count_cache_request(self, gatherer: str, modem_id: str, result: str) -> None:
+        if self._enabled:
+            self._child(self._cache_requests, gatherer, modem_id, result).inc()
+
+    def observe_response_size(self, gatherer: str, modem_id: str, size: int) -> None:
+        if self._enabled:
+            self._child(self._response_size, gatherer, modem_id).observe(size)
+
+    def count_scrape_error(self, gatherer: str, modem_id: str, exc: BaseException) -> None:
+        if self._enabled:
+            self._child(self._scrape_errors, gatherer, modem_id, type(exc).__name__).inc()
+
+    def track_series(self, gatherer: str, modem_id: str, active: int, evicted: int) -> None:
+        if self._enabled:
+            self._child(self._active_series, gatherer, modem_id).set(active)
+            if evicted:
+                self._child(self._evicted_series, gatherer, modem_id).inc(evicted)
+
+    def count_series_budget_violation(self, modem_id: str) -> None:
+        if self._enabled:
+            self._child(self._budget_violations, modem_id).inc()
+
+    def count_push_dropped(self, reason: str, batches: int = 1) -> None:
+        if self._enabled:
+            self._child(self._push_dropped, reason).inc(batches)
+
+    def remove_modem(self, modem_id: str) -> None:
+        if not self._enabled:
+            return
+        for key in list(self._children):
+            metric, position = self._modem_label_positions.get(key[0], (None, None))
+            if metric is not None and key[1][position] == modem_id and self._children.pop(key, None) is not None:
+                metric.remove(*key[1])
+
+    def _child(self, metric, *label_values):
+        # labels() takes a lock and rebuilds the key on every call, so keep the children
+        key = (id(metric), label_values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = metric.labels(*label_values)
+        return child
+
+
+_instrumentation = ExporterInstrumentation()
+
+
+def configure_instrumentation(registry: Optional[CollectorRegistry]) -> ExporterInstrumentation:
+    global _instrumentation
+    _instrumentation = ExporterInstrumentation(registry)
+    return _instrumentation
+
+
+def get_instrumentation() -> ExporterInstrumentation:
+    return _instrumentation
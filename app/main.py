@@ -1,18 +1,8 @@
 import logging
+import sys
 
-from modem_prometheus_mappers.home_network_status_mapper import HomeNetworkStatusPrometheusMapper
-from modem_prometheus_mappers.system_information_mapper import SystemInformationPrometheusMapper
-from modem_prometheus_mappers.broadband_status_mapper import BroadbandStatusPrometheusMapper
-from prometheus_client import REGISTRY
-
-from prometheus_exporters import PrometheusExporter
-from modem_exporters import ModemDataGathererExporter
-from gatherers import CachingDataGatherer
-from modem_client import ModemClient, ModemConfig
-from modem_gatherers.broadband_status import BroadbandStatusGatherer
-from modem_gatherers.home_network_status import HomeNetworkStatusGatherer
-from modem_gatherers.system_information import SystemInformationGatherer
-from server import Server, ServerConfig
+# Heavy packages (FastAPI, uvicorn, prometheus_client, ...) are imported inside the factories below,
+# so each entry point only pays for the subsystems it uses
 
 # Configure logging
 logging.basicConfig(
@@ -21,23 +11,196 @@ logging.basicConfig(
 )
 
 
-def main():
-    # Start Prometheus metrics server
+def create_gatherers(modem_config):
+    from modem_client import ModemClient
+
+    return create_client_gatherers(ModemClient(modem_config))
+
+
+def create_client_gatherers(client):
+    from modem_gatherers.broadband_status import BroadbandStatusGatherer
+    from modem_gatherers.home_network_status import HomeNetworkStatusGatherer
+    from modem_gatherers.system_information import SystemInformationGatherer
+
+    return [SystemInformationGatherer(client), HomeNetworkStatusGatherer(client), BroadbandStatusGatherer(client)]
+
+
+def create_mappers(cached_gathers, registry):
+    from modem_prometheus_mappers.home_network_status_mapper import HomeNetworkStatusPrometheusMapper
+    from modem_prometheus_mappers.system_information_mapper import SystemInformationPrometheusMapper
+    from modem_prometheus_mappers.broadband_status_mapper import BroadbandStatusPrometheusMapper
+
+    return [ SystemInformationPrometheusMapper(cached_gathers[0], registry),
+             HomeNetworkStatusPrometheusMapper(cached_gathers[1], registry),
+             BroadbandStatusPrometheusMapper(cached_gathers[2], registry)]
+
+
+def create_bgw210_probe_mappers(client, registry):
+    from gatherers import CachingDataGatherer
+
+    return create_mappers(list(map(lambda g: CachingDataGatherer(g), create_client_gatherers(client))), registry)
+
+
+def create_exporters(cached_gathers, mappers, registry, history_store=None):
+    from prometheus_exporters import PrometheusExporter
+    from prometheus_exporters.scrape import ScrapeConfig
+    from debug_exporters import DebugConfig, create_debug_exporters
+    from exporters.delta import DeltaConfig
+    from fleet import get_fleet
+    from fleet_exporters import FleetAggregateExporter
+    from modem_client import ModemConfig
+    from modem_exporters import ModemDataGathererExporter, ModemHistoryExporter, ModemStreamExporter, get_single_modem_id
+    from probe_exporters import ProbeConfig, ProbeExporter, ServiceDiscoveryExporter
+    from sharding import ModemShard, ShardConfig
+    from stream_exporters import StreamConfig
+
+    delta_config = DeltaConfig.from_env()
+    exporters = list(map(lambda cg: ModemDataGathererExporter(cg, delta_config), cached_gathers))
+    exporters.append(ModemStreamExporter(cached_gathers, StreamConfig.from_env()))
+    exporters.append(PrometheusExporter(mappers, registry, ScrapeConfig.from_env()))
+    if history_store:
+        exporters.append(ModemHistoryExporter(get_single_modem_id(cached_gathers), history_store))
+    modems = ModemConfig.list_from_env()
+    shard = ModemShard(ShardConfig.from_env(), modems) if modems else None
+    exporters.append(ProbeExporter({'bgw210': create_bgw210_probe_mappers}, ProbeConfig.from_env(), shard))
+    if shard:
+        exporters.append(ServiceDiscoveryExporter(shard, 'bgw210'))
+    if get_fleet() is not None:
+        exporters.append(FleetAggregateExporter(get_fleet()))
+    exporters.extend(create_debug_exporters(DebugConfig.from_env()))
+    return exporters
+
+
+def get_snapshot_name(modem_config, gatherer) -> str:
+    return f'{modem_config.id}-{gatherer.get_name()}'
+
+
+def create_server():
+    from prometheus_client import REGISTRY
+    from fleet import FleetConfig, configure_fleet
+    from gatherers import CachingDataGatherer
+    from history_exporters import HistoryConfig, HistoryRecorder
+    from instrumentation import configure_instrumentation
+    from modem_client import ModemConfig
+    from modem_exporters import create_modem_history_store
+    from modem_gatherers.parsing import ParseConfig, configure_parse_pool
+    from modem_prometheus_mappers.label_policy import LabelPolicy, configure_label_policy
+    from prometheus_exporters.series import SeriesConfig, configure_series_tracking
+    from push_exporters import MetricsPusher, PushConfig
+    from server import Server, ServerConfig
+    from tracing import TracingConfig, configure_tracing
 
     registry = REGISTRY
-    
+    configure_instrumentation(registry)
+    configure_series_tracking(SeriesConfig.from_env())
+    configure_label_policy(LabelPolicy.from_env())
+    configure_tracing(TracingConfig.from_env())
+    configure_parse_pool(ParseConfig.from_env())
+    configure_fleet(FleetConfig.from_env())
     modem_config = ModemConfig.from_env()
-    client = ModemClient(modem_config)
-    gathers = [SystemInformationGatherer(client), HomeNetworkStatusGatherer(client), BroadbandStatusGatherer(client)]
+    gathers = create_gatherers(modem_config)
     cached_gathers = list(map(lambda g: CachingDataGatherer(g), gathers))
-    mappers = [ SystemInformationPrometheusMapper(cached_gathers[0], registry), 
-                HomeNetworkStatusPrometheusMapper(cached_gathers[1], registry),
-                BroadbandStatusPrometheusMapper(cached_gathers[2], registry)]
-    exporters = list(map(lambda cg: ModemDataGathererExporter(cg), cached_gathers))
-    exporters.append(PrometheusExporter(mappers, registry))        
+    mappers = create_mappers(cached_gathers, registry)
+    push_config = PushConfig.from_env()
+    if push_config:
+        MetricsPusher(push_config, mappers, registry).start()
+    history_config = HistoryConfig.from_env()
+    history_store = None
+    if history_config:
+        history_store = create_modem_history_store(modem_config.id, history_config)
+        # LAN port and broadband counters
+        HistoryRecorder(cached_gathers[1:], history_store, history_config).start()
+    return Server(ServerConfig.from_env(), create_exporters(cached_gathers, mappers, registry, history_store))
+
+
+def create_app():
+    return create_server().get_app()
+
+
+def create_worker_app():
+    from prometheus_client import REGISTRY
+    from instrumentation import configure_instrumentation
+    from modem_client import ModemConfig
+    from modem_prometheus_mappers.label_policy import LabelPolicy, configure_label_policy
+    from prometheus_exporters.series import SeriesConfig, configure_series_tracking
+    from server import Server, ServerConfig
+    from shared_snapshots import SharedSnapshotGatherer, SnapshotConfig, SnapshotSegment
+    from tracing import TracingConfig, configure_tracing
+
+    modem_config = ModemConfig.from_env()
+    snapshot_config = SnapshotConfig.from_env()
+    configure_instrumentation(REGISTRY)
+    configure_series_tracking(SeriesConfig.from_env())
+    configure_label_policy(LabelPolicy.from_env())
+    configure_tracing(TracingConfig.from_env())
+    shared_gathers = [SharedSnapshotGatherer(g, SnapshotSegment(
+                          snapshot_config.get_segment_path(get_snapshot_name(modem_config, g)), snapshot_config.capacity))
+                      for g in create_gatherers(modem_config)]
+    server = Server(ServerConfig.from_env(),
+                    create_exporters(shared_gathers, create_mappers(shared_gathers, REGISTRY), REGISTRY))
+    return server.get_app()
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='AT&T modem exporter')
+    parser.add_argument('--once', action='store_true',
+                        help='gather every modem once, write the result and exit instead of starting the server')
+    parser.add_argument('--format', choices=('prom', 'json'), default='prom',
+                        help='--once output: Prometheus text, such as for the node_exporter textfile collector, or JSON')
+    parser.add_argument('--out', default='-', help='--once output file, replaced atomically, or - for standard output')
+    return parser.parse_args(argv)
+
+
+def run_once(output_format: str, out: str) -> int:
+    # Imports nothing from the server, so a cron job or textfile collector run does not load FastAPI or uvicorn
+    from prometheus_client import CollectorRegistry
+    from modem_client import ModemClient, ModemConfig
+    from modem_prometheus_mappers.label_policy import LabelPolicy, configure_label_policy
+    from oneshot import collect_json, collect_prometheus, write_atomic
+    from prometheus_exporters.scrape import ScrapeConfig
+
+    configure_label_policy(LabelPolicy.from_env())
+    scrape_config = ScrapeConfig.from_env()
+    clients = [ModemClient(config) for config in ModemConfig.list_from_env() or [ModemConfig.from_env()]]
+    modem_gathers = [create_client_gatherers(client) for client in clients]
+    if output_format == 'json':
+        data, failed = collect_json([g for gathers in modem_gathers for g in gathers], scrape_config)
+    else:
+        registry = CollectorRegistry()
+        mappers = [m for gathers in modem_gathers for m in create_mappers(gathers, registry)]
+        data, failed = collect_prometheus(mappers, registry, scrape_config)
+    write_atomic(out, data)
+    for client in clients:
+        client.close()
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.once:
+        sys.exit(run_once(args.format, args.out))
+
+    from modem_client import ModemConfig
+    from server import Server, ServerConfig
+
     server_config = ServerConfig.from_env()
-    server = Server(server_config, exporters)
-    server.start()
+    if server_config.workers > 1:
+        from modem_gatherers.parsing import ParseConfig, configure_parse_pool
+        from shared_snapshots import SnapshotConfig, SnapshotPublisher
+
+        # One poller in this process publishes snapshots, so the modem load does not grow with workers
+        configure_parse_pool(ParseConfig.from_env())
+        modem_config = ModemConfig.from_env()
+        snapshot_config = SnapshotConfig.from_env()
+        gathers = create_gatherers(modem_config)
+        publisher = SnapshotPublisher({get_snapshot_name(modem_config, g): g for g in gathers}, snapshot_config)
+        publisher.start()
+        Server.start_workers(server_config, 'main:create_worker_app', {'SNAPSHOT_DIR': snapshot_config.directory})
+        publisher.stop()
+        return
+    create_server().start()
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ import os
 import requests
 from bs4 import BeautifulSoup
 from requests.exceptions import RequestException, Timeout, ConnectionError
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 
 class ModemConfig:
@@ -28,25 +28,51 @@ class ModemConfig:
             access_code=os.getenv("MODEM_ACCESS_CODE", None)
         )
 
+    @staticmethod
+    def list_from_env() -> list['ModemConfig']:
+        # MODEMS is a comma-separated list of id=url, or of bare URLs identified by their host
+        access_code = os.getenv("MODEM_ACCESS_CODE", None)
+        modems = []
+        for item in os.getenv("MODEMS", "").split(","):
+            if not item.strip():
+                continue
+            id, _, url = item.strip().partition("=")
+            if not url or "://" in id:
+                id, url = "", item.strip()
+            modems.append(ModemConfig(id.strip() or urlparse(url.strip()).netloc, url.strip(), access_code))
+        return modems
+
 
 class ModemClient:
 
     def __init__(self, config: ModemConfig):
         self.config = config
-        self.session = requests.Session()
+        self._session = None
         self.nonce = None
         self.logged_in = False
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    def _fetch(self, path) -> requests.Response:
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _fetch(self, path, find_nonce: bool = True):
         full_url = urljoin(self.config.url, path)
         try:
             response = self.session.get(full_url, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            nonce_tag = soup.find('input', {'name': 'nonce'})
-            if nonce_tag:
-                self.nonce = nonce_tag['value']
+            if find_nonce:
+                soup = BeautifulSoup(response.text, 'html.parser')
+                nonce_tag = soup.find('input', {'name': 'nonce'})
+                if nonce_tag:
+                    self.nonce = nonce_tag['value']
             return response
         except Timeout:
             self.logger.error(f"Timeout connecting to {full_url}")
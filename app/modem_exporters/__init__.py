@@ -1,20 +1,62 @@
-from gatherers import CachingDataGatherer
-from exporters import DataGathererExporter
+import os
+
+from gatherers import CachingDataGatherer, DataGatherer
+from exporters import DataGathererExporter, normalize_gatherer_name
+from exporters.delta import DeltaConfig
+from history_exporters import HistoryConfig, HistoryDataExporter, HistoryStore
 from modem_gatherers import ModemClientDataGatherer
+from stream_exporters import SnapshotBroadcaster, StreamConfig, StreamDataExporter
 from urllib.parse import urljoin, quote
 
+
+def get_modem_id(gatherer: DataGatherer) -> str:
+    real_gatherer = gatherer
+    if isinstance(gatherer, CachingDataGatherer):
+        real_gatherer = gatherer.get_gatherer()
+    if not isinstance(real_gatherer, ModemClientDataGatherer):
+        raise ValueError('Not a subclass')
+    return real_gatherer.get_client_config().id
+
+
+def get_modem_base_endpoint(modem_id: str) -> str:
+    return urljoin('/modems/', f'{quote(modem_id)}/')
+
+
+def get_single_modem_id(gatherers: list[DataGatherer]) -> str:
+    modem_ids = {get_modem_id(g) for g in gatherers}
+    if len(modem_ids) != 1:
+        raise ValueError(f'gatherers should all belong to one modem and belong to {sorted(modem_ids)}')
+    return modem_ids.pop()
+
+
 class ModemDataGathererExporter(DataGathererExporter):
 
-    def __init__(self, gatherer: ModemClientDataGatherer):
-        super().__init__(gatherer)
-        real_gatherer = gatherer
-        if isinstance(gatherer, CachingDataGatherer):
-            real_gatherer = gatherer.get_gatherer()
-        if not isinstance(real_gatherer, ModemClientDataGatherer):
-            raise ValueError('Not a subclass')
-        self._modem_id = real_gatherer.get_client_config().id
+    def __init__(self, gatherer: ModemClientDataGatherer, delta_config: DeltaConfig = DeltaConfig()):
+        super().__init__(gatherer, delta_config)
+        self._modem_id = get_modem_id(gatherer)
 
     def get_export_endpoint(self) -> str:
-        base = urljoin('/modems/', f'{quote(self._modem_id)}/')
-        return urljoin(base, self._normalize_name())
+        return urljoin(get_modem_base_endpoint(self._modem_id), self._normalize_name())
+
+
+class ModemStreamExporter(StreamDataExporter):
+
+    def __init__(self, gatherers: list[ModemClientDataGatherer], config: StreamConfig):
+        self._modem_id = get_single_modem_id(gatherers)
+        broadcaster = SnapshotBroadcaster({normalize_gatherer_name(g.get_name()): g for g in gatherers}, config)
+        super().__init__(f'{self.__class__.__name__}({self._modem_id})',
+                         urljoin(get_modem_base_endpoint(self._modem_id), 'stream'),
+                         broadcaster)
+
+
+def create_modem_history_store(modem_id: str, config: HistoryConfig) -> HistoryStore:
+    return HistoryStore(os.path.join(config.directory, quote(modem_id, safe='')), config)
+
+
+class ModemHistoryExporter(HistoryDataExporter):
 
+    def __init__(self, modem_id: str, store: HistoryStore):
+        self._modem_id = modem_id
+        super().__init__(f'{self.__class__.__name__}({modem_id})',
+                         urljoin(get_modem_base_endpoint(modem_id), 'history'),
+                         store)
@@ -1,13 +1,48 @@
 import logging
 from abc import abstractmethod
+from collections.abc import Mapping
 from datetime import datetime, timedelta
 from logging import getLogger
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from bs4 import BeautifulSoup
 
 from gatherers import DataGatherer
+from instrumentation import get_instrumentation
 from modem_client import ModemClient
+from modem_gatherers.parsing import get_parse_pool, parse_tables
+
+
+class LazySections(Mapping):
+
+    def __init__(self, rows: dict[str, dict], mappers: dict[str, Callable[[dict], Any]]):
+        self._rows = rows
+        self._mappers = mappers
+        self._sections = {}
+
+    def __getitem__(self, key: str):
+        # Each section is converted from its table row the first time it is read
+        if key not in self._sections:
+            self._sections[key] = self._mappers[key](self._rows[key])
+        return self._sections[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._mappers
+
+    def __iter__(self):
+        return iter(self._mappers)
+
+    def __len__(self) -> int:
+        return len(self._mappers)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({list(self._mappers)})'
+
+    def __reduce__(self):
+        return dict, (self._asdict(),)
+
+    def _asdict(self) -> dict:
+        return {key: self[key] for key in self._mappers}
 
 
 class ModemClientDataGatherer(DataGatherer):
@@ -19,21 +54,39 @@ class ModemClientDataGatherer(DataGatherer):
         self._logger = getLogger(self.__class__.__name__)
 
     def gather(self):
+        instrumentation = get_instrumentation()
+        name = self.get_name()
+        modem_id = self.get_source_id()
+        pool = get_parse_pool()
         try:
-            response = self._client._fetch(self._uri)
-            stats = self._parse_html(response.text)
+            with instrumentation.time_stage('fetch', name, modem_id):
+                # With a parse pool the nonce is found by the worker parsing the page
+                response = self._client._fetch(self._uri, find_nonce=pool is None)
+            instrumentation.observe_response_size(name, modem_id, len(response.content))
+            with instrumentation.time_stage('parse', name, modem_id):
+                if pool is None:
+                    stats = self._parse_html(response.text)
+                else:
+                    stats, nonce = pool.parse(response.content, response.encoding)
+                    if nonce:
+                        self._client.nonce = nonce
             if not stats:
                 raise ValueError('No statistics found')
-            data = self._map(stats)
+            with instrumentation.time_stage('map', name, modem_id):
+                data = self._map(stats)
             self._logger.debug(f"Data -> {data}")
             return data
         except Exception as e:
+            instrumentation.count_scrape_error(name, modem_id, e)
             self._logger.error(f"Error gathering data from {self._uri}: {e}", exc_info=True)
             raise
 
     def get_client_config(self):
         return self._client.config
 
+    def get_source_id(self) -> str:
+        return self._client.config.id
+
     @abstractmethod
     def _map(self, stats: dict):
         pass
@@ -43,40 +96,7 @@ class ModemClientDataGatherer(DataGatherer):
         return self._parse_soup(soup)
 
     def _parse_soup(self, soup):
-        stats = {}
-        # Find all tables and iterate rows to find known labels
-        tables = soup.find_all('table')
-        for table in tables:
-            summary = table.get('summary', '')
-            self._logger.debug(f"Parsing table with summary: {summary}")
-            rows = table.find_all('tr')
-            for row in rows:
-                cols = row.find_all(['td', 'th'])
-                if not cols:
-                    continue
-
-                # First column is usually the label
-                label = cols[0].get_text(strip=True)
-                if not label:
-                    continue
-                # Subsequent columns are values for Line 1, Line 2, etc.
-                values = [c.get_text(strip=True) for c in cols[1:]]
-                if not values:
-                    continue
-                if summary:
-                    if summary not in stats:
-                        stats[summary] = {}
-                    data = stats[summary]
-                    level = f'{summary}.'
-                else:
-                    data = stats
-                    level = ''
-                if label in data:
-                    self._logger.warning(
-                        f"Duplicate label found: {level}{label}, overwriting previous values.")
-                data[label] = values
-                self._logger.debug(f"Found {level}{label} -> {values}")
-        return stats
+        return parse_tables(soup, self._logger)
 
     @staticmethod
     def _get_str_value(data: dict, label: str, required: bool = True, default: str = None) -> Optional[str]:
@@ -1,7 +1,7 @@
 from typing import TypedDict, Optional
 
 from modem_client import ModemClient
-from modem_gatherers import ModemClientDataGatherer
+from modem_gatherers import LazySections, ModemClientDataGatherer
 
 
 class BroadbandWanInformation(TypedDict):
@@ -70,23 +70,35 @@ class BroadbandStatus(TypedDict):
     ipv6_statistics: EthernetIPv6Statistics
 
 
+# The table each section of BroadbandStatus is mapped from
+SECTION_TABLES = dict(
+    broadband_wan_information='Summary of the most important WAN information',
+    ethernet_statistics='Ethernet Statistics Table',
+    ipv6_information='IPv6 Table',
+    ipv4_statistics='Ethernet IPv4 Statistics Table',
+    ipv6_statistics='IPv6 Statistics Table'
+)
+
+
 class BroadbandStatusGatherer(ModemClientDataGatherer):
 
     def __init__(self, client: ModemClient):
         super().__init__(client, '/cgi-bin/broadbandstatistics.ha')
 
-    def _map(self, stats: dict) -> Optional[BroadbandStatus]:
-        return BroadbandStatus(
-            broadband_wan_information=self._map_broadband_wan_information(
-                stats),
-            ethernet_statistics=self._map_ethernet_statistics(stats),
-            ipv6_information=self._map_ipv6_information(stats),
-            ipv4_statistics=self._map_ethernet_ipv4_statistics(stats),
-            ipv6_statistics=self._map_ethernet_ipv6_statistics(stats)
-        )
-
-    def _map_broadband_wan_information(self, stats: dict) -> Optional[BroadbandWanInformation]:
-        data = ModemClientDataGatherer._get_data_array_dict(stats, 'Summary of the most important WAN information')[0]
+    def _map(self, stats: dict) -> LazySections:
+        # A page missing a table fails here, while gathering; only converting each table row to its section is
+        # deferred, so sections nobody reads, such as the WAN information on a scrape, are never converted
+        rows = {key: ModemClientDataGatherer._get_data_array_dict(stats, table)[0]
+                for key, table in SECTION_TABLES.items()}
+        return LazySections(rows, dict(
+            broadband_wan_information=self._map_broadband_wan_information,
+            ethernet_statistics=self._map_ethernet_statistics,
+            ipv6_information=self._map_ipv6_information,
+            ipv4_statistics=self._map_ethernet_ipv4_statistics,
+            ipv6_statistics=self._map_ethernet_ipv6_statistics
+        ))
+
+    def _map_broadband_wan_information(self, data: dict) -> Optional[BroadbandWanInformation]:
         return BroadbandWanInformation(
             connection_source=ModemClientDataGatherer._get_str_upper_value(
                 data, 'Broadband Connection Source'),
@@ -111,8 +123,7 @@ class BroadbandStatusGatherer(ModemClientDataGatherer):
             mtu=ModemClientDataGatherer._get_int_value(data, 'MTU')
         )
 
-    def _map_ethernet_statistics(self, stats: dict) -> Optional[EthernetStatistics]:
-        data = ModemClientDataGatherer._get_data_array_dict(stats, 'Ethernet Statistics Table')[0]
+    def _map_ethernet_statistics(self, data: dict) -> Optional[EthernetStatistics]:
         return EthernetStatistics(
             line_state=ModemClientDataGatherer._get_str_upper_value(
                 data, 'Line State'),
@@ -122,8 +133,7 @@ class BroadbandStatusGatherer(ModemClientDataGatherer):
                 data, 'Current Duplex')
         )
 
-    def _map_ipv6_information(self, stats: dict) -> Optional[IPv6Information]:
-        data = ModemClientDataGatherer._get_data_array_dict(stats, 'IPv6 Table')[0]
+    def _map_ipv6_information(self, data: dict) -> Optional[IPv6Information]:
         return IPv6Information(
             status=ModemClientDataGatherer._get_str_upper_value(
                 data, 'Status'),
@@ -141,8 +151,7 @@ class BroadbandStatusGatherer(ModemClientDataGatherer):
                 data, 'Secondary DNS', False),
             mtu=ModemClientDataGatherer._get_int_value(data, 'MTU'))
 
-    def _map_ethernet_ipv4_statistics(self, stats: dict) -> Optional[EthernetIPv4Statistics]:
-        data = ModemClientDataGatherer._get_data_array_dict(stats, 'Ethernet IPv4 Statistics Table')[0]
+    def _map_ethernet_ipv4_statistics(self, data: dict) -> Optional[EthernetIPv4Statistics]:
         return EthernetIPv4Statistics(
             receive_packets=ModemClientDataGatherer._get_int_value(
                 data, 'Receive Packets'),
@@ -172,8 +181,7 @@ class BroadbandStatusGatherer(ModemClientDataGatherer):
                 data, 'Collisions')
         )
 
-    def _map_ethernet_ipv6_statistics(self, stats: dict) -> Optional[EthernetIPv6Statistics]:
-        data = ModemClientDataGatherer._get_data_array_dict(stats, 'IPv6 Statistics Table')[0]
+    def _map_ethernet_ipv6_statistics(self, data: dict) -> Optional[EthernetIPv6Statistics]:
         return EthernetIPv6Statistics(
             receive_packets=ModemClientDataGatherer._get_int_value(
                 data, 'Receive Packets', False),
@@ -0,0 +1,126 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+_logger = logging.getLogger(__name__)
+
+
+class ParseConfig:
+    workers: int
+    max_tasks_per_worker: int
+    max_pending: int
+
+    def __init__(self, workers: int = 0, max_tasks_per_worker: int = 500, max_pending: Optional[int] = None):
+        if workers is None or workers < 0:
+            raise ValueError("workers must not be negative")
+        if max_tasks_per_worker is None or max_tasks_per_worker < 1:
+            raise ValueError("max_tasks_per_worker must be at least 1")
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.workers = workers
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_pending = max_pending or max(1, workers * 4)
+
+    @staticmethod
+    def from_env():
+        max_pending = os.getenv('PARSE_MAX_PENDING', '').strip()
+        return ParseConfig(
+            workers=int(os.getenv('PARSE_WORKERS', '0').strip()),
+            max_tasks_per_worker=int(os.getenv('PARSE_MAX_TASKS_PER_WORKER', '500').strip()),
+            max_pending=int(max_pending) if max_pending else None
+        )
+
+
+def parse_tables(soup, logger: logging.Logger = _logger) -> dict:
+    stats = {}
+    # Find all tables and iterate rows to find known labels
+    tables = soup.find_all('table')
+    for table in tables:
+        summary = table.get('summary', '')
+        logger.debug(f"Parsing table with summary: {summary}")
+        rows = table.find_all('tr')
+        for row in rows:
+            cols = row.find_all(['td', 'th'])
+            if not cols:
+                continue
+
+            # First column is usually the label
+            label = cols[0].get_text(strip=True)
+            if not label:
+                continue
+            # Subsequent columns are values for Line 1, Line 2, etc.
+            values = [c.get_text(strip=True) for c in cols[1:]]
+            if not values:
+                continue
+            if summary:
+                if summary not in stats:
+                    stats[summary] = {}
+                data = stats[summary]
+                level = f'{summary}.'
+            else:
+                data = stats
+                level = ''
+            if label in data:
+                logger.warning(
+                    f"Duplicate label found: {level}{label}, overwriting previous values.")
+            data[label] = values
+            logger.debug(f"Found {level}{label} -> {values}")
+    return stats
+
+
+def parse_page(content: bytes, encoding: Optional[str]) -> tuple[dict, Optional[str]]:
+    # Runs in the pool workers: only the page bytes go in and only the tables and the nonce come back
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content.decode(encoding, errors='replace') if encoding else content, 'html.parser')
+    nonce_tag = soup.find('input', {'name': 'nonce'})
+    return parse_tables(soup), nonce_tag['value'] if nonce_tag else None
+
+
+class ParsePool:
+
+    def __init__(self, config: ParseConfig):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._config = config
+        self._slots = threading.BoundedSemaphore(config.max_pending)
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+
+    def parse(self, content: bytes, encoding: Optional[str]) -> tuple[dict, Optional[str]]:
+        # Gatherers wait for a slot rather than queueing pages without bound behind slow workers
+        with self._slots:
+            executor = self._executor
+            try:
+                return executor.submit(parse_page, content, encoding).result()
+            except BrokenProcessPool as e:
+                self._logger.warning('Parse worker died, restarting the pool and parsing in process: %s', e)
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = self._create_executor()
+                return parse_page(content, encoding)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # Workers are replaced after max_tasks_per_worker pages, so parser memory growth does not build up
+        return ProcessPoolExecutor(max_workers=self._config.workers, mp_context=multiprocessing.get_context('spawn'),
+                                   max_tasks_per_child=self._config.max_tasks_per_worker)
+
+
+_pool: Optional[ParsePool] = None
+
+
+def configure_parse_pool(config: Optional[ParseConfig]) -> Optional[ParsePool]:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+    _pool = ParsePool(config) if config is not None and config.workers > 0 else None
+    return _pool
+
+
+def get_parse_pool() -> Optional[ParsePool]:
+    return _pool
@@ -1,13 +1,23 @@
+from typing import Optional, get_type_hints
+
 from gatherers import CachingDataGatherer
 from modem_gatherers import ModemClientDataGatherer
 from prometheus_exporters import PrometheusMapper
-from prometheus_client import REGISTRY, CollectorRegistry, Gauge
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.metrics_core import Metric
+
+from instrumentation import get_instrumentation
+from modem_prometheus_mappers.label_policy import get_label_policy, get_series_budget
 
 
 class PrometheusModemMapper(PrometheusMapper):
+    # Metric prefixes and the TypedDicts of their values; integer keys other than labels and gauges are counters
+    counter_types: dict[str, type] = {}
+    counter_labels: tuple[str, ...] = ()
+    gauge_keys: frozenset[str] = frozenset()
 
     def __init__(self, gatherer: ModemClientDataGatherer, registry: CollectorRegistry):
-        super().__init__(gatherer, registry)
         if isinstance(gatherer, CachingDataGatherer):
             real_gatherer = gatherer.get_gatherer()
         else:
@@ -15,30 +25,49 @@ class PrometheusModemMapper(PrometheusMapper):
         if not isinstance(real_gatherer, ModemClientDataGatherer):
             raise ValueError(f'gatherer should be a sub-class of ModemClientDataGatherer and is type {type(gatherer)}')
         self._config = real_gatherer.get_client_config()
+        super().__init__(gatherer, registry)
+        self._label_policy = get_label_policy()
+        # Names and label values only depend on the modem, so they are built once rather than per scrape
+        self._metrics = {}
+        labels = tuple(self.get_common_labels())
+        label_values = tuple(self.get_common_label_values())
+        if self._label_policy.info_metric:
+            # Identity labels such as modem_url are only exported on att_modem_info
+            labels, label_values = labels[:1], label_values[:1]
+        self._common_labels = self._label_policy.apply_names(labels)
+        self._common_label_values = self._label_policy.apply_values(labels, label_values)
+        get_series_budget().register(self)
+
+    def _create_gauge_family(self, prefix: str, key: str, labels: tuple[str, ...]) -> GaugeMetricFamily:
+        metric = self._metrics.get((prefix, key))
+        if metric is None:
+            name = f'{prefix}_{key}' if prefix else key
+            metric = self._metrics[(prefix, key)] = (self.get_metric_name(name), self.get_metric_description(name))
+        return GaugeMetricFamily(metric[0], metric[1], labels=labels)
+
+    def _limit_families(self, families: list[Metric]) -> list[Metric]:
+        if not self._label_policy.series_budget:
+            return families
+        families, dropped = get_series_budget().limit(self._config.id, self, families, self._label_policy.series_budget)
+        if dropped:
+            get_instrumentation().count_series_budget_violation(self._config.id)
+        return families
 
-    def _get_or_create_gauge(self, name: str, labels: list[str]) -> Gauge:
-        metric_name = self.get_metric_name(name)
-        metric = self.get_registry()._names_to_collectors.get(metric_name, None)
-        if metric:
-            if isinstance(metric, Gauge):
-                # TODO check labels
-                return metric
-            else:
-                raise ValueError(f"Trying to create a Gauge {metric_name}, a metric is already registered with type {type(metric)}")
-        if not metric:
-            gauge = self._create_gauge(name, labels)
-        return gauge
-
-    def _create_gauge(self, name: str, labels: list[str]) -> Gauge:
-        metric_name = self.get_metric_name(name)
-        metric_desc = self.get_metric_description(name)
-        self._logger.debug("Creating Gauge('%s','%s',%s)", metric_name, metric_desc, labels)
-        return Gauge(metric_name, metric_desc, labels, registry=self.get_registry())
+    @classmethod
+    def get_counter_names(cls) -> list[str]:
+        names = []
+        for prefix, value_type in cls.counter_types.items():
+            for key, annotation in get_type_hints(value_type).items():
+                if key in cls.counter_labels or key in cls.gauge_keys or annotation not in (int, Optional[int]):
+                    continue
+                names.append(cls.get_metric_name(f'{prefix}_{key}' if prefix else key))
+        return names
 
     def get_registry(self) -> CollectorRegistry:
         return self._registry
 
-    def get_metric_name(self, name) -> str:
+    @classmethod
+    def get_metric_name(cls, name) -> str:
         return f"att_modem_{name}"
 
     def get_metric_description(self, name) -> str:
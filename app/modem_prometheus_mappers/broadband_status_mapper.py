@@ -1,22 +1,26 @@
 from prometheus_client import CollectorRegistry
-from modem_gatherers.broadband_status import BroadbandStatus, EthernetIPv4Statistics, BroadbandStatusGatherer
+from prometheus_client.core import GaugeMetricFamily
+from modem_gatherers.broadband_status import (BroadbandStatus, BroadbandStatusGatherer, EthernetIPv4Statistics,
+                                               EthernetIPv6Statistics)
 from modem_prometheus_mappers import PrometheusModemMapper
 
 class BroadbandStatusPrometheusMapper(PrometheusModemMapper):
+    counter_types = {'wan_ipv4': EthernetIPv4Statistics, 'wan_ipv6': EthernetIPv6Statistics}
 
     def __init__(self, gatherer: BroadbandStatusGatherer, registry: CollectorRegistry) -> None:
         super().__init__(gatherer, registry)
 
-    def _map(self, data: BroadbandStatus) -> None:
-        labels = self.get_common_labels()
-        label_values = self.get_common_label_values()
-        self._map_part('wan_ipv4', data['ipv4_statistics'], labels, label_values)
-        self._map_part('wan_ipv6', data['ipv6_statistics'], labels, label_values)
+    def _map(self, data: BroadbandStatus) -> list[GaugeMetricFamily]:
+        return self._map_part('wan_ipv4', data['ipv4_statistics']) + self._map_part('wan_ipv6', data['ipv6_statistics'])
 
-    def _map_part(self, prefix: str, data: any, labels: list[str], label_values: list[str]) -> None:
+    def _map_part(self, prefix: str, data: any) -> list[GaugeMetricFamily]:
+        families = []
         for k in data:
             v = data[k]
             if v is None:
                 self._logger.debug('Skipping key with no value %s.%s', prefix, k)
             else:
-                self._get_or_create_gauge(f'{prefix}_{k}', labels).labels(*label_values).set(v)
+                family = self._create_gauge_family(prefix, k, self._common_labels)
+                family.add_metric(self._common_label_values, v)
+                families.append(family)
+        return families
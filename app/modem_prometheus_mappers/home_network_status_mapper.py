@@ -1,24 +1,39 @@
 from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
 from modem_gatherers.home_network_status import HomeNetworkStatusGatherer, PortLanStatistics
 from modem_prometheus_mappers import PrometheusModemMapper
 
 class HomeNetworkStatusPrometheusMapper(PrometheusModemMapper):
+    counter_types = {'lan': PortLanStatistics}
+    counter_labels = ('lan_port',)
+    gauge_keys = frozenset({'transmit_speed'})
 
     def __init__(self, gatherer: HomeNetworkStatusGatherer, registry: CollectorRegistry) -> None:
         super().__init__(gatherer, registry)
+        self._labels = self._common_labels + ('lan_port',)
+        self._port_label_values = {}
 
-    def _map(self, data: list[PortLanStatistics]) -> None:
-        labels = self.get_common_labels() + [ 'lan_port' ]
-        for port in range(0, len(data)):
-            label_values = self.get_common_label_values() + [ data[port]['lan_port'] ]
-            for k in data[port]:
-                v = data[port][k]
-                if k == 'lan_port':
+    def _map(self, data: list[PortLanStatistics]) -> list[GaugeMetricFamily]:
+        families = {}
+        for port in data:
+            label_values = self._get_port_label_values(port['lan_port'])
+            for k in port:
+                v = port[k]
+                if k == 'lan_port' or v is None:
                     continue
                 elif k == 'state':
                     if v == 'UP':
                         v = 1
                     else:
                         v = 0
-                self._get_or_create_gauge(f'lan_{k}', labels).labels(*label_values).set(v)
+                family = families.get(k)
+                if family is None:
+                    family = families[k] = self._create_gauge_family('lan', k, self._labels)
+                family.add_metric(label_values, v)
+        return list(families.values())
 
+    def _get_port_label_values(self, lan_port) -> tuple[str, ...]:
+        label_values = self._port_label_values.get(lan_port)
+        if label_values is None:
+            label_values = self._port_label_values[lan_port] = self._common_label_values + (str(lan_port),)
+        return label_values
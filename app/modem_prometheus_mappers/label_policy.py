@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import threading
+from weakref import WeakKeyDictionary
+
+# Labels that identify a modem rather than a series; only these may be dropped or hashed
+IDENTITY_LABELS = ('modem_url', 'manufacturer', 'model_number', 'serial_number', 'mac_address')
+
+
+class LabelPolicy:
+    info_metric: bool
+    drop: frozenset[str]
+    hash: frozenset[str]
+    series_budget: int
+
+    def __init__(self, info_metric: bool = False, drop: list[str] = (), hash: list[str] = (), series_budget: int = 0):
+        for label in list(drop) + list(hash):
+            if label not in IDENTITY_LABELS:
+                raise ValueError(f"Only {', '.join(IDENTITY_LABELS)} can be dropped or hashed, not {label}")
+        if set(drop) & set(hash):
+            raise ValueError(f"Labels cannot be both dropped and hashed: {', '.join(sorted(set(drop) & set(hash)))}")
+        if series_budget is None or series_budget < 0:
+            raise ValueError("series_budget must not be negative")
+        self.info_metric = info_metric
+        self.drop = frozenset(drop)
+        self.hash = frozenset(hash)
+        self.series_budget = series_budget
+
+    @staticmethod
+    def from_env():
+        return LabelPolicy(
+            info_metric=os.getenv('LABEL_INFO_METRIC', 'false').strip().lower() in ('1', 'true', 'yes'),
+            drop=[label.strip() for label in os.getenv('LABEL_DROP', '').split(',') if label.strip()],
+            hash=[label.strip() for label in os.getenv('LABEL_HASH', '').split(',') if label.strip()],
+            series_budget=int(os.getenv('SERIES_BUDGET_PER_MODEM', '0').strip())
+        )
+
+    def apply_names(self, names: tuple[str, ...]) -> tuple[str, ...]:
+        return tuple(n for n in names if n not in self.drop)
+
+    def apply_values(self, names: tuple[str, ...], values: tuple) -> tuple[str, ...]:
+        return tuple(self._hash(str(v)) if n in self.hash else str(v) for n, v in zip(names, values)
+                     if n not in self.drop)
+
+    @staticmethod
+    def _hash(value: str) -> str:
+        return hashlib.sha256(value.encode()).hexdigest()[:16]
+
+
+class SeriesBudget:
+
+    def __init__(self):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._counts = {}
+        self._ranks = WeakKeyDictionary()
+        self._next_rank = 0
+        self._lock = threading.Lock()
+
+    def register(self, mapper) -> None:
+        with self._lock:
+            self._register(mapper)
+
+    def limit(self, modem_id: str, mapper, families: list, budget: int) -> tuple[list, int]:
+        count = sum(len(f.samples) for f in families)
+        with self._lock:
+            # Mappers that are gone, such as those of an evicted probe target, no longer use the budget
+            counts = self._counts.setdefault(modem_id, WeakKeyDictionary())
+            counts[mapper] = count
+            # The budget goes to mappers in the order they were created, whichever refreshes first, so the same
+            # series are dropped after every restart and a mapper gets its share back once earlier ones shrink
+            rank = self._register(mapper)
+            allowed = max(0, budget - sum(c for m, c in list(counts.items()) if self._ranks[m] < rank))
+        if count <= allowed:
+            return families, 0
+        self._logger.warning('%s would export %s series for modem %s, over its budget of %s series; dropping %s',
+                             mapper.__class__.__name__, count, modem_id, budget, count - allowed)
+        limited = []
+        for family in families:
+            if allowed <= 0:
+                break
+            if len(family.samples) > allowed:
+                family.samples = family.samples[:allowed]
+            limited.append(family)
+            allowed -= len(family.samples)
+        return limited, count - sum(len(f.samples) for f in limited)
+
+    def forget(self, modem_id: str) -> None:
+        with self._lock:
+            self._counts.pop(modem_id, None)
+
+    def _register(self, mapper) -> int:
+        rank = self._ranks.get(mapper)
+        if rank is None:
+            rank = self._ranks[mapper] = self._next_rank
+            self._next_rank += 1
+        return rank
+
+
+_policy = LabelPolicy()
+_budget = SeriesBudget()
+
+
+def configure_label_policy(policy: LabelPolicy) -> None:
+    global _policy, _budget
+    _policy = policy
+    _budget = SeriesBudget()
+
+
+def get_label_policy() -> LabelPolicy:
+    return _policy
+
+
+def get_series_budget() -> SeriesBudget:
+    return _budget
@@ -0,0 +1,58 @@
+import argparse
+import sys
+from typing import Iterable
+
+from modem_prometheus_mappers import PrometheusModemMapper
+from modem_prometheus_mappers.broadband_status_mapper import BroadbandStatusPrometheusMapper
+from modem_prometheus_mappers.home_network_status_mapper import HomeNetworkStatusPrometheusMapper
+from modem_prometheus_mappers.system_information_mapper import SystemInformationPrometheusMapper
+
+MAPPERS = (SystemInformationPrometheusMapper, HomeNetworkStatusPrometheusMapper, BroadbandStatusPrometheusMapper)
+RATE_WINDOWS = ('5m', '1h')
+RULES_FILE = 'prometheus/att-modem-recording-rules.yml'
+
+
+def get_recording_rules(mappers: Iterable[type[PrometheusModemMapper]] = MAPPERS,
+                        windows: Iterable[str] = RATE_WINDOWS) -> dict[str, list[dict[str, str]]]:
+    # Rules follow the level:metric:operations naming, with a per-modem sum of every counter and a sum per
+    # counter label, such as each LAN port, on mappers that have one
+    groups = {}
+    for window in windows:
+        rules = groups[f'att_modem_rates_{window}'] = []
+        for mapper in mappers:
+            levels = [('modem_id',)]
+            if mapper.counter_labels:
+                levels.append(('modem_id',) + mapper.counter_labels)
+            for name in mapper.get_counter_names():
+                for level in levels:
+                    rules.append({
+                        'record': f"{'_'.join(level)}:{name}:rate{window}",
+                        'expr': f"sum by ({', '.join(level)}) (rate({name}[{window}]))"
+                    })
+    return {name: rules for name, rules in groups.items() if rules}
+
+
+def render_recording_rules(groups: dict[str, list[dict[str, str]]]) -> str:
+    lines = ['# Generated from the modem mappers by modem_prometheus_mappers/recording_rules.py, do not edit',
+             'groups:']
+    for name, rules in groups.items():
+        lines += [f'  - name: {name}', '    rules:']
+        for rule in rules:
+            lines += [f"      - record: {rule['record']}", f"        expr: {rule['expr']}"]
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write Prometheus recording rules for the modem counters.')
+    parser.add_argument('--output', help=f'file to write, such as {RULES_FILE}, instead of standard output')
+    args = parser.parse_args()
+    rules = render_recording_rules(get_recording_rules())
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(rules)
+    else:
+        sys.stdout.write(rules)
+
+
+if __name__ == '__main__':
+    main()
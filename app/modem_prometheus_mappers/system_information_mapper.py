@@ -1,25 +1,35 @@
 from modem_gatherers.system_information import SystemInformationGatherer, SystemInformation
 from modem_prometheus_mappers import PrometheusModemMapper
-from prometheus_client import REGISTRY, CollectorRegistry
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
 
 class SystemInformationPrometheusMapper(PrometheusModemMapper):
 
     def __init__(self, gatherer: SystemInformationGatherer, registry: CollectorRegistry) -> None:
         super().__init__(gatherer, registry)
-
-    def _map(self, data: SystemInformation) -> None:
-        labels = self.get_common_labels() + [
+        self._identity_labels = tuple(self.get_common_labels()) + (
             'manufacturer',
             'model_number',
             'serial_number',
             'mac_address'
-        ]
-        gauge = self._get_or_create_gauge('uptime_seconds', labels)
-        label_values =  self.get_common_label_values() + [
+        )
+        self._labels = self._label_policy.apply_names(self._identity_labels)
+
+    def _map(self, data: SystemInformation) -> list[GaugeMetricFamily]:
+        identity_values = tuple(self.get_common_label_values()) + (
             data['manufacturer'],
             data['model_number'],
             data['serial_number'],
             data['mac_address']
-        ]
+        )
+        label_values = self._label_policy.apply_values(self._identity_labels, identity_values)
         value = data['time_since_last_reboot'].total_seconds()
-        gauge.labels(*label_values).set(value)
+        if self._label_policy.info_metric:
+            info = self._create_gauge_family('', 'info', self._labels)
+            info.add_metric(label_values, 1)
+            uptime = self._create_gauge_family('', 'uptime_seconds', self._common_labels)
+            uptime.add_metric(self._common_label_values, value)
+            return [info, uptime]
+        family = self._create_gauge_family('', 'uptime_seconds', self._labels)
+        family.add_metric(label_values, value)
+        return [family]
@@ -0,0 +1,82 @@
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from prometheus_client import CollectorRegistry
+
+from exporters import normalize_gatherer_name
+from gatherers import DataGatherer
+from prometheus_exporters import PrometheusMapper
+from prometheus_exporters.exposition import generate_text
+from prometheus_exporters.scrape import ParallelRefresher, ScrapeConfig
+
+FORMATS = ('prom', 'json')
+
+_logger = logging.getLogger(__name__)
+
+
+def to_json_value(value):
+    # The same encodings the JSON endpoints use, without importing FastAPI's encoder
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if hasattr(value, '_asdict'):
+        return value._asdict()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def write_atomic(path: Optional[str], data: bytes) -> None:
+    if not path or path == '-':
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return
+    # Readers such as the node_exporter textfile collector, which only reads *.prom, never see a partial file
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def collect_prometheus(mappers: list[PrometheusMapper], registry: CollectorRegistry,
+                       config: ScrapeConfig) -> tuple[bytes, int]:
+    # Refreshed like a scrape, so the output also has att_modem_scrape_success for each collector
+    refresher = ParallelRefresher(mappers, config)
+    registry.register(refresher)
+    refresher.refresh(config.timeout)
+    success = refresher.collect()[0]
+    return generate_text(registry), sum(1 for sample in success.samples if sample.value != 1)
+
+
+def collect_json(gatherers: list[DataGatherer], config: ScrapeConfig) -> tuple[bytes, int]:
+    # Keyed like the data endpoints, /modems/{modem_id}/{name}, with null for data that could not be gathered
+    document = {}
+    failed = 0
+    executor = ThreadPoolExecutor(max_workers=config.workers)
+    try:
+        futures = [executor.submit(gatherer.gather) for gatherer in gatherers]
+        wait(futures, timeout=config.timeout)
+        for gatherer, future in zip(gatherers, futures):
+            value = None
+            if not future.done():
+                _logger.warning('Gathering %s(%s) did not finish within %.2fs', gatherer.get_name(),
+                                gatherer.get_source_id(), config.timeout)
+                failed += 1
+            elif future.exception() is not None:
+                _logger.warning('Gathering %s(%s) failed: %s', gatherer.get_name(), gatherer.get_source_id(),
+                                future.exception())
+                failed += 1
+            else:
+                value = future.result()
+            document.setdefault(gatherer.get_source_id(), {})[normalize_gatherer_name(gatherer.get_name())] = value
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return (json.dumps(document, default=to_json_value, indent=2) + '\n').encode(), failed
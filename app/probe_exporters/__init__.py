@@ -0,0 +1,216 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from prometheus_client import CollectorRegistry, Gauge
+
+from exporters import DataExporter
+from instrumentation import get_instrumentation
+from modem_client import ModemClient, ModemConfig
+from modem_prometheus_mappers.label_policy import get_series_budget
+from prometheus_exporters import PrometheusMapper
+from prometheus_exporters.exposition import generate_text
+from sharding import ModemShard
+
+
+class ProbeConfig:
+    max_targets: int
+    idle_seconds: float
+
+    def __init__(self, max_targets: int = 64, idle_seconds: float = 600):
+        if max_targets is None or max_targets < 1:
+            raise ValueError("max_targets must be at least 1")
+        if idle_seconds is None or idle_seconds <= 0:
+            raise ValueError("idle_seconds must be positive")
+        self.max_targets = max_targets
+        self.idle_seconds = idle_seconds
+
+    @staticmethod
+    def from_env():
+        max_targets = int(os.getenv('PROBE_MAX_TARGETS', '64').strip())
+        idle_seconds = float(os.getenv('PROBE_IDLE_SECONDS', '600').strip())
+        return ProbeConfig(max_targets, idle_seconds)
+
+
+class ProbeTarget:
+
+    def __init__(self, client: ModemClient, create_mappers: Callable[[ModemClient, CollectorRegistry], list[PrometheusMapper]]):
+        self.client = client
+        self.registry = CollectorRegistry()
+        self.mappers = create_mappers(client, self.registry)
+        self.success = Gauge('att_modem_probe_success', 'Whether the last probe of the modem succeeded',
+                             registry=self.registry)
+        self.duration = Gauge('att_modem_probe_duration_seconds', 'How long the last probe of the modem took',
+                              registry=self.registry)
+        self.scrape_success = Gauge('att_modem_scrape_success', 'Whether the collector refreshed (1) or not (0)',
+                                    ['collector', 'modem_id'], registry=self.registry)
+        self.scrape_duration = Gauge('att_modem_scrape_duration_seconds', 'Time the collector took to refresh',
+                                     ['collector', 'modem_id'], registry=self.registry)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.closed = False
+
+
+class ProbeExporter(DataExporter):
+
+    def __init__(self, modules: dict[str, Callable[[ModemClient, CollectorRegistry], list[PrometheusMapper]]],
+                 config: ProbeConfig, shard: Optional[ModemShard] = None):
+        self._name = self.__class__.__name__
+        self._logger = logging.getLogger(self._name)
+        self._modules = modules
+        self._config = config
+        self._shard = shard
+        self._targets: OrderedDict[tuple, ProbeTarget] = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def export(self):
+        raise HTTPException(status_code=400, detail='target is required')
+
+    def export_request(self, request):
+        target = request.query_params.get('target', '').strip()
+        parsed = urlparse(target)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            raise HTTPException(status_code=400, detail='target must be an http or https URL')
+        if self._shard is not None and not self._shard.owns(target):
+            raise HTTPException(status_code=421, detail=f'{target} belongs to shard {self._shard.get_owner(target)}')
+        module = request.query_params.get('module', next(iter(self._modules)))
+        if module not in self._modules:
+            raise HTTPException(status_code=400, detail=f'Unknown module {module}, expected one of {sorted(self._modules)}')
+        modem_id = request.query_params.get('modem_id', parsed.netloc)
+        return self.probe(target, module, modem_id)
+
+    def probe(self, target: str, module: str, modem_id: str) -> bytes:
+        probe_target = self._get_target(target, module, modem_id)
+        probe_target.lock.acquire()
+        while probe_target.closed:
+            # Evicted between being looked up and being locked, so probe with a new target instead
+            probe_target.lock.release()
+            probe_target = self._get_target(target, module, modem_id)
+            probe_target.lock.acquire()
+        try:
+            started = time.perf_counter()
+            succeeded = True
+            for mapper in probe_target.mappers:
+                # Each mapper is refreshed on its own, so one failing section does not leave the others stale
+                refresh_started = time.perf_counter()
+                labels = (mapper.get_name(), mapper.get_source_id())
+                try:
+                    mapper.refresh()
+                    probe_target.scrape_success.labels(*labels).set(1)
+                except Exception as exc:
+                    self._logger.warning('Probe of %s failed refreshing %s: %s', target, mapper.get_name(), exc)
+                    probe_target.scrape_success.labels(*labels).set(0)
+                    succeeded = False
+                probe_target.scrape_duration.labels(*labels).set(time.perf_counter() - refresh_started)
+            probe_target.success.set(1 if succeeded else 0)
+            probe_target.duration.set(time.perf_counter() - started)
+            return generate_text(probe_target.registry)
+        finally:
+            probe_target.lock.release()
+
+    def get_target_count(self) -> int:
+        return len(self._targets)
+
+    def _get_target(self, target: str, module: str, modem_id: str) -> ProbeTarget:
+        key = (target, module, modem_id)
+        with self._lock:
+            now = time.monotonic()
+            probe_target = self._targets.get(key)
+            if probe_target is None:
+                client = ModemClient(ModemConfig(modem_id, target, None))
+                probe_target = self._targets[key] = ProbeTarget(client, self._modules[module])
+                self._logger.info('Created probe target %s (%s) using module %s', target, modem_id, module)
+            else:
+                self._targets.move_to_end(key)
+            probe_target.last_used = now
+            evicted = self._evict(now)
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name=f'{self._name}Sweeper', daemon=True)
+                self._sweeper.start()
+        self._close(evicted)
+        return probe_target
+
+    def _sweep(self) -> None:
+        # Idle targets are also evicted when no probes arrive, such as after Prometheus stops
+        while True:
+            time.sleep(self._config.idle_seconds / 2)
+            with self._lock:
+                evicted = self._evict(time.monotonic())
+                finished = not self._targets
+                if finished:
+                    self._sweeper = None
+            self._close(evicted)
+            if finished:
+                return
+
+    def _evict(self, now: float) -> list[tuple[tuple, ProbeTarget]]:
+        # Targets are kept in least recently used order, so stop at the first one still in use
+        evicted = []
+        while self._targets:
+            key, oldest = next(iter(self._targets.items()))
+            if len(self._targets) <= self._config.max_targets and now - oldest.last_used < self._config.idle_seconds:
+                break
+            del self._targets[key]
+            evicted.append((key, oldest))
+        return evicted
+
+    def _close(self, evicted: list[tuple[tuple, ProbeTarget]]) -> None:
+        # Outside the exporter lock, waiting for a probe of the target that is still running
+        for key, probe_target in evicted:
+            with probe_target.lock:
+                probe_target.closed = True
+                probe_target.client.close()
+            with self._lock:
+                # modem_id is chosen by the prober, so the modem's series go with the last of its targets
+                if not any(k[2] == key[2] for k in self._targets):
+                    get_instrumentation().remove_modem(key[2])
+                    get_series_budget().forget(key[2])
+            self._logger.info('Evicted probe target %s', key[0])
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return '/probe'
+
+    def get_export_endpoint_response_class(self):
+        return PlainTextResponse
+
+
+class ServiceDiscoveryExporter(DataExporter):
+
+    def __init__(self, shard: ModemShard, module: str):
+        self._name = self.__class__.__name__
+        self._shard = shard
+        self._module = module
+
+    def export(self):
+        return self._get_target_groups(self._shard.get_config().address)
+
+    def export_request(self, request):
+        # Without a configured address, targets point back at the address Prometheus reached this replica on
+        return self._get_target_groups(self._shard.get_config().address or request.headers.get('host'))
+
+    def _get_target_groups(self, address: str) -> list[dict]:
+        # Prometheus HTTP service discovery, with each modem probed through this replica's /probe
+        return [{'targets': [address],
+                 'labels': {'__metrics_path__': '/probe', '__param_target': modem.url, '__param_module': self._module,
+                            '__param_modem_id': modem.id, 'instance': modem.url,
+                            'shard': str(self._shard.get_config().index)}}
+                for modem in self._shard.get_modems()]
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return '/sd'
+
+    def get_export_endpoint_response_class(self):
+        return JSONResponse
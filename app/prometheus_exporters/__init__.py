@@ -1,10 +1,73 @@
 import logging
+import threading
 from abc import ABC, abstractmethod
+from typing import Iterable
+from weakref import WeakKeyDictionary
 
-from fastapi.responses import PlainTextResponse
-from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+from prometheus_client import REGISTRY, CollectorRegistry
+from prometheus_client.metrics_core import Metric
 from gatherers import DataGatherer
 from exporters import DataExporter
+from instrumentation import get_instrumentation
+from prometheus_exporters.exposition import (RenderedMetric, choose_exposition, generate_text, render_text_family,
+                                             render_text_samples)
+from prometheus_exporters.scrape import SCRAPE_TIMEOUT_HEADER, ParallelRefresher, ScrapeConfig
+from prometheus_exporters.series import SeriesTracker, get_series_config
+
+
+class MapperCollector:
+
+    def __init__(self):
+        self._mappers = []
+        self._merged = ((), ())
+
+    def add(self, mapper) -> None:
+        self._mappers = self._mappers + [mapper]
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def collect(self) -> Iterable[Metric]:
+        mappers = self._mappers
+        snapshot = tuple(m.get_families() for m in mappers)
+        cached_snapshot, merged = self._merged
+        if len(cached_snapshot) == len(snapshot) and all(a is b for a, b in zip(cached_snapshot, snapshot)):
+            return merged
+        # Several modems' mappers produce the same metric names, which must be exposed as one family each
+        by_name = {}
+        for mapper, families in zip(mappers, snapshot):
+            for position, family in enumerate(families):
+                by_name.setdefault(family.name, []).append((mapper, families, position))
+        merged = tuple(self._merge(entries) for entries in by_name.values())
+        self._merged = (snapshot, merged)
+        return merged
+
+    @staticmethod
+    def _merge(entries: list[tuple]) -> RenderedMetric:
+        first = entries[0][1][entries[0][2]]
+        if len(entries) == 1:
+            samples = first.samples
+        else:
+            samples = [s for _, families, position in entries for s in families[position].samples]
+
+        def render_text() -> bytes:
+            # Only mappers whose families changed render their samples again, the rest reuse their fragments
+            return render_text_family(first, [mapper.get_text_fragments(families)[position]
+                                              for mapper, families, position in entries])
+        return RenderedMetric(first.name, first.documentation, first.type, samples, render_text)
+
+
+_mapper_collectors = WeakKeyDictionary()
+_mapper_collectors_lock = threading.Lock()
+
+
+def get_mapper_collector(registry: CollectorRegistry) -> MapperCollector:
+    with _mapper_collectors_lock:
+        collector = _mapper_collectors.get(registry)
+        if collector is None:
+            collector = _mapper_collectors[registry] = MapperCollector()
+            registry.register(collector)
+        return collector
 
 
 class PrometheusMapper(ABC):
@@ -13,29 +76,83 @@ class PrometheusMapper(ABC):
         self._logger = logging.getLogger(self.__class__.__name__)
         self._gatherer = gatherer
         self._registry = registry
+        self._data = None
+        self._series = SeriesTracker(get_series_config().stale_cycles)
+        self._series_lock = threading.Lock()
+        self._fragments = ((), ())
+        if registry is not None:
+            get_mapper_collector(registry).add(self)
+
+    def get_name(self) -> str:
+        return self.__class__.__name__
+
+    def get_source_id(self) -> str:
+        return self._gatherer.get_source_id()
+
+    def get_families(self) -> tuple[Metric, ...]:
+        return self._series.get_families()
+
+    def get_text_fragments(self, families: tuple[Metric, ...]) -> tuple[tuple[bytes, dict[str, bytes]], ...]:
+        cached_families, fragments = self._fragments
+        if cached_families is not families:
+            fragments = tuple(render_text_samples(family) for family in families)
+            self._fragments = (families, fragments)
+        return fragments
 
     def refresh(self) -> None:
-        data = self._gatherer.gather()
-        self._map(data)
+        gatherer_name, source_id = self._gatherer.get_name(), self._gatherer.get_source_id()
+        try:
+            with get_instrumentation().time_stage('refresh', gatherer_name, source_id):
+                data = self._gatherer.gather()
+                families = None
+                if data is not self._data or not self._series.has_current():
+                    families = tuple(self._limit_families(list(self._map(data))))
+        except Exception:
+            with self._series_lock:
+                evicted = self._series.failed()
+                active = self._series.get_active_count()
+            get_instrumentation().track_series(gatherer_name, source_id, active, evicted)
+            raise
+        with self._series_lock:
+            # Scrapes collecting concurrently keep the tuple they started with
+            evicted = self._series.refreshed(families)
+            active = self._series.get_active_count()
+            self._data = data
+        get_instrumentation().track_series(gatherer_name, source_id, active, evicted)
+
+    def _limit_families(self, families: list[Metric]) -> list[Metric]:
+        return families
 
     @abstractmethod
-    def _map(self, data) -> None:
+    def _map(self, data) -> Iterable[Metric]:
         pass
 
 class PrometheusExporter(DataExporter):
 
-    def __init__(self, mappers: list[PrometheusMapper] = [], registry: CollectorRegistry = REGISTRY):
+    def __init__(self, mappers: list[PrometheusMapper] = [], registry: CollectorRegistry = REGISTRY,
+                 config: ScrapeConfig = None):
         self._name = self.__class__.__name__
         self._logger = logging.getLogger(self._name)
         self._mappers = mappers
         self._registry = registry
+        self._config = config or ScrapeConfig()
+        self._refresher = ParallelRefresher(mappers, self._config)
+        registry.register(self._refresher)
 
     def export(self):
-        for m in self._mappers:
-            m.refresh()
-        res = generate_latest(self._registry)
+        self._refresher.refresh(self._config.timeout)
+        with get_instrumentation().time_stage('exposition'):
+            res = generate_text(self._registry)
         return res
 
+    def export_request(self, request):
+        from fastapi.responses import Response
+        generate, content_type = choose_exposition(request.headers.get('accept'))
+        self._refresher.refresh(self._config.get_deadline_seconds(request.headers.get(SCRAPE_TIMEOUT_HEADER)))
+        with get_instrumentation().time_stage('exposition'):
+            res = generate(self._registry)
+        return Response(res, media_type=content_type)
+
     def get_name(self) -> str:
         return self._name
 
@@ -43,5 +160,6 @@ class PrometheusExporter(DataExporter):
         return '/metrics'
 
     def get_export_endpoint_response_class(self):
+        from fastapi.responses import PlainTextResponse
         return PlainTextResponse
 
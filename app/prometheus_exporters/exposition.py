@@ -0,0 +1,212 @@
+import math
+from typing import Callable
+
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.metrics_core import Metric
+from prometheus_client.utils import floatToGoString
+from prometheus_client import CONTENT_TYPE_LATEST as TEXT_CONTENT_TYPE
+from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST as OPENMETRICS_CONTENT_TYPE
+from prometheus_client.openmetrics.exposition import generate_latest as generate_openmetrics
+
+from exporters.encoding import parse_accept
+from prometheus_exporters.protobuf import bytes_field, double_field, encode_varint, int_field, string_field, uint_field
+
+PROTOBUF_MEDIA_TYPE = 'application/vnd.google.protobuf'
+PROTOBUF_PROTO = 'io.prometheus.client.MetricFamily'
+PROTOBUF_CONTENT_TYPE = f'{PROTOBUF_MEDIA_TYPE}; proto={PROTOBUF_PROTO}; encoding=delimited'
+
+# Samples the text format moves into a gauge of their own after the family
+_TEXT_OM_SUFFIXES = ('_created', '_gsum', '_gcount')
+
+# io.prometheus.client.MetricType
+_COUNTER, _GAUGE, _SUMMARY, _UNTYPED, _HISTOGRAM = 0, 1, 2, 3, 4
+
+
+class RenderedMetric(Metric):
+
+    def __init__(self, name: str, documentation: str, typ: str, samples: list,
+                 render_text: Callable[[], bytes]):
+        super().__init__(name, documentation, typ)
+        self.samples = samples
+        self._render_text = render_text
+        self._text = None
+
+    def get_text(self) -> bytes:
+        # Text exposition of the family, header included, as generate_latest() would render it
+        if self._text is None:
+            self._text = self._render_text()
+        return self._text
+
+
+class _Collected:
+
+    def __init__(self, metrics: list[Metric]):
+        self._metrics = metrics
+
+    def collect(self) -> list[Metric]:
+        return self._metrics
+
+
+def _escape_documentation(documentation: str) -> str:
+    return documentation.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _text_sample_line(sample) -> str:
+    labels = ''
+    if sample.labels:
+        labels = '{' + ','.join('{}="{}"'.format(k, v.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+                                for k, v in sorted(sample.labels.items())) + '}'
+    timestamp = ''
+    if sample.timestamp is not None:
+        timestamp = f' {int(float(sample.timestamp) * 1000):d}'
+    return f'{sample.name}{labels} {floatToGoString(sample.value)}{timestamp}\n'
+
+
+def render_text_samples(metric: Metric) -> tuple[bytes, dict[str, bytes]]:
+    lines, om_lines = [], {}
+    for sample in metric.samples:
+        for suffix in _TEXT_OM_SUFFIXES:
+            if sample.name == metric.name + suffix:
+                om_lines.setdefault(suffix, []).append(_text_sample_line(sample))
+                break
+        else:
+            lines.append(_text_sample_line(sample))
+    return ''.join(lines).encode('utf-8'), {k: ''.join(v).encode('utf-8') for k, v in om_lines.items()}
+
+
+def render_text_family(metric: Metric, fragments: list[tuple[bytes, dict[str, bytes]]]) -> bytes:
+    name, metric_type = metric.name, metric.type
+    if metric_type == 'counter':
+        name += '_total'
+    elif metric_type == 'info':
+        name, metric_type = name + '_info', 'gauge'
+    elif metric_type == 'stateset':
+        metric_type = 'gauge'
+    elif metric_type == 'gaugehistogram':
+        metric_type = 'histogram'
+    elif metric_type == 'unknown':
+        metric_type = 'untyped'
+    documentation = _escape_documentation(metric.documentation)
+    output = [f'# HELP {name} {documentation}\n# TYPE {name} {metric_type}\n'.encode('utf-8')]
+    output.extend(lines for lines, _ in fragments)
+    for suffix in sorted({s for _, om_lines in fragments for s in om_lines}):
+        output.append(f'# HELP {metric.name}{suffix} {documentation}\n# TYPE {metric.name}{suffix} gauge\n'
+                      .encode('utf-8'))
+        output.extend(om_lines[suffix] for _, om_lines in fragments if suffix in om_lines)
+    return b''.join(output)
+
+
+def generate_text(registry: CollectorRegistry) -> bytes:
+    output, pending = [], []
+    for metric in registry.collect():
+        if not isinstance(metric, RenderedMetric):
+            pending.append(metric)
+            continue
+        if pending:
+            output.append(generate_latest(_Collected(pending)))
+            pending = []
+        output.append(metric.get_text())
+    if pending:
+        output.append(generate_latest(_Collected(pending)))
+    return b''.join(output)
+
+
+def _encode_labels(labels: dict) -> bytes:
+    return b''.join(bytes_field(1, string_field(1, k) + string_field(2, v)) for k, v in sorted(labels.items()))
+
+
+def _encode_metric(labels: dict, field: int, value: bytes, timestamp) -> bytes:
+    encoded = _encode_labels(labels) + bytes_field(field, value)
+    if timestamp is not None:
+        encoded += int_field(6, int(timestamp * 1000))
+    return encoded
+
+
+def _encode_family(name: str, documentation: str, metric_type: int, metrics: list[bytes]) -> bytes:
+    family = string_field(1, name) + string_field(2, documentation) + uint_field(3, metric_type)
+    family += b''.join(bytes_field(4, m) for m in metrics)
+    return encode_varint(len(family)) + family
+
+
+def _group_samples(samples, ignored_label: str = None) -> dict:
+    groups = {}
+    for sample in samples:
+        labels = {k: v for k, v in sample.labels.items() if k != ignored_label}
+        groups.setdefault(tuple(sorted(labels.items())), []).append(sample)
+    return groups
+
+
+def _group_by_name(samples) -> dict:
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample.name, []).append(sample)
+    return groups
+
+
+def _encode_distribution(metric, field: int, extra_label: str, encode_extra) -> list[bytes]:
+    metrics = []
+    for labels, samples in _group_samples(metric.samples, extra_label).items():
+        count, total, extras, timestamp = 0, 0.0, b'', None
+        for sample in samples:
+            suffix = sample.name[len(metric.name):]
+            if suffix == '_count':
+                count = int(sample.value)
+            elif suffix == '_sum':
+                total = sample.value
+            elif extra_label in sample.labels:
+                extras += encode_extra(sample)
+            timestamp = timestamp or sample.timestamp
+        value = uint_field(1, count) + double_field(2, total) + extras
+        metrics.append(_encode_metric(dict(labels), field, value, timestamp))
+    return metrics
+
+
+def _encode_bucket(sample) -> bytes:
+    upper_bound = float(sample.labels['le'])
+    if math.isinf(upper_bound):
+        # The +Inf bucket is implied by the sample count
+        return b''
+    return bytes_field(3, uint_field(1, int(sample.value)) + double_field(2, upper_bound))
+
+
+def _encode_quantile(sample) -> bytes:
+    return bytes_field(3, double_field(1, float(sample.labels['quantile'])) + double_field(2, sample.value))
+
+
+def generate_protobuf(registry: CollectorRegistry) -> bytes:
+    output = []
+    for metric in registry.collect():
+        if metric.type == 'counter':
+            metrics = [_encode_metric(s.labels, 3, double_field(1, s.value), s.timestamp)
+                       for s in metric.samples if s.name == metric.name + '_total']
+            output.append(_encode_family(metric.name + '_total', metric.documentation, _COUNTER, metrics))
+        elif metric.type in ('gauge', 'info', 'stateset'):
+            name = metric.name + '_info' if metric.type == 'info' else metric.name
+            metrics = [_encode_metric(s.labels, 2, double_field(1, s.value), s.timestamp)
+                       for s in metric.samples if s.name == name]
+            output.append(_encode_family(name, metric.documentation, _GAUGE, metrics))
+        elif metric.type == 'histogram':
+            metrics = _encode_distribution(metric, 7, 'le', _encode_bucket)
+            output.append(_encode_family(metric.name, metric.documentation, _HISTOGRAM, metrics))
+        elif metric.type == 'summary':
+            metrics = _encode_distribution(metric, 4, 'quantile', _encode_quantile)
+            output.append(_encode_family(metric.name, metric.documentation, _SUMMARY, metrics))
+        else:
+            for name, samples in _group_by_name(metric.samples).items():
+                metrics = [_encode_metric(s.labels, 5, double_field(1, s.value), s.timestamp) for s in samples]
+                output.append(_encode_family(name, metric.documentation, _UNTYPED, metrics))
+    return b''.join(output)
+
+
+def choose_exposition(accept_header: str) -> tuple[Callable[[CollectorRegistry], bytes], str]:
+    for quality, _, media_type, params in parse_accept(accept_header):
+        if quality <= 0:
+            continue
+        if media_type == PROTOBUF_MEDIA_TYPE:
+            if params.get('proto') == PROTOBUF_PROTO and params.get('encoding') == 'delimited':
+                return generate_protobuf, PROTOBUF_CONTENT_TYPE
+        elif media_type == 'application/openmetrics-text':
+            return generate_openmetrics, OPENMETRICS_CONTENT_TYPE
+        elif media_type in ('text/plain', 'text/*', '*/*'):
+            return generate_text, TEXT_CONTENT_TYPE
+    return generate_text, TEXT_CONTENT_TYPE
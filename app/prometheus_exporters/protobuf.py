@@ -0,0 +1,40 @@
+import struct
+
+_DOUBLE = struct.Struct('<d')
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_key(field: int, wire_type: int) -> bytes:
+    return encode_varint(field << 3 | wire_type)
+
+
+def bytes_field(field: int, value: bytes) -> bytes:
+    return encode_key(field, 2) + encode_varint(len(value)) + value
+
+
+def string_field(field: int, value: str) -> bytes:
+    return bytes_field(field, value.encode())
+
+
+def double_field(field: int, value: float) -> bytes:
+    return encode_key(field, 1) + _DOUBLE.pack(value)
+
+
+def uint_field(field: int, value: int) -> bytes:
+    return encode_key(field, 0) + encode_varint(value)
+
+
+def int_field(field: int, value: int) -> bytes:
+    # int64 uses two's complement for negative values
+    return encode_key(field, 0) + encode_varint(value & 0xffffffffffffffff)
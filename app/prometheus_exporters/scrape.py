@@ -0,0 +1,122 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Iterable, Optional
+
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.metrics_core import Metric
+
+SCRAPE_TIMEOUT_HEADER = 'X-Prometheus-Scrape-Timeout-Seconds'
+
+
+class ScrapeConfig:
+    workers: int
+    timeout: float
+    timeout_offset: float
+
+    def __init__(self, workers: int = 8, timeout: float = 10.0, timeout_offset: float = 0.5):
+        if workers is None or workers < 1:
+            raise ValueError("workers must be at least 1")
+        if timeout is None or timeout <= 0:
+            raise ValueError("timeout must be positive")
+        if timeout_offset is None or timeout_offset < 0:
+            raise ValueError("timeout_offset must not be negative")
+        self.workers = workers
+        self.timeout = timeout
+        self.timeout_offset = timeout_offset
+
+    @staticmethod
+    def from_env():
+        return ScrapeConfig(
+            workers=int(os.getenv('SCRAPE_WORKERS', '8').strip()),
+            timeout=float(os.getenv('SCRAPE_TIMEOUT_SECONDS', '10').strip()),
+            timeout_offset=float(os.getenv('SCRAPE_TIMEOUT_OFFSET_SECONDS', '0.5').strip())
+        )
+
+    def get_deadline_seconds(self, scrape_timeout_header: Optional[str]) -> float:
+        if scrape_timeout_header:
+            try:
+                # Leave Prometheus some of its timeout for exposition and the response
+                return max(0.0, float(scrape_timeout_header) - self.timeout_offset)
+            except ValueError:
+                pass
+        return self.timeout
+
+
+class _Refresh:
+
+    def __init__(self, started: float):
+        self.started = started
+        self.duration = None
+        self.future: Optional[Future] = None
+
+
+class ParallelRefresher:
+
+    def __init__(self, mappers: list, config: ScrapeConfig):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._mappers = mappers
+        self._config = config
+        self._executor = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._results = ()
+
+    def refresh(self, deadline_seconds: float) -> None:
+        refreshes = {mapper: self._submit(mapper) for mapper in self._mappers}
+        wait([r.future for r in refreshes.values()], timeout=deadline_seconds)
+        now = time.monotonic()
+        results = []
+        for mapper, refresh in refreshes.items():
+            if not refresh.future.done():
+                self._logger.warning('Refreshing %s(%s) did not finish within %.2fs, exporting its previous data',
+                                     mapper.get_name(), mapper.get_source_id(), deadline_seconds)
+                results.append((mapper, False, now - refresh.started))
+            elif refresh.future.exception() is not None:
+                self._logger.warning('Refreshing %s(%s) failed: %s', mapper.get_name(), mapper.get_source_id(),
+                                     refresh.future.exception())
+                results.append((mapper, False, refresh.duration))
+            else:
+                results.append((mapper, True, refresh.duration))
+        self._results = tuple(results)
+
+    def collect(self) -> Iterable[Metric]:
+        success = GaugeMetricFamily('att_modem_scrape_success',
+                                    'Whether the collector refreshed within the scrape deadline (1) or not (0)',
+                                    labels=['collector', 'modem_id'])
+        duration = GaugeMetricFamily('att_modem_scrape_duration_seconds',
+                                     'Time the collector took to refresh, or has taken so far when it is late',
+                                     labels=['collector', 'modem_id'])
+        for mapper, succeeded, seconds in self._results:
+            labels = [mapper.get_name(), mapper.get_source_id()]
+            success.add_metric(labels, 1 if succeeded else 0)
+            duration.add_metric(labels, seconds)
+        return [success, duration]
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def _submit(self, mapper) -> _Refresh:
+        with self._lock:
+            refresh = self._in_flight.get(mapper)
+            if refresh is not None:
+                # A refresh still running from an earlier scrape is waited on again rather than duplicated
+                return refresh
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._config.workers,
+                                                    thread_name_prefix=self.__class__.__name__)
+            refresh = self._in_flight[mapper] = _Refresh(time.monotonic())
+            # Spans of the refresh belong to the trace of the scrape that started it
+            refresh.future = self._executor.submit(contextvars.copy_context().run, self._run, mapper, refresh)
+            return refresh
+
+    def _run(self, mapper, refresh: _Refresh) -> None:
+        try:
+            mapper.refresh()
+        finally:
+            refresh.duration = time.monotonic() - refresh.started
+            with self._lock:
+                self._in_flight.pop(mapper, None)
@@ -0,0 +1,106 @@
+import os
+
+from prometheus_client.metrics_core import Metric
+
+
+class SeriesConfig:
+    stale_cycles: int
+
+    def __init__(self, stale_cycles: int = 5):
+        if stale_cycles is None or stale_cycles < 0:
+            raise ValueError("stale_cycles must not be negative")
+        self.stale_cycles = stale_cycles
+
+    @staticmethod
+    def from_env():
+        return SeriesConfig(int(os.getenv('SERIES_STALE_CYCLES', '5').strip()))
+
+
+class SeriesTracker:
+
+    def __init__(self, stale_cycles: int):
+        self._stale_cycles = stale_cycles
+        self._generation = 0
+        # Generation in which the current snapshot was last confirmed by a refresh
+        self._seen_generation = 0
+        self._current = ()
+        # Series missing from the current snapshot: key -> (last seen generation, family, sample)
+        self._retained = {}
+        self._families = ()
+        self._active_count = 0
+
+    def get_families(self) -> tuple[Metric, ...]:
+        return self._families
+
+    def has_current(self) -> bool:
+        return bool(self._current)
+
+    def get_active_count(self) -> int:
+        return self._active_count
+
+    def refreshed(self, families: tuple[Metric, ...] = None) -> int:
+        self._generation += 1
+        changed = families is not None
+        if changed:
+            keys = {(s.name, tuple(s.labels.values())) for f in families for s in f.samples}
+            for family in self._current:
+                for sample in family.samples:
+                    key = (sample.name, tuple(sample.labels.values()))
+                    if key not in keys:
+                        self._retained[key] = (self._seen_generation, family, sample)
+            for key in keys.intersection(self._retained):
+                del self._retained[key]
+            self._current = families
+        self._seen_generation = self._generation
+        return self._expire(changed)
+
+    def failed(self) -> int:
+        self._generation += 1
+        return self._expire(False)
+
+    def _expire(self, changed: bool) -> int:
+        evicted = 0
+        if self._current and self._generation - self._seen_generation > self._stale_cycles:
+            evicted += sum(len(f.samples) for f in self._current)
+            self._current = ()
+            changed = True
+        for key, (seen_generation, _, _) in list(self._retained.items()):
+            if self._generation - seen_generation > self._stale_cycles:
+                del self._retained[key]
+                evicted += 1
+                changed = True
+        if changed:
+            self._families = self._build()
+            self._active_count = sum(len(f.samples) for f in self._families)
+        return evicted
+
+    def _build(self) -> tuple[Metric, ...]:
+        if not self._retained:
+            return self._current
+        retained = {}
+        for _, family, sample in self._retained.values():
+            retained.setdefault(family.name, (family, []))[1].append(sample)
+        families = []
+        for family in self._current:
+            if family.name in retained:
+                merged = Metric(family.name, family.documentation, family.type)
+                merged.samples = family.samples + retained.pop(family.name)[1]
+                family = merged
+            families.append(family)
+        for name, (family, samples) in retained.items():
+            merged = Metric(name, family.documentation, family.type)
+            merged.samples = samples
+            families.append(merged)
+        return tuple(families)
+
+
+_config = SeriesConfig()
+
+
+def configure_series_tracking(config: SeriesConfig) -> None:
+    global _config
+    _config = config
+
+
+def get_series_config() -> SeriesConfig:
+    return _config
@@ -0,0 +1,246 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import quote
+
+from prometheus_client import CollectorRegistry
+from prometheus_client import CONTENT_TYPE_LATEST as TEXT_CONTENT_TYPE
+
+from instrumentation import get_instrumentation
+from prometheus_exporters import PrometheusMapper
+from prometheus_exporters.exposition import generate_text
+from prometheus_exporters.protobuf import bytes_field, double_field, encode_varint, int_field, string_field
+
+PUSH_MODES = ('remote_write', 'pushgateway')
+
+
+class PushConfig:
+    mode: str
+    url: str
+    interval: timedelta
+    queue_dir: str
+    queue_max_batches: int
+    job: str
+    timeout: float
+
+    def __init__(self, mode: str, url: str, interval: timedelta = timedelta(seconds=30), queue_dir: str = None,
+                 queue_max_batches: int = 120, job: str = 'att-modem-exporter', timeout: float = 10):
+        if mode not in PUSH_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PUSH_MODES)}")
+        if not url:
+            raise ValueError("url is required")
+        if interval is None or interval.total_seconds() <= 0:
+            raise ValueError("interval must be positive")
+        if queue_max_batches is None or queue_max_batches < 1:
+            raise ValueError("queue_max_batches must be at least 1")
+        if not job:
+            raise ValueError("job is required")
+        self.mode = mode
+        self.url = url
+        self.interval = interval
+        self.queue_dir = queue_dir or os.path.join(tempfile.gettempdir(), 'att-modem-push-queue')
+        self.queue_max_batches = queue_max_batches
+        self.job = job
+        self.timeout = timeout
+
+    @staticmethod
+    def from_env():
+        mode = os.getenv('PUSH_MODE', '').strip()
+        if not mode:
+            return None
+        return PushConfig(
+            mode=mode,
+            url=os.getenv('PUSH_URL', '').strip(),
+            interval=timedelta(seconds=float(os.getenv('PUSH_INTERVAL_SECONDS', '30').strip())),
+            queue_dir=os.getenv('PUSH_QUEUE_DIR', '').strip() or None,
+            queue_max_batches=int(os.getenv('PUSH_QUEUE_MAX_BATCHES', '120').strip()),
+            job=os.getenv('PUSH_JOB', 'att-modem-exporter').strip(),
+            timeout=float(os.getenv('PUSH_TIMEOUT_SECONDS', '10').strip())
+        )
+
+
+def _snappy_literal(data: bytes) -> bytes:
+    size = len(data) - 1
+    if size < 60:
+        return bytes([size << 2]) + data
+    length_bytes = (size.bit_length() + 7) // 8
+    return bytes([(59 + length_bytes) << 2]) + size.to_bytes(length_bytes, 'little') + data
+
+
+def snappy_compress(data: bytes) -> bytes:
+    # Snappy block format with 4-byte hash matching and 2-byte offset copies, as used by remote write
+    output = [encode_varint(len(data))]
+    table = {}
+    literal_start = i = 0
+    end = len(data) - 4
+    while i <= end:
+        key = data[i:i + 4]
+        candidate = table.get(key)
+        table[key] = i
+        if candidate is None or i - candidate > 0xffff:
+            i += 1
+            continue
+        length = 4
+        while length < 64 and i + length < len(data) and data[candidate + length] == data[i + length]:
+            length += 1
+        if literal_start < i:
+            output.append(_snappy_literal(data[literal_start:i]))
+        output.append(bytes([(length - 1) << 2 | 2]) + (i - candidate).to_bytes(2, 'little'))
+        i += length
+        literal_start = i
+    if literal_start < len(data):
+        output.append(_snappy_literal(data[literal_start:]))
+    return b''.join(output)
+
+
+def encode_remote_write(registry: CollectorRegistry, timestamp_ms: int) -> bytes:
+    series = []
+    for metric in registry.collect():
+        for sample in metric.samples:
+            labels = dict(sample.labels, __name__=sample.name)
+            encoded = b''.join(bytes_field(1, string_field(1, k) + string_field(2, v)) for k, v in sorted(labels.items()))
+            timestamp = int(sample.timestamp * 1000) if sample.timestamp is not None else timestamp_ms
+            encoded += bytes_field(2, double_field(1, sample.value) + int_field(2, timestamp))
+            series.append(bytes_field(1, encoded))
+    return b''.join(series)
+
+
+def is_retryable(exc: Exception) -> bool:
+    # A batch rejected with a client error, such as out-of-order samples, is rejected again on every retry
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return True
+    return response.status_code >= 500 or response.status_code == 429
+
+
+class DiskRetryQueue:
+
+    def __init__(self, directory: str, max_batches: int):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._directory = directory
+        self._max_batches = max_batches
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, batch: bytes) -> None:
+        path = os.path.join(self._directory, f'{time.time_ns():020d}.batch')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(batch)
+        os.replace(path + '.tmp', path)
+        batches = self._list()
+        for dropped in batches[:max(0, len(batches) - self._max_batches)]:
+            self._logger.warning('Push queue is full, dropping oldest batch %s', dropped)
+            os.remove(os.path.join(self._directory, dropped))
+            get_instrumentation().count_push_dropped('queue_full')
+
+    def clear(self) -> int:
+        batches = self._list()
+        for batch in batches:
+            os.remove(os.path.join(self._directory, batch))
+        return len(batches)
+
+    def peek(self):
+        batches = self._list()
+        if not batches:
+            return None, None
+        path = os.path.join(self._directory, batches[0])
+        with open(path, 'rb') as f:
+            return path, f.read()
+
+    def remove(self, path: str) -> None:
+        os.remove(path)
+
+    def __len__(self) -> int:
+        return len(self._list())
+
+    def _list(self) -> list[str]:
+        return sorted(f for f in os.listdir(self._directory) if f.endswith('.batch'))
+
+
+class MetricsPusher:
+
+    def __init__(self, config: PushConfig, mappers: list[PrometheusMapper], registry: CollectorRegistry):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._config = config
+        self._mappers = mappers
+        self._registry = registry
+        self._queue = DiskRetryQueue(config.queue_dir, config.queue_max_batches)
+        self._stopped = threading.Event()
+        self._thread = None
+        self._session = None
+
+    def start(self) -> None:
+        self._logger.info('Pushing metrics every %s to %s using %s', self._config.interval, self._config.url,
+                          self._config.mode)
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def push(self) -> None:
+        for mapper in self._mappers:
+            try:
+                mapper.refresh()
+            except Exception as exc:
+                self._logger.warning('Error refreshing %s for push: %s', mapper.__class__.__name__, exc)
+        if self._config.mode == 'remote_write':
+            batch = snappy_compress(encode_remote_write(self._registry, int(time.time() * 1000)))
+        else:
+            batch = generate_text(self._registry)
+            # Each PUT replaces everything pushed before, so only the newest batch is worth sending
+            replaced = self._queue.clear()
+            if replaced:
+                self._logger.debug('Replacing %s queued Pushgateway batches with the newest one', replaced)
+        self._queue.put(batch)
+        self.flush()
+
+    def flush(self) -> int:
+        sent = 0
+        while True:
+            path, batch = self._queue.peek()
+            if path is None:
+                return sent
+            try:
+                self._send(batch)
+            except Exception as exc:
+                if is_retryable(exc):
+                    self._logger.warning('Push to %s failed, %s batches queued: %s', self._config.url,
+                                         len(self._queue), exc)
+                    return sent
+                self._logger.warning('Push to %s was rejected, dropping batch %s: %s', self._config.url,
+                                     os.path.basename(path), exc)
+                get_instrumentation().count_push_dropped('rejected')
+            else:
+                sent += 1
+            self._queue.remove(path)
+
+    def _send(self, batch: bytes) -> None:
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        if self._config.mode == 'remote_write':
+            response = self._session.post(self._config.url, data=batch, timeout=self._config.timeout, headers={
+                'Content-Encoding': 'snappy',
+                'Content-Type': 'application/x-protobuf',
+                'X-Prometheus-Remote-Write-Version': '0.1.0'
+            })
+        else:
+            url = f"{self._config.url.rstrip('/')}/metrics/job/{quote(self._config.job, safe='')}"
+            response = self._session.put(url, data=batch, timeout=self._config.timeout,
+                                         headers={'Content-Type': TEXT_CONTENT_TYPE})
+        response.raise_for_status()
+
+    def _run(self) -> None:
+        interval = self._config.interval.total_seconds()
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                self.push()
+            except Exception as exc:
+                self._logger.error('Error pushing metrics: %s', exc, exc_info=True)
+            self._stopped.wait(max(0.0, interval - (time.monotonic() - started)))
@@ -1,33 +1,42 @@
+import inspect
 import logging
 import os
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from urllib.parse import urljoin
 
-import uvicorn
-
 from exporters import DataExporter
+from exporters.encoding import choose_encoding
+from gatherers import DataUnavailableError
+from tracing import get_tracer
 
 
 class ServerConfig:
     hostname: str
     port: int
+    workers: int
 
-    def __init__(self, hostname: str, port: int):
+    def __init__(self, hostname: str, port: int, workers: int = 1):
         if not hostname:
             raise ValueError("hostname is required")
         if port is None or port < 1 or port > 65535:
             raise ValueError("port must be between 1 and 65535")
+        if workers is None or workers < 1:
+            raise ValueError("workers must be at least 1")
         self.hostname = hostname
         self.port = port
+        self.workers = workers
         self.address = f"http://{hostname}:{port}"
 
     @staticmethod
     def from_env():
         hostname = os.getenv('SERVER_HOSTNAME', '0.0.0.0').strip()
         port = int(os.getenv('SERVER_PORT', '8666').strip())
-        return ServerConfig(hostname, port)
+        workers = int(os.getenv('SERVER_WORKERS', '1').strip())
+        return ServerConfig(hostname, port, workers)
 
 
 class RegisteredEndpoint:
@@ -91,19 +100,47 @@ class Server:
             endpoints.append(self._register_exporter_routes(exporter))
 
     def start(self) -> None:
+        import uvicorn
         uvicorn.run(self._app, host=self._server_config.hostname, port=self._server_config.port)
 
+    def get_app(self) -> FastAPI:
+        return self._app
+
+    @staticmethod
+    def start_workers(server_config: ServerConfig, app_factory: str, env: Optional[dict[str, str]] = None) -> None:
+        import uvicorn
+        # Worker processes are spawned with this environment, and build their app from it
+        os.environ.update(env or {})
+        uvicorn.run(app_factory, factory=True, host=server_config.hostname, port=server_config.port,
+                    workers=server_config.workers)
+
     def _register_exporter_routes(self, exporter: DataExporter):
         endpoint = exporter.get_export_endpoint()
         response_class = exporter.get_export_endpoint_response_class()
         media_type = response_class.media_type
 
         self._logger.info(f"Registering route: {endpoint} {media_type} for exporter: {exporter.get_name()}")
-        
-        async def exporter_endpoint():
+        negotiate = media_type == JSONResponse.media_type
+
+        async def exporter_endpoint(request: Request, response: Response):
             try:
-                data = exporter.export()
+                tracer = get_tracer()
+                with tracer.start_trace('handler', route=endpoint, exporter=exporter.get_name()) as trace:
+                    data = await run_in_threadpool(self._export, exporter, request, negotiate)
+                    if negotiate:
+                        response.headers['Vary'] = 'Accept'
+                    if inspect.isawaitable(data):
+                        data = await data
+                if trace is not None and tracer.is_server_timing_enabled():
+                    # Responses returned as-is do not get the headers of the injected response
+                    headers = data.headers if isinstance(data, Response) else response.headers
+                    headers['Server-Timing'] = trace.get_server_timing()
                 return data
+            except HTTPException:
+                raise
+            except DataUnavailableError as exc:
+                self._logger.warning(f"Data for {exporter.get_name()} is not available yet: {exc}")
+                raise HTTPException(status_code=503, detail=str(exc)) from exc
             except Exception as exc:
                 self._logger.error(f"Error exporting data from {exporter.get_name()}: {exc}", exc_info=True)
                 raise HTTPException(status_code=500, detail=f"Error retrieving data: {str(exc)}") from exc
@@ -112,5 +149,16 @@ class Server:
 
         return RegisteredEndpoint('GET', urljoin(self._server_config.address, endpoint), media_type)
 
+    @staticmethod
+    def _export(exporter: DataExporter, request: Request, negotiate: bool):
+        data = exporter.export_request(request)
+        # JSON routes also serve MessagePack and CBOR; exporters that build their own response negotiate themselves
+        if not negotiate or isinstance(data, Response) or inspect.isawaitable(data):
+            return data
+        encode, media_type = choose_encoding(request.headers.get('accept'))
+        if encode is None:
+            return data
+        return Response(encode(data), media_type=media_type, headers={'Vary': 'Accept'})
+
 
 
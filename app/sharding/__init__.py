@@ -0,0 +1,63 @@
+import hashlib
+import logging
+import os
+from typing import Optional
+
+from modem_client import ModemConfig
+
+
+class ShardConfig:
+    index: int
+    count: int
+    address: Optional[str]
+
+    def __init__(self, index: int = 0, count: int = 1, address: Optional[str] = None):
+        if count is None or count < 1:
+            raise ValueError("count must be at least 1")
+        if index is None or index < 0 or index >= count:
+            raise ValueError("index must be between 0 and count - 1")
+        self.index = index
+        self.count = count
+        self.address = address
+
+    @staticmethod
+    def from_env():
+        return ShardConfig(
+            index=int(os.getenv('SHARD_INDEX', '0').strip()),
+            count=int(os.getenv('SHARD_COUNT', '1').strip()),
+            address=os.getenv('SHARD_ADDRESS', '').strip() or None
+        )
+
+
+def get_shard(key: str, count: int) -> int:
+    # Rendezvous hashing: a key belongs to the shard with the highest weight for it, so changing the
+    # shard count only moves the keys whose highest weight is on an added or removed shard
+    return max(range(count), key=lambda shard: hashlib.blake2b(f'{shard}/{key}'.encode(), digest_size=8).digest())
+
+
+class ModemShard:
+
+    def __init__(self, config: ShardConfig, modems: list[ModemConfig]):
+        ids = [modem.id for modem in modems]
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"Modem ids must be unique: {', '.join(sorted({i for i in ids if ids.count(i) > 1}))}")
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._config = config
+        self._shards = {modem.url.rstrip('/'): get_shard(modem.id, config.count) for modem in modems}
+        self._modems = [modem for modem in modems if self._shards[modem.url.rstrip('/')] == config.index]
+        self._logger.info('Shard %s of %s owns %s of %s modems', config.index, config.count, len(self._modems),
+                          len(modems))
+
+    def get_config(self) -> ShardConfig:
+        return self._config
+
+    def get_modems(self) -> list[ModemConfig]:
+        return self._modems
+
+    def get_owner(self, url: str) -> Optional[int]:
+        return self._shards.get(url.rstrip('/'))
+
+    def owns(self, url: str) -> bool:
+        # Targets that are not in the configured fleet are probed by whichever replica is asked
+        owner = self.get_owner(url)
+        return owner is None or owner == self._config.index
@@ -0,0 +1,169 @@
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+from urllib.parse import quote
+
+from gatherers import CachingDataGatherer, DataGatherer, DataUnavailableError
+
+
+class SnapshotConfig:
+    directory: str
+    capacity: int
+    interval: timedelta
+
+    def __init__(self, directory: str, capacity: int = 1024 * 1024, interval: timedelta = timedelta(seconds=5)):
+        if not directory:
+            raise ValueError("directory is required")
+        if capacity is None or capacity < 1:
+            raise ValueError("capacity must be at least 1 byte")
+        if interval is None or interval.total_seconds() <= 0:
+            raise ValueError("interval must be positive")
+        self.directory = directory
+        self.capacity = capacity
+        self.interval = interval
+
+    @staticmethod
+    def from_env():
+        directory = os.getenv('SNAPSHOT_DIR', '').strip()
+        if not directory:
+            # The poller passes the directory on to the workers it starts
+            directory = tempfile.mkdtemp(prefix='att-modem-snapshots-')
+        capacity = int(os.getenv('SNAPSHOT_CAPACITY_BYTES', str(1024 * 1024)).strip())
+        interval = float(os.getenv('SNAPSHOT_INTERVAL_SECONDS', '5').strip())
+        return SnapshotConfig(directory, capacity, timedelta(seconds=interval))
+
+    def get_segment_path(self, name: str) -> str:
+        return os.path.join(self.directory, quote(name, safe='') + '.snapshot')
+
+
+class SnapshotSegment:
+    # sequence, slot 0 length, slot 1 length, published at
+    _HEADER = struct.Struct('<QQQd')
+
+    def __init__(self, path: str, capacity: int, create: bool = False):
+        self._path = path
+        self._capacity = capacity
+        size = self._HEADER.size + 2 * capacity
+        flags = os.O_RDWR | os.O_CREAT if create else os.O_RDWR
+        fd = os.open(path, flags, 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            elif os.fstat(fd).st_size != size:
+                raise ValueError(f'Snapshot segment {path} has size {os.fstat(fd).st_size} but was expecting {size}')
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        if create:
+            self._HEADER.pack_into(self._mmap, 0, 0, 0, 0, 0.0)
+        self._view = memoryview(self._mmap)
+
+    def get_sequence(self) -> int:
+        return struct.unpack_from('<Q', self._mmap, 0)[0]
+
+    def write(self, value) -> int:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self._capacity:
+            raise ValueError(f'Snapshot of {len(payload)} bytes exceeds segment capacity {self._capacity}')
+        sequence, *lengths, _ = self._HEADER.unpack_from(self._mmap, 0)
+        sequence += 1
+        # Readers only use the slot of the current sequence, so the other slot is free to overwrite
+        slot = sequence % 2
+        offset = self._slot_offset(slot)
+        self._mmap[offset:offset + len(payload)] = payload
+        lengths[slot] = len(payload)
+        self._HEADER.pack_into(self._mmap, 0, sequence, lengths[0], lengths[1], time.time())
+        return sequence
+
+    def read(self, known_sequence: int = 0):
+        while True:
+            header = self._HEADER.unpack_from(self._mmap, 0)
+            sequence, *lengths, published_at = header
+            if sequence == 0:
+                raise DataUnavailableError(f'No snapshot published yet in {self._path}, the modem may be unreachable')
+            if sequence == known_sequence:
+                return sequence, None, published_at
+            slot = sequence % 2
+            offset = self._slot_offset(slot)
+            try:
+                value = pickle.loads(self._view[offset:offset + lengths[slot]])
+                loaded = True
+            except Exception:
+                loaded = False
+            # The writer starts overwriting this slot as soon as the next snapshot is published, so the value is
+            # only whole if the header has not changed while it was read
+            if loaded and self._HEADER.unpack_from(self._mmap, 0) == header:
+                return sequence, value, published_at
+
+    def close(self) -> None:
+        self._view.release()
+        self._mmap.close()
+
+    def _slot_offset(self, slot: int) -> int:
+        return self._HEADER.size + slot * self._capacity
+
+
+class SharedSnapshotGatherer(CachingDataGatherer):
+
+    def __init__(self, gatherer: DataGatherer, segment: SnapshotSegment):
+        super().__init__(gatherer)
+        self._segment = segment
+        self._sequence = 0
+        self._value = None
+        self._published_at = None
+
+    def gather(self):
+        sequence, value, published_at = self._segment.read(self._sequence)
+        if sequence != self._sequence:
+            self._logger.debug('Loaded shared snapshot %s for gatherer %s', sequence, self.get_name())
+            self._sequence = sequence
+            self._value = value
+        self._published_at = published_at
+        return self._value
+
+    def get_snapshot_age(self) -> Optional[float]:
+        if self._published_at is None:
+            return None
+        return max(0.0, time.time() - self._published_at)
+
+
+class SnapshotPublisher:
+
+    def __init__(self, gatherers: dict[str, DataGatherer], config: SnapshotConfig):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._config = config
+        self._gatherers = gatherers
+        self._segments = {name: SnapshotSegment(config.get_segment_path(name), config.capacity, create=True)
+                          for name in gatherers}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def publish(self) -> None:
+        for name, gatherer in self._gatherers.items():
+            try:
+                self._segments[name].write(gatherer.gather())
+            except Exception as exc:
+                self._logger.error('Error publishing snapshot %s: %s', name, exc)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        interval = self._config.interval.total_seconds()
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            self.publish()
+            self._stopped.wait(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from exporters import DataExporter, to_exportable
+from gatherers import DataGatherer
+
+
+class StreamConfig:
+    interval: timedelta
+    client_queue_size: int
+
+    def __init__(self, interval: timedelta = timedelta(seconds=5), client_queue_size: int = 16):
+        if interval is None or interval.total_seconds() <= 0:
+            raise ValueError("interval must be positive")
+        if client_queue_size is None or client_queue_size < 1:
+            raise ValueError("client_queue_size must be at least 1")
+        self.interval = interval
+        self.client_queue_size = client_queue_size
+
+    @staticmethod
+    def from_env():
+        interval = float(os.getenv('STREAM_INTERVAL_SECONDS', '5').strip())
+        client_queue_size = int(os.getenv('STREAM_CLIENT_QUEUE_SIZE', '16').strip())
+        return StreamConfig(timedelta(seconds=interval), client_queue_size)
+
+
+def flatten_snapshot(value, prefix: str = '') -> dict:
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value}
+    flat = {}
+    for k, v in items:
+        flat.update(flatten_snapshot(v, f'{prefix}.{k}' if prefix else str(k)))
+    return flat
+
+
+def format_event(event: str, event_id: int, payload) -> bytes:
+    data = json.dumps(payload, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event}\ndata: {data}\n\n'.encode()
+
+
+class EventSourceResponse(StreamingResponse):
+    media_type = 'text/event-stream'
+
+
+class StreamSubscriber:
+
+    def __init__(self, queue_size: int, changes_only: bool):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.changes_only = changes_only
+        self.evicted = False
+
+    def offer(self, event: bytes) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def evict(self) -> None:
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class SnapshotBroadcaster:
+
+    def __init__(self, gatherers: dict[str, DataGatherer], config: StreamConfig):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._gatherers = gatherers
+        self._config = config
+        self._subscribers: set[StreamSubscriber] = set()
+        self._task = None
+        self._event_id = 0
+        self._raw = {}
+        self._flat = {}
+        self._latest = {}
+
+    def subscribe(self, changes_only: bool = False) -> StreamSubscriber:
+        subscriber = StreamSubscriber(self._config.client_queue_size, changes_only)
+        for event in self._latest.values():
+            subscriber.offer(event)
+        self._subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def get_subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def _run(self) -> None:
+        interval = self._config.interval.total_seconds()
+        while self._subscribers:
+            await self.poll()
+            await asyncio.sleep(interval)
+
+    async def poll(self) -> None:
+        for name, gatherer in self._gatherers.items():
+            try:
+                value = await asyncio.to_thread(gatherer.gather)
+            except Exception as exc:
+                self._logger.warning('Error gathering %s for stream: %s', name, exc)
+                continue
+            if value is self._raw.get(name):
+                continue
+            self._raw[name] = value
+            self._publish(name, jsonable_encoder(to_exportable(value)))
+
+    def _publish(self, name: str, snapshot) -> None:
+        flat = flatten_snapshot(snapshot)
+        previous = self._flat.get(name)
+        self._flat[name] = flat
+        self._event_id += 1
+        full_event = format_event(name, self._event_id, snapshot)
+        self._latest[name] = full_event
+        changes_event = full_event
+        if previous is not None:
+            changes = {k: v for k, v in flat.items() if k not in previous or previous[k] != v}
+            changes.update({k: None for k in previous if k not in flat})
+            changes_event = format_event(name, self._event_id, changes) if changes else None
+        for subscriber in list(self._subscribers):
+            event = changes_event if subscriber.changes_only else full_event
+            if event is None:
+                continue
+            if not subscriber.offer(event):
+                self._logger.warning('Evicting slow stream subscriber for %s', name)
+                self.unsubscribe(subscriber)
+                subscriber.evict()
+
+
+class StreamDataExporter(DataExporter):
+
+    def __init__(self, name: str, endpoint: str, broadcaster: SnapshotBroadcaster):
+        self._name = name
+        self._endpoint = endpoint
+        self._broadcaster = broadcaster
+
+    def export(self):
+        return self._stream(False)
+
+    def export_request(self, request):
+        changes_only = request.query_params.get('mode', 'full') == 'changes'
+        return EventSourceResponse(self._stream(changes_only), headers={'Cache-Control': 'no-cache'})
+
+    async def _stream(self, changes_only: bool):
+        subscriber = self._broadcaster.subscribe(changes_only)
+        try:
+            while True:
+                event = await subscriber.queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            self._broadcaster.unsubscribe(subscriber)
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_export_endpoint(self) -> str:
+        return self._endpoint
+
+    def get_export_endpoint_response_class(self):
+        return EventSourceResponse
@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+TRACE_SINKS = ('jsonl', 'otlp')
+
+
+class TracingConfig:
+    sample_rate: float
+    sink: Optional[str]
+    file: Optional[str]
+    otlp_url: str
+    service_name: str
+    server_timing: bool
+
+    def __init__(self, sample_rate: float = 0.0, sink: Optional[str] = None, file: Optional[str] = None,
+                 otlp_url: str = 'http://127.0.0.1:4318/v1/traces', service_name: str = 'att-modem-exporter',
+                 server_timing: bool = True):
+        if sample_rate is None or sample_rate < 0 or sample_rate > 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if sink is not None and sink not in TRACE_SINKS:
+            raise ValueError(f"sink must be one of {', '.join(TRACE_SINKS)}")
+        if sample_rate > 0 and sink is None:
+            raise ValueError("sink is required when traces are sampled")
+        if sink == 'jsonl' and not file:
+            raise ValueError("file is required for the jsonl sink")
+        if sink == 'otlp' and not otlp_url:
+            raise ValueError("otlp_url is required for the otlp sink")
+        self.sample_rate = sample_rate
+        self.sink = sink
+        self.file = file
+        self.otlp_url = otlp_url
+        self.service_name = service_name
+        self.server_timing = server_timing
+
+    @staticmethod
+    def from_env():
+        return TracingConfig(
+            sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '0').strip()),
+            sink=os.getenv('TRACE_SINK', '').strip().lower() or None,
+            file=os.getenv('TRACE_FILE', '').strip() or None,
+            otlp_url=os.getenv('TRACE_OTLP_URL', 'http://127.0.0.1:4318/v1/traces').strip(),
+            service_name=os.getenv('TRACE_SERVICE_NAME', 'att-modem-exporter').strip(),
+            server_timing=os.getenv('TRACE_SERVER_TIMING', 'true').strip().lower() in ('1', 'true', 'yes')
+        )
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes')
+
+    def __init__(self, name: str, span_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+
+    def get_duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self, trace_id: str) -> dict:
+        return {'trace_id': trace_id, 'span_id': self.span_id, 'parent_span_id': self.parent_id, 'name': self.name,
+                'start_time_unix_nano': self.start_ns, 'end_time_unix_nano': self.end_ns,
+                'attributes': self.attributes}
+
+
+class Trace:
+
+    def __init__(self, sampled: bool):
+        self.trace_id = f'{random.getrandbits(128):032x}'
+        self.sampled = sampled
+        # Appended to from the request's threadpool thread and from refresh threads
+        self.spans: list[Span] = []
+
+    def get_server_timing(self) -> str:
+        durations = {}
+        for span in self.spans:
+            durations[span.name] = durations.get(span.name, 0.0) + span.get_duration_ms()
+        # Stages with several spans, such as one fetch per page, are summed
+        return ', '.join(f'{name};dur={duration:.2f}' for name, duration in durations.items())
+
+
+# The span the current request or thread is in; None outside of traced requests
+_current_span: ContextVar[Optional[tuple[Trace, Span]]] = ContextVar('current_span', default=None)
+
+
+class QueuedSpanSink(ABC):
+
+    def __init__(self, target: str, max_queued: int = 1000, interval: float = 1.0):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._target = target
+        self._interval = interval
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            # Requests never wait on the sink, which runs on the event loop; traces are dropped instead
+            self._dropped += 1
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        traces = []
+        while True:
+            try:
+                traces.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._dropped:
+            self._logger.warning('Dropped %s traces while the span queue was full', self._dropped)
+            self._dropped = 0
+        if not traces:
+            return
+        try:
+            self._write(traces)
+        except Exception as e:
+            self._logger.warning('Exporting %s traces to %s failed: %s', len(traces), self._target, e)
+
+    @abstractmethod
+    def _write(self, traces: list[Trace]) -> None:
+        pass
+
+
+class JsonLinesSpanSink(QueuedSpanSink):
+
+    def __init__(self, path: str, max_queued: int = 1000, interval: float = 1.0):
+        super().__init__(path, max_queued, interval)
+
+    def _write(self, traces: list[Trace]) -> None:
+        lines = ''.join(json.dumps(span.to_dict(trace.trace_id)) + '\n' for trace in traces for span in trace.spans)
+        with open(self._target, 'a') as file:
+            file.write(lines)
+
+
+class OtlpSpanSink(QueuedSpanSink):
+
+    def __init__(self, url: str, service_name: str, max_queued: int = 1000, interval: float = 1.0):
+        self._service_name = service_name
+        super().__init__(url, max_queued, interval)
+
+    def _write(self, traces: list[Trace]) -> None:
+        import requests
+        requests.post(self._target, json=self.encode(traces, self._service_name), timeout=10).raise_for_status()
+
+    @staticmethod
+    def encode(traces: list[Trace], service_name: str) -> dict:
+        # OTLP/HTTP JSON: https://opentelemetry.io/docs/specs/otlp/#json-protobuf-encoding
+        spans = []
+        for trace in traces:
+            for span in trace.spans:
+                spans.append({
+                    'traceId': trace.trace_id, 'spanId': span.span_id, 'parentSpanId': span.parent_id or '',
+                    'name': span.name, 'kind': 2 if span.parent_id is None else 1,
+                    'startTimeUnixNano': str(span.start_ns), 'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [{'key': k, 'value': {'stringValue': str(v)}} for k, v in span.attributes.items()]
+                })
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'att-modem-exporter'}, 'spans': spans}]
+        }]}
+
+
+class Tracer:
+
+    def __init__(self, config: Optional[TracingConfig] = None):
+        self._config = config
+        self._enabled = config is not None and (config.server_timing or config.sample_rate > 0)
+        self._sink = None
+        if config is not None and config.sample_rate > 0:
+            self._sink = JsonLinesSpanSink(config.file) if config.sink == 'jsonl' else \
+                OtlpSpanSink(config.otlp_url, config.service_name)
+
+    def is_enabled(self) -> bool:
+        return self._enabled
+
+    def is_server_timing_enabled(self) -> bool:
+        return self._enabled and self._config.server_timing
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes):
+        if not self._enabled:
+            yield None
+            return
+        trace = Trace(self._sink is not None and random.random() < self._config.sample_rate)
+        span = Span(name, f'{random.getrandbits(64):016x}', None, attributes)
+        trace.spans.append(span)
+        token = _current_span.set((trace, span))
+        try:
+            yield trace
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if trace.sampled:
+                self._sink.export(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        current = _current_span.get()
+        if current is None:
+            yield None
+            return
+        trace, parent = current
+        span = Span(name, f'{random.getrandbits(64):016x}', parent.span_id, attributes)
+        trace.spans.append(span)
+        token = _current_span.set((trace, span))
+        try:
+            yield span
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+
+    def close(self) -> None:
+        if self._sink is not None:
+            self._sink.close()
+
+
+_tracer = Tracer()
+
+
+def configure_tracing(config: Optional[TracingConfig]) -> Tracer:
+    global _tracer
+    _tracer.close()
+    _tracer = Tracer(config)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
@@ -0,0 +1,79 @@
+"""
+Response encoding benchmark.
+
+Maps the BGW210 pages in ``benchmarks/fixtures/bgw210`` into the documents
+served under ``/modems/{modem_id}/...`` and encodes each of them as JSON,
+the way the endpoint does with ``jsonable_encoder``, as MessagePack and as
+CBOR. Reports the encoded size and the best time per encode, and the time
+of a request for the same snapshot again, which is answered from the
+exporter's cache of encoded responses.
+
+Usage:
+    python benchmarks/encoding.py --repeats 5
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from unittest.mock import Mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from exporters import DataGathererExporter, normalize_gatherer_name, to_exportable  # noqa: E402
+from exporters.encoding import CBOR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, encode_cbor, encode_json, encode_msgpack  # noqa: E402
+from gatherers import DataGatherer  # noqa: E402
+from micro import FIXTURES_DIR, PAGES  # noqa: E402
+from modem_client import ModemClient, ModemConfig  # noqa: E402
+
+FORMATS = {
+    'json': ('application/json', lambda value: encode_json(jsonable_encoder(to_exportable(value)))),
+    'msgpack': (MSGPACK_MEDIA_TYPE, lambda value: encode_msgpack(to_exportable(value))),
+    'cbor': (CBOR_MEDIA_TYPE, lambda value: encode_cbor(to_exportable(value)))
+}
+
+
+class SnapshotGatherer(DataGatherer):
+
+    def __init__(self, name: str, value):
+        self._name = name
+        self._value = value
+
+    def gather(self):
+        return self._value
+
+    def get_name(self) -> str:
+        return self._name
+
+
+def best_seconds(function, repeats: int) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeats, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR, help='directory holding the modem pages')
+    parser.add_argument('--repeats', type=int, default=5, help='timing repeats, the best is reported')
+    args = parser.parse_args()
+
+    client = ModemClient(ModemConfig('bench', 'http://127.0.0.1', None))
+    print(f'{"endpoint":<22} {"format":<8} {"bytes":>7} {"encode µs":>10} {"cached µs":>10}')
+    for gatherer_class, page in PAGES.items():
+        gatherer = gatherer_class(client)
+        value = gatherer._map(gatherer._parse_html((args.fixtures / page).read_text()))
+        name = normalize_gatherer_name(gatherer.get_name())
+        for format_name, (media_type, encode) in FORMATS.items():
+            encoded = encode(value)
+            seconds = best_seconds(lambda: encode(value), args.repeats)
+            exporter = DataGathererExporter(SnapshotGatherer(gatherer.get_name(), value))
+            request = Mock(query_params={}, headers={'accept': media_type})
+            exporter.export_request(request)
+            cached = best_seconds(lambda: exporter.export_request(request), args.repeats)
+            print(f'{name:<22} {format_name:<8} {len(encoded):>7} {seconds * 1e6:>10.1f} {cached * 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
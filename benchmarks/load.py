@@ -0,0 +1,244 @@
+"""
+Load benchmark.
+
+Starts the exporter (``python app/main.py``) against a local fake modem
+that serves the pages in ``benchmarks/fixtures/bgw210`` and counts the
+requests it receives, then drives a weighted mix of ``/metrics``,
+``/modems/{id}/...``, ``/health`` and ``/endpoints`` requests at a target
+rate. Reports throughput and p50/p95/p99 latencies per request kind, and
+how many requests reached the fake modem, which shows how well the cache
+holds up under load.
+
+Requests are sent on a fixed schedule, and latency is measured from the
+time a request was due rather than from when a worker got to send it, so
+a saturated server shows up as growing latency instead of a lower rate.
+With ``--rate 0`` every worker sends its next request as soon as the last
+one completes.
+
+Usage:
+    python benchmarks/load.py --rate 50 --duration 20 --concurrency 16
+    python benchmarks/load.py --rate 0 --mix metrics=1 --modem-latency 0.3
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "bgw210"
+KINDS = ('metrics', 'modem', 'health', 'endpoints')
+
+
+class FakeModem(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures_dir: Path, latency: float):
+        super().__init__(('127.0.0.1', 0), FakeModemHandler)
+        self.pages = {f'/cgi-bin/{page.name}': page.read_bytes() for page in fixtures_dir.glob('*.ha')}
+        self.latency = latency
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def get_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class FakeModemHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        with self.server.lock:
+            self.server.requests[path] += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        page = self.server.pages.get(path)
+        self.send_response(200 if page is not None else 404)
+        body = page if page is not None else b'Not Found'
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(modem_url: str, port: int, timeout: float) -> subprocess.Popen:
+    # Settings such as SERVER_WORKERS or SCRAPE_WORKERS are passed through from the environment
+    env = dict(os.environ, SERVER_HOSTNAME='127.0.0.1', SERVER_PORT=str(port), MODEM_URL=modem_url)
+    process = subprocess.Popen([sys.executable, str(APP_DIR / 'main.py')], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f'No successful /health response within {timeout} seconds')
+
+
+def get_modem_paths(port: int) -> list[str]:
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/endpoints', timeout=5) as response:
+        endpoints = json.load(response)
+    # Streams never complete, so only the JSON snapshots of each modem are requested
+    return [urlparse(e['uri']).path for e in endpoints
+            if urlparse(e['uri']).path.startswith('/modems/') and e['media_type'] == 'application/json']
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(','):
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in KINDS:
+            raise ValueError(f'Unknown request kind {kind!r}, expected one of {", ".join(KINDS)}')
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+class LoadGenerator:
+
+    def __init__(self, port: int, paths: dict[str, list[str]], weights: dict[str, float], rate: float,
+                 duration: float, concurrency: int, seed: int):
+        self._port = port
+        self._paths = paths
+        self._kinds = list(weights)
+        self._weights = list(weights.values())
+        self._rate = rate
+        self._duration = duration
+        self._concurrency = concurrency
+        self._random = random.Random(seed)
+        self._next = 0
+        self._started = None
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+
+    def run(self) -> float:
+        self._started = time.perf_counter()
+        workers = [threading.Thread(target=self._work, daemon=True) for _ in range(self._concurrency)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return time.perf_counter() - self._started
+
+    def _take(self):
+        with self._lock:
+            index = self._next
+            self._next += 1
+            kind = self._random.choices(self._kinds, self._weights)[0]
+            path = self._random.choice(self._paths[kind])
+        if self._rate:
+            due = self._started + index / self._rate
+        else:
+            due = time.perf_counter()
+        if due - self._started >= self._duration:
+            return None
+        return kind, path, due
+
+    def _work(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self._port, timeout=30)
+        while (request := self._take()) is not None:
+            kind, path, due = request
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    self.errors[f'{kind} HTTP {response.status}'] += 1
+            except (OSError, http.client.HTTPException) as e:
+                self.errors[f'{kind} {type(e).__name__}'] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', self._port, timeout=30)
+            self.latencies[kind].append(time.perf_counter() - due)
+        connection.close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def format_latencies(kind: str, latencies: list[float], elapsed: float) -> str:
+    latencies = sorted(latencies)
+    return (f'{kind:<10} {len(latencies):>7} {len(latencies) / elapsed:>9.1f}/s '
+            + ' '.join(f'{percentile(latencies, p) * 1000:>9.1f}ms' for p in (0.5, 0.95, 0.99))
+            + f' {latencies[-1] * 1000:>9.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=50, help='requests per second, 0 to send as fast as possible')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load')
+    parser.add_argument('--concurrency', type=int, default=16, help='client connections sending requests')
+    parser.add_argument('--mix', default='metrics=6,modem=2,health=1,endpoints=1',
+                        help='comma-separated request kinds and weights: ' + ', '.join(KINDS))
+    parser.add_argument('--modem-latency', type=float, default=0.0, help='seconds the fake modem takes per page')
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR, help='directory holding the modem pages')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the request mix')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds to wait for the server to start')
+    parser.add_argument('--max-p99-ms', type=float, default=None,
+                        help='fail when the p99 latency over all requests exceeds this')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    modem = FakeModem(args.fixtures, args.modem_latency)
+    threading.Thread(target=modem.serve_forever, daemon=True).start()
+    port = free_port()
+    server = start_server(modem.get_url(), port, args.timeout)
+    try:
+        paths = {'metrics': ['/metrics'], 'modem': get_modem_paths(port), 'health': ['/health'],
+                 'endpoints': ['/endpoints']}
+        with modem.lock:
+            modem.requests.clear()
+        generator = LoadGenerator(port, paths, weights, args.rate, args.duration, args.concurrency, args.seed)
+        elapsed = generator.run()
+    finally:
+        server.terminate()
+        server.wait()
+        modem.shutdown()
+
+    print(f'{"kind":<10} {"requests":>7} {"throughput":>11} {"p50":>11} {"p95":>11} {"p99":>11} {"max":>11}')
+    for kind in weights:
+        if generator.latencies[kind]:
+            print(format_latencies(kind, generator.latencies[kind], elapsed))
+    every = [latency for latencies in generator.latencies.values() for latency in latencies]
+    print(format_latencies('all', every, elapsed))
+    for error, count in sorted(generator.errors.items()):
+        print(f'errors: {error}: {count}')
+    modem_requests = sum(modem.requests.values())
+    print(f'Fake modem requests: {modem_requests} '
+          f'({", ".join(f"{path} {count}" for path, count in sorted(modem.requests.items())) or "none"}), '
+          f'{len(every) / max(modem_requests, 1):.1f} exporter requests per modem request')
+    if args.max_p99_ms is not None and percentile(sorted(every), 0.99) * 1000 > args.max_p99_ms:
+        print(f'FAIL: p99 {percentile(sorted(every), 0.99) * 1000:.1f}ms exceeds target {args.max_p99_ms:.1f}ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Micro-benchmarks for parsing, mapping and exposition.
+
+Each stage of turning a modem page into ``/metrics`` is timed on its own:
+BeautifulSoup parsing, ``_parse_soup``, ``_get_data_array_dict``, the
+gatherer ``_map`` methods, the Prometheus mapper ``_map`` methods and the
+exposition with ``generate_latest`` and ``generate_text``. The pages are
+the BGW210 pages in ``benchmarks/fixtures/bgw210`` plus synthetic pages
+scaled up with extra tables and rows.
+
+Every case reports its best and median time per call over the repeats,
+the peak memory traced while it runs once, and the memory it allocated
+that is still held after it returns. Results can be saved as a JSON
+baseline, and a later run compared against it fails when a case's best
+time, which is the least affected by other load on the machine, or its
+peak memory grew by more than the threshold.
+
+Usage:
+    python benchmarks/micro.py --save-baseline benchmarks/baseline.json
+    python benchmarks/micro.py --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from prometheus_client import CollectorRegistry, generate_latest  # noqa: E402
+
+from exporters import to_exportable  # noqa: E402
+from instrumentation import configure_instrumentation  # noqa: E402
+from modem_client import ModemClient, ModemConfig  # noqa: E402
+from modem_gatherers import ModemClientDataGatherer  # noqa: E402
+from modem_gatherers.broadband_status import BroadbandStatusGatherer  # noqa: E402
+from modem_gatherers.home_network_status import HomeNetworkStatusGatherer  # noqa: E402
+from modem_gatherers.system_information import SystemInformationGatherer  # noqa: E402
+from prometheus_exporters.exposition import generate_text  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "bgw210"
+# Page fixture per gatherer, as served under /cgi-bin
+PAGES = {
+    SystemInformationGatherer: 'sysinfo.ha',
+    HomeNetworkStatusGatherer: 'lanstatistics.ha',
+    BroadbandStatusGatherer: 'broadbandstatistics.ha'
+}
+# Each timing repeat runs a case for at least this long
+MIN_REPEAT_SECONDS = 0.05
+# Memory below this many KiB is not compared against the baseline, where a few blocks make a large ratio
+MIN_COMPARED_KIB = 16
+
+
+def scale_page(html: str, scale: int) -> str:
+    # Extra single-value rows in every table, then extra tables, with labels no gatherer reads
+    rows = ''.join(f'<tr><th scope="row" class="col1">Extra Counter {row}</th><td class="col2">{row * 1000}</td></tr>\n'
+                   for row in range(scale))
+    html = html.replace('</table>', rows + '</table>')
+    tables = ''.join(f'<table class="table60" summary="Extra Statistics Table {table}">\n' + ''.join(
+        f'<tr><th scope="row" class="col1">Extra Counter {row}</th><td class="col2">{row}</td>'
+        f'<td class="col2">{row * 2}</td><td class="col2">{row * 3}</td><td class="col2">{row * 4}</td></tr>\n'
+        for row in range(20)) + '</table>\n' for table in range(scale))
+    return html.replace('</body>', tables + '</body>')
+
+
+def load_pages(fixtures_dir: Path, scales: list[int]) -> dict[str, dict]:
+    pages = {cls: (fixtures_dir / name).read_text() for cls, name in PAGES.items()}
+    page_sets = {'bgw210': pages}
+    for scale in scales:
+        page_sets[f'scaled-{scale}'] = {cls: scale_page(html, scale) for cls, html in pages.items()}
+    return page_sets
+
+
+def create_cases(page_sets: dict[str, dict]) -> dict:
+    from bs4 import BeautifulSoup
+    import main
+
+    cases = {}
+    for page_set, pages in page_sets.items():
+        client = ModemClient(ModemConfig('modem-1', 'http://modem-1.invalid', None))
+        gatherers = [cls(client) for cls in PAGES]
+        registry = CollectorRegistry()
+        mappers = main.create_mappers(gatherers, registry)
+        for gatherer, mapper in zip(gatherers, mappers):
+            name = gatherer.get_name()
+            html = pages[type(gatherer)]
+            soup = BeautifulSoup(html, 'html.parser')
+            stats = gatherer._parse_soup(soup)
+            data = gatherer._map(stats)
+            tables = {summary: max(map(len, rows.values())) for summary, rows in stats.items()
+                      if isinstance(rows, dict) and rows}
+            cases[f'{page_set}/{name}/soup'] = lambda html=html: BeautifulSoup(html, 'html.parser')
+            cases[f'{page_set}/{name}/_parse_soup'] = lambda g=gatherer, soup=soup: g._parse_soup(soup)
+            cases[f'{page_set}/{name}/_get_data_array_dict'] = lambda stats=stats, tables=tables: [
+                ModemClientDataGatherer._get_data_array_dict(stats, summary, size) for summary, size in tables.items()]
+            # Lazily mapped sections are all mapped, as for a full JSON export
+            cases[f'{page_set}/{name}/_map'] = lambda g=gatherer, stats=stats: to_exportable(g._map(stats))
+            cases[f'{page_set}/{name}/mapper._map'] = lambda m=mapper, data=data: list(m._map(data))
+            # The exposition cases below render what a scrape of this snapshot exports
+            gatherer.gather = lambda data=data: data
+            mapper.refresh()
+        cases[f'{page_set}/exposition/generate_latest'] = lambda r=registry: generate_latest(r)
+        cases[f'{page_set}/exposition/generate_text'] = lambda r=registry: generate_text(r)
+    return cases
+
+
+def measure(case, repeats: int) -> dict:
+    started = time.perf_counter()
+    case()
+    number = max(1, int(MIN_REPEAT_SECONDS / (time.perf_counter() - started)))
+    times = [t / number for t in timeit.Timer(case).repeat(repeats, number)]
+    tracemalloc.start()
+    try:
+        case()
+        # Parsed trees hold reference cycles, which would otherwise be freed in the middle of the measured call
+        gc.collect()
+        started, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = case()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return {'time_us': round(min(times) * 1e6, 3),
+            'median_us': round(statistics.median(times) * 1e6, 3),
+            'peak_kib': round((peak - started) / 1024, 1),
+            'retained_kib': round((current - started) / 1024, 1)}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['time_us'] > base['time_us'] * (1 + threshold):
+            regressions.append(f'{name}: time {base["time_us"]:.1f}us -> {result["time_us"]:.1f}us')
+        if max(result['peak_kib'], base['peak_kib']) >= MIN_COMPARED_KIB and \
+                result['peak_kib'] > base['peak_kib'] * (1 + threshold):
+            regressions.append(f'{name}: peak memory {base["peak_kib"]:.1f}KiB -> {result["peak_kib"]:.1f}KiB')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR, help='directory holding the modem pages')
+    parser.add_argument('--scales', default='10,40',
+                        help='comma-separated extra tables and rows per synthetic page set')
+    parser.add_argument('--repeats', type=int, default=5, help='timing repeats per case')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--baseline', type=Path, help='compare against this JSON baseline')
+    parser.add_argument('--save-baseline', type=Path, help='save the results as a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fail when a case is slower, or peaks higher, than the baseline by this ratio')
+    args = parser.parse_args()
+
+    configure_instrumentation(None)
+    scales = [int(scale) for scale in args.scales.split(',') if scale.strip()]
+    cases = {name: case for name, case in create_cases(load_pages(args.fixtures, scales)).items()
+             if args.filter in name}
+    print(f'{"case":<60} {"best":>12} {"median":>12} {"peak":>11} {"retained":>11}')
+    results = {}
+    for name, case in cases.items():
+        result = results[name] = measure(case, args.repeats)
+        print(f'{name:<60} {result["time_us"]:10.1f}us {result["median_us"]:10.1f}us '
+              f'{result["peak_kib"]:8.1f}KiB {result["retained_kib"]:8.1f}KiB')
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(
+            {'python': platform.python_version(), 'machine': platform.machine(), 'cases': results}, indent=2) + '\n')
+        print(f'Saved baseline of {len(results)} cases to {args.save_baseline}')
+    if args.baseline:
+        if not args.baseline.exists():
+            print(f'No baseline at {args.baseline}; save one with --save-baseline')
+            return
+        regressions = compare(results, json.loads(args.baseline.read_text())['cases'], args.threshold)
+        if regressions:
+            print(f'FAIL: {len(regressions)} regressions past {args.threshold:.0%} of {args.baseline}:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print(f'No regressions past {args.threshold:.0%} of {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Parse pool benchmark.
+
+Parses the BGW210 pages in ``benchmarks/fixtures/bgw210``, scaled up with
+extra tables as in ``micro.py``, the way a fleet of modems would: one
+thread per modem parses its pages concurrently. This is timed once with
+every thread parsing in process, where the GIL lets only one parse run at
+a time, and then with a parse pool of each of the given worker counts, as
+with ``PARSE_WORKERS``. Pool start-up is not timed. Reports pages parsed
+per second and the speedup over parsing in process, which can only grow
+with the number of CPU cores available.
+
+Usage:
+    python benchmarks/parse.py --modems 16 --pages 200 --workers 1,2,4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from micro import FIXTURES_DIR, scale_page  # noqa: E402
+from modem_gatherers.parsing import ParseConfig, ParsePool, parse_page  # noqa: E402
+
+
+def load_pages(fixtures_dir: Path, scale: int) -> list[bytes]:
+    pages = [page.read_text() for page in sorted(fixtures_dir.glob('*.ha'))]
+    return [(scale_page(html, scale) if scale else html).encode() for html in pages]
+
+
+def run(parse, pages: list[bytes], modems: int, count: int) -> float:
+    # Each modem thread parses its share of the pages in turn, like a gatherer per modem
+    def parse_modem(modem: int):
+        for i in range(modem, count, modems):
+            parse(pages[i % len(pages)], 'utf-8')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=modems) as executor:
+        list(executor.map(parse_modem, range(modems)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR, help='directory holding the modem pages')
+    parser.add_argument('--scale', type=int, default=10, help='extra tables and rows per page, 0 for the plain pages')
+    parser.add_argument('--modems', type=int, default=16, help='threads parsing pages concurrently')
+    parser.add_argument('--pages', type=int, default=200, help='pages parsed per run')
+    parser.add_argument('--workers', default=','.join(str(w) for w in sorted({1, 2, os.cpu_count() or 1})),
+                        help='comma-separated parse pool sizes')
+    args = parser.parse_args()
+
+    pages = load_pages(args.fixtures, args.scale)
+    print(f'{os.cpu_count()} CPUs, {args.modems} modems, {args.pages} pages of '
+          f'{sum(map(len, pages)) // len(pages) // 1024}KiB on average')
+    # Warm up imports and caches before timing
+    run(parse_page, pages, args.modems, len(pages))
+    elapsed = run(parse_page, pages, args.modems, args.pages)
+    baseline = args.pages / elapsed
+    print(f'{"in process":<14} {baseline:8.1f} pages/s')
+    for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+        pool = ParsePool(ParseConfig(workers=workers, max_tasks_per_worker=args.pages * 2,
+                                     max_pending=args.modems))
+        try:
+            # Starts every worker, so the timed run does not include spawning them
+            run(pool.parse, pages, args.modems, workers * 4)
+            elapsed = run(pool.parse, pages, args.modems, args.pages)
+        finally:
+            pool.close()
+        rate = args.pages / elapsed
+        print(f'{f"{workers} workers":<14} {rate:8.1f} pages/s  {rate / baseline:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Scrape benchmark.
+
+Times ``/metrics`` rendering (mapper refresh plus text exposition) for
+BGW210-like snapshots, without a modem or an HTTP server. Three cases are
+measured: scrapes that see every snapshot already cached, scrapes where
+only the broadband counters changed, and scrapes that each see a new
+snapshot for every page, as after every cache expiry. For each case the
+exposition alone is also timed, rendering the whole registry with
+``generate_latest`` against joining the cached per-mapper fragments with
+``generate_text``.
+
+Usage:
+    python benchmarks/scrape.py --modems 10 --scrapes 200
+"""
+import argparse
+import copy
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from prometheus_client import CollectorRegistry, generate_latest  # noqa: E402
+
+from instrumentation import configure_instrumentation  # noqa: E402
+from modem_client import ModemClient, ModemConfig  # noqa: E402
+from modem_gatherers.broadband_status import BroadbandStatusGatherer  # noqa: E402
+from modem_gatherers.home_network_status import HomeNetworkStatusGatherer  # noqa: E402
+from modem_gatherers.system_information import SystemInformationGatherer  # noqa: E402
+from prometheus_exporters import PrometheusExporter  # noqa: E402
+from prometheus_exporters.exposition import generate_text  # noqa: E402
+
+# Gatherers returning a new snapshot on every gather, per case
+CASES = {
+    'cached snapshot': (),
+    'broadband changed': (BroadbandStatusGatherer,),
+    'new snapshot': (SystemInformationGatherer, HomeNetworkStatusGatherer, BroadbandStatusGatherer)
+}
+
+SYSTEM_INFORMATION = {
+    'manufacturer': 'Pace Plc', 'model_number': 'BGW210-700', 'serial_number': '123456789012',
+    'software_version': '4.27.7', 'mac_address': 'aa:bb:cc:dd:ee:ff', 'first_use_date': None,
+    'time_since_last_reboot': timedelta(days=12, hours=3), 'current_date_time': None,
+    'datapump_version': 'N/A', 'hardware_version': '02001C0046004D'
+}
+LAN_PORT = {
+    'state': 'UP', 'transmit_speed': 1000, 'transmit_packets': 123456789, 'transmit_bytes': 987654321012,
+    'transmit_unicast': 123000000, 'transmit_multicast': 456789, 'transmit_dropped': 0, 'transmit_errors': 0,
+    'receive_packets': 98765432, 'receive_bytes': 123456789012, 'receive_unicast': 98000000,
+    'receive_multicast': 765432, 'receive_dropped': 12, 'receive_errors': 0
+}
+IPV4_STATISTICS = {
+    'receive_packets': 2345678901, 'transmit_packets': 1234567890, 'receive_bytes': 3456789012345,
+    'transmit_bytes': 234567890123, 'receive_unicast': 2345000000, 'transmit_unicast': 1234000000,
+    'receive_multicast': 678901, 'transmit_multicast': 12345, 'receive_drops': 3, 'transmit_drops': 0,
+    'receive_errors': 0, 'transmit_errors': 0, 'collisions': 0
+}
+IPV6_STATISTICS = {
+    'receive_packets': 345678901, 'transmit_packets': 234567890, 'receive_bytes': 456789012345,
+    'transmit_bytes': 34567890123, 'receive_discards': 0, 'transmit_discards': 0,
+    'receive_errors': 0, 'transmit_errors': 0
+}
+
+
+def create_fixture_gatherers(modem_id: str, fresh: tuple) -> list:
+    client = ModemClient(ModemConfig(modem_id, f'http://{modem_id}.invalid', None))
+    snapshots = [
+        SYSTEM_INFORMATION,
+        [dict(LAN_PORT, lan_port=port) for port in range(1, 5)],
+        {'broadband_wan_information': {}, 'ethernet_statistics': {}, 'ipv6_information': {},
+         'ipv4_statistics': IPV4_STATISTICS, 'ipv6_statistics': IPV6_STATISTICS}
+    ]
+    gatherers = [SystemInformationGatherer(client), HomeNetworkStatusGatherer(client), BroadbandStatusGatherer(client)]
+    for gatherer, snapshot in zip(gatherers, snapshots):
+        # A fresh copy per gather stands in for a cache expiry between scrapes
+        gatherer.gather = (lambda s=snapshot: copy.deepcopy(s)) if type(gatherer) in fresh else (lambda s=snapshot: s)
+    return gatherers
+
+
+def create_fixture_exporter(modems: int, fresh: tuple) -> PrometheusExporter:
+    import main
+
+    registry = CollectorRegistry()
+    mappers = []
+    for modem in range(modems):
+        mappers.extend(main.create_mappers(create_fixture_gatherers(f'modem-{modem}', fresh), registry))
+    return PrometheusExporter(mappers, registry)
+
+
+def time_scrapes(exporter: PrometheusExporter, scrapes: int) -> tuple[list[float], int]:
+    size = len(exporter.export())
+    durations = []
+    for _ in range(scrapes):
+        started = time.perf_counter()
+        exporter.export()
+        durations.append(time.perf_counter() - started)
+    return durations, size
+
+
+def time_exposition(exporter: PrometheusExporter, generate, scrapes: int) -> list[float]:
+    durations = []
+    for _ in range(scrapes):
+        # Refreshing moves the changed mappers to a new snapshot, as a scrape would
+        exporter._refresher.refresh(exporter._config.timeout)
+        started = time.perf_counter()
+        generate(exporter._registry)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def format_durations(durations: list[float]) -> str:
+    durations = sorted(durations)
+    return (f'median={statistics.median(durations) * 1000:.3f}ms '
+            f'p95={durations[int(len(durations) * 0.95) - 1] * 1000:.3f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modems', type=int, default=1, help='modems rendered by one exporter')
+    parser.add_argument('--scrapes', type=int, default=200, help='scrapes timed per case')
+    args = parser.parse_args()
+
+    configure_instrumentation(None)
+    for case, fresh in CASES.items():
+        exporter = create_fixture_exporter(args.modems, fresh)
+        durations, size = time_scrapes(exporter, args.scrapes)
+        print(f'{case:<18} modems={args.modems} bytes={size} scrape {format_durations(durations)}')
+        for name, generate in (('generate_latest', generate_latest), ('generate_text', generate_text)):
+            print(f'{"":<18} exposition {name:<15} {format_durations(time_exposition(exporter, generate, args.scrapes))}')
+
+
+if __name__ == '__main__':
+    main()
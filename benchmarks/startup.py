@@ -0,0 +1,92 @@
+"""
+Startup benchmark.
+
+Measures the time from launching ``python app/main.py`` to the first
+successful ``/health`` response, and breaks down import time by top-level
+package. No modem is needed: ``/health`` does not contact it.
+
+Usage:
+    python benchmarks/startup.py --runs 5 --max-seconds 3
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_health(timeout: float) -> float:
+    port = free_port()
+    env = dict(os.environ, SERVER_HOSTNAME='127.0.0.1', SERVER_PORT=str(port), MODEM_URL='http://127.0.0.1:9')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(APP_DIR / 'main.py')], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'Server exited with code {process.returncode}')
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError(f'No successful /health response within {timeout} seconds')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def import_breakdown() -> dict[str, float]:
+    # Import the app the way the server does and build it, without serving
+    code = 'import main; main.create_app()'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=APP_DIR,
+                            env=dict(os.environ, MODEM_URL='http://127.0.0.1:9'),
+                            capture_output=True, text=True, check=True)
+    totals = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us) / 1e6
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='number of server starts to measure')
+    parser.add_argument('--top', type=int, default=15, help='packages to show in the import breakdown')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds to wait for /health per run')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='fail when the median time to first /health exceeds this')
+    args = parser.parse_args()
+
+    breakdown = import_breakdown()
+    print(f'Import time by top-level package (total {sum(breakdown.values()):.3f}s):')
+    for package, seconds in list(breakdown.items())[:args.top]:
+        print(f'  {package:<32} {seconds * 1000:8.1f} ms')
+
+    times = [time_to_first_health(args.timeout) for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f'Time to first /health over {args.runs} runs: '
+          f'median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s')
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f'FAIL: median {median:.3f}s exceeds target {args.max_seconds:.3f}s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,6 +21,30 @@ from modem_client import ModemClient, ModemConfig
 from gatherers import DataGatherer
 
 
+class CountingGatherer(DataGatherer):
+    """Gatherer counting its calls and returning the snapshot the test last set, or a new dict on every call."""
+
+    def __init__(self, snapshot=None, name="CountingGatherer"):
+        self.snapshot = snapshot
+        self.call_count = 0
+        self._name = name
+
+    def gather(self):
+        self.call_count += 1
+        return {"count": self.call_count} if self.snapshot is None else self.snapshot
+
+    def get_name(self) -> str:
+        return self._name
+
+
+def make_request(headers=None, **params):
+    """Create a mock request with the given headers and query parameters."""
+    request = Mock()
+    request.query_params = params
+    request.headers = headers or {}
+    return request
+
+
 @pytest.fixture
 def modem_config():
     """Create a test ModemConfig."""
@@ -0,0 +1,78 @@
+"""
+Integration tests for the one-shot --once mode of app/main.py.
+
+main.py runs as a subprocess against local fake modems serving the BGW210
+pages from benchmarks/fixtures, the way cron or a textfile collector job
+would run it.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.integration.test_sharding import FIXTURES_DIR, FakeModem
+
+MAIN = Path(__file__).resolve().parent.parent.parent / 'app' / 'main.py'
+
+
+@pytest.fixture
+def modems():
+    """Two fake modems serving the BGW210 fixture pages."""
+    pages = {f'/cgi-bin/{page.name}': page.read_bytes() for page in FIXTURES_DIR.glob('*.ha')}
+    modems = [FakeModem(pages) for _ in range(2)]
+    yield modems
+    for modem in modems:
+        modem.close()
+
+
+def run_once(modems_env: str, *args) -> subprocess.CompletedProcess:
+    env = dict(os.environ, MODEMS=modems_env, SCRAPE_TIMEOUT_SECONDS='5')
+    return subprocess.run([sys.executable, '-X', 'importtime', str(MAIN), '--once', *args], env=env,
+                          capture_output=True, text=True, timeout=60)
+
+
+@pytest.mark.integration
+class TestOnce:
+    """Integration tests for --once."""
+
+    def test_prometheus_text_for_every_modem(self, modems, tmp_path):
+        """--format prom should write the metrics of every modem to the file, without leaving temporary files."""
+        out = tmp_path / 'att_modem.prom'
+
+        result = run_once(','.join(f'modem-{i}={m.url}' for i, m in enumerate(modems)), '--out', str(out))
+
+        assert result.returncode == 0, result.stderr
+        text = out.read_text()
+        for i in range(len(modems)):
+            assert f'att_modem_wan_ipv4_receive_bytes{{modem_id="modem-{i}"' in text
+            assert f'att_modem_scrape_success{{collector="BroadbandStatusPrometheusMapper",modem_id="modem-{i}"}} 1.0' \
+                in text
+        assert os.listdir(tmp_path) == ['att_modem.prom']
+
+    def test_json_without_fastapi(self, modems, tmp_path):
+        """--format json should key the data endpoints by modem and not import FastAPI or uvicorn."""
+        out = tmp_path / 'att_modem.json'
+
+        result = run_once(f'modem-0={modems[0].url}', '--format', 'json', '--out', str(out))
+
+        assert result.returncode == 0
+        document = json.loads(out.read_text())
+        assert list(document['modem-0']) == ['system-information', 'home-network-status', 'broadband-status']
+        assert isinstance(document['modem-0']['system-information']['time_since_last_reboot'], float)
+        imported = [line.split('|')[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')]
+        assert 'prometheus_client' in imported
+        assert not [name for name in imported if name.split('.')[0] in ('fastapi', 'starlette', 'uvicorn')]
+
+    def test_unreachable_modem_fails(self, modems, tmp_path):
+        """A modem that cannot be gathered should still be written, marked as failed, with a non-zero exit."""
+        out = tmp_path / 'att_modem.prom'
+
+        result = run_once(f'modem-0={modems[0].url},down=http://127.0.0.1:9', '--out', str(out))
+
+        assert result.returncode == 1
+        text = out.read_text()
+        assert 'att_modem_scrape_success{collector="BroadbandStatusPrometheusMapper",modem_id="down"} 0.0' in text
+        assert 'att_modem_wan_ipv4_receive_bytes{modem_id="modem-0"' in text
@@ -0,0 +1,304 @@
+"""
+Integration tests for push_exporters.
+
+Batches are pushed to a local HTTP receiver standing in for a remote-write
+endpoint or Pushgateway. Remote-write bodies are checked with a minimal
+snappy decoder, so the tests do not need the snappy package.
+"""
+import struct
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from prometheus_client import CollectorRegistry, Gauge
+
+from instrumentation import configure_instrumentation
+from push_exporters import DiskRetryQueue, MetricsPusher, PushConfig, encode_remote_write, snappy_compress
+from prometheus_exporters import PrometheusMapper
+
+
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def decode_message(data: bytes) -> dict:
+    """Decode one protobuf message into {field: [values]}."""
+    fields, pos = {}, 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = struct.unpack('<d', data[pos:pos + 8])[0], pos + 8
+        else:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def snappy_decompress(data: bytes) -> bytes:
+    """Decode a snappy block using literals and 1, 2 or 4 byte offset copies."""
+    length, pos = read_varint(data, 0)
+    output = bytearray()
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            size = tag >> 2
+            if size >= 60:
+                extra = size - 59
+                size = int.from_bytes(data[pos:pos + extra], 'little')
+                pos += extra
+            output += data[pos:pos + size + 1]
+            pos += size + 1
+            continue
+        if kind == 1:
+            size, offset = 4 + ((tag >> 2) & 7), (tag >> 5) << 8 | data[pos]
+            pos += 1
+        else:
+            width = 2 if kind == 2 else 4
+            size, offset = (tag >> 2) + 1, int.from_bytes(data[pos:pos + width], 'little')
+            pos += width
+        for _ in range(size):
+            output.append(output[-offset])
+    assert len(output) == length
+    return bytes(output)
+
+
+class Receiver:
+    """Local HTTP server recording pushed requests, optionally failing them with fail_status."""
+
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+        self.fail_status = 503
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if receiver.fail:
+                    self.send_response(receiver.fail_status)
+                else:
+                    receiver.requests.append((self.command, self.path, dict(self.headers), body))
+                    self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            do_POST = do_PUT = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class CountingMapper(PrometheusMapper):
+    """Mapper that sets a gauge to the number of refreshes."""
+
+    def __init__(self, registry):
+        super().__init__(None, registry)
+        self.gauge = Gauge('att_modem_push_test', 'Push test gauge', ['modem_id'], registry=registry)
+        self.count = 0
+
+    def refresh(self):
+        self.count += 1
+        self.gauge.labels('modem-1').set(self.count)
+
+    def _map(self, data):
+        pass
+
+
+class FailingMapper(PrometheusMapper):
+    """Mapper whose refresh always fails."""
+
+    def refresh(self):
+        raise ValueError('No statistics found')
+
+    def _map(self, data):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    receiver = Receiver()
+    yield receiver
+    receiver.close()
+
+
+def make_pusher(mode, url, tmp_path, max_batches=10):
+    registry = CollectorRegistry()
+    config = PushConfig(mode, url, queue_dir=str(tmp_path), queue_max_batches=max_batches)
+    return MetricsPusher(config, [CountingMapper(registry), FailingMapper(None, registry)], registry)
+
+
+def decode_remote_write(body: bytes) -> dict:
+    """Decode a WriteRequest into {__name__: (labels, value, timestamp)}."""
+    series = {}
+    for timeseries in decode_message(body)[1]:
+        message = decode_message(timeseries)
+        labels = {}
+        for label in message[1]:
+            pair = decode_message(label)
+            labels[pair[1][0].decode()] = pair[2][0].decode()
+        sample = decode_message(message[2][0])
+        series[labels['__name__']] = (labels, sample[1][0], sample[2][0])
+    return series
+
+
+@pytest.mark.integration
+class TestSnappyCompress:
+    """Test suite for the snappy block encoder."""
+
+    @pytest.mark.parametrize('data', [b'', b'a', b'abcd' * 100, bytes(range(256)) * 3, b'x' * 70 + b'y' * 5000])
+    def test_round_trips(self, data):
+        """Compressed data should decode back to the input."""
+        assert snappy_decompress(snappy_compress(data)) == data
+
+    def test_compresses_repetitive_data(self):
+        """Repeated label sets should compress well."""
+        data = b'att_modem_lan_state{modem_id="modem-1",lan_port="1"} 1\n' * 50
+
+        assert len(snappy_compress(data)) < len(data) / 5
+
+
+@pytest.mark.integration
+class TestMetricsPusher:
+    """Integration tests for MetricsPusher."""
+
+    def test_remote_write_sends_snappy_protobuf(self, receiver, tmp_path):
+        """Remote write should POST a snappy-compressed WriteRequest with the protocol headers."""
+        pusher = make_pusher('remote_write', receiver.url + '/api/v1/write', tmp_path)
+
+        pusher.push()
+
+        method, path, headers, body = receiver.requests[0]
+        assert (method, path) == ('POST', '/api/v1/write')
+        assert headers['Content-Encoding'] == 'snappy'
+        assert headers['Content-Type'] == 'application/x-protobuf'
+        assert headers['X-Prometheus-Remote-Write-Version'] == '0.1.0'
+        labels, value, timestamp = decode_remote_write(snappy_decompress(body))['att_modem_push_test']
+        assert labels == {'__name__': 'att_modem_push_test', 'modem_id': 'modem-1'}
+        assert value == 1.0
+        assert timestamp > 0
+
+    def test_encode_remote_write_uses_default_timestamp(self):
+        """Samples without their own timestamp should use the batch timestamp."""
+        registry = CollectorRegistry()
+        Gauge('att_modem_up', 'Up', registry=registry).set(1)
+
+        assert decode_remote_write(encode_remote_write(registry, 1234))['att_modem_up'][2] == 1234
+
+    def test_pushgateway_puts_text_exposition(self, receiver, tmp_path):
+        """Pushgateway mode should PUT the text exposition under the job path."""
+        pusher = make_pusher('pushgateway', receiver.url, tmp_path)
+
+        pusher.push()
+
+        method, path, _, body = receiver.requests[0]
+        assert (method, path) == ('PUT', '/metrics/job/att-modem-exporter')
+        assert b'att_modem_push_test{modem_id="modem-1"} 1.0' in body
+
+    @pytest.mark.parametrize('status', [503, 429])
+    def test_queues_batches_while_receiver_fails(self, receiver, tmp_path, status):
+        """Batches failing with a server error or 429 should stay queued on disk and be flushed oldest first."""
+        pusher = make_pusher('remote_write', receiver.url, tmp_path)
+        receiver.fail, receiver.fail_status = True, status
+
+        pusher.push()
+        pusher.push()
+        receiver.fail = False
+        pusher.push()
+
+        values = [decode_remote_write(snappy_decompress(body))['att_modem_push_test'][1]
+                  for _, _, _, body in receiver.requests]
+        assert values == [1.0, 2.0, 3.0]
+        assert len(DiskRetryQueue(str(tmp_path), 10)) == 0
+
+    def test_drops_rejected_batches(self, receiver, tmp_path):
+        """Batches rejected with a client error should be dropped and counted instead of blocking the queue."""
+        registry = CollectorRegistry()
+        configure_instrumentation(registry)
+        pusher = make_pusher('remote_write', receiver.url, tmp_path)
+        receiver.fail, receiver.fail_status = True, 400
+
+        try:
+            pusher.push()
+            pusher.push()
+            receiver.fail = False
+            pusher.push()
+        finally:
+            configure_instrumentation(None)
+
+        assert [decode_remote_write(snappy_decompress(body))['att_modem_push_test'][1]
+                for _, _, _, body in receiver.requests] == [3.0]
+        assert len(DiskRetryQueue(str(tmp_path), 10)) == 0
+        assert registry.get_sample_value('att_modem_exporter_push_dropped_batches_total', {'reason': 'rejected'}) == 2
+
+    def test_pushgateway_sends_only_newest_batch(self, receiver, tmp_path):
+        """Queued Pushgateway batches should be replaced by the newest one, since each PUT replaces the last."""
+        pusher = make_pusher('pushgateway', receiver.url, tmp_path)
+        receiver.fail = True
+
+        pusher.push()
+        pusher.push()
+        receiver.fail = False
+        pusher.push()
+
+        assert len(receiver.requests) == 1
+        assert b'att_modem_push_test{modem_id="modem-1"} 3.0' in receiver.requests[0][3]
+        assert len(DiskRetryQueue(str(tmp_path), 10)) == 0
+
+
+@pytest.mark.integration
+class TestDiskRetryQueue:
+    """Integration tests for DiskRetryQueue."""
+
+    def test_drops_oldest_batches_when_full(self, tmp_path):
+        """Only max_batches batches should be kept, dropping the oldest."""
+        queue = DiskRetryQueue(str(tmp_path), 2)
+
+        for batch in (b'1', b'2', b'3'):
+            queue.put(batch)
+
+        assert len(queue) == 2
+        assert queue.peek()[1] == b'2'
+
+    def test_survives_restart(self, tmp_path):
+        """Batches should be readable by a new queue on the same directory."""
+        DiskRetryQueue(str(tmp_path), 2).put(b'batch')
+
+        assert DiskRetryQueue(str(tmp_path), 2).peek()[1] == b'batch'
+
+
+@pytest.mark.integration
+class TestPushConfig:
+    """Test suite for PushConfig."""
+
+    def test_from_env_disabled_without_mode(self, monkeypatch):
+        """from_env() should return None when PUSH_MODE is unset."""
+        monkeypatch.delenv('PUSH_MODE', raising=False)
+
+        assert PushConfig.from_env() is None
+
+    def test_rejects_unknown_mode(self):
+        """Unknown push modes should be rejected."""
+        with pytest.raises(ValueError):
+            PushConfig('graphite', 'http://localhost', timedelta(seconds=1))
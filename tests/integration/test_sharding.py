@@ -0,0 +1,104 @@
+"""
+Integration tests for sharding a modem fleet across exporter replicas.
+
+Several replicas share one fleet of local fake modems serving the BGW210
+pages from benchmarks/fixtures. Each replica is scraped the way Prometheus
+would: its /sd targets are probed through its own /probe endpoint.
+"""
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from modem_client import ModemConfig
+from probe_exporters import ProbeConfig, ProbeExporter, ServiceDiscoveryExporter
+from server import Server, ServerConfig
+from sharding import ModemShard, ShardConfig
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent.parent / 'benchmarks' / 'fixtures' / 'bgw210'
+
+
+class FakeModem:
+    """Local HTTP server serving the fixture pages and counting requests."""
+
+    def __init__(self, pages):
+        modem = self
+        self.requests = Counter()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                modem.requests[self.path] += 1
+                body = pages.get(self.path, b'Not Found')
+                self.send_response(200 if self.path in pages else 404)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_port}'
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def create_replica(index, count, fleet):
+    shard = ModemShard(ShardConfig(index, count, f'replica-{index}:8666'), fleet)
+    server = Server(ServerConfig('127.0.0.1', 8666),
+                    [ProbeExporter({'bgw210': main.create_bgw210_probe_mappers}, ProbeConfig(), shard),
+                     ServiceDiscoveryExporter(shard, 'bgw210')])
+    return TestClient(server.get_app())
+
+
+@pytest.fixture
+def modems():
+    """Six fake modems serving the BGW210 fixture pages."""
+    pages = {f'/cgi-bin/{page.name}': page.read_bytes() for page in FIXTURES_DIR.glob('*.ha')}
+    modems = [FakeModem(pages) for _ in range(6)]
+    yield modems
+    for modem in modems:
+        modem.close()
+
+
+@pytest.mark.integration
+class TestShardedReplicas:
+    """Integration tests for replicas sharing a fleet."""
+
+    def test_each_modem_is_polled_by_one_replica(self, modems):
+        """Probing every replica's /sd targets should poll each modem exactly once, from its owner."""
+        fleet = [ModemConfig(f'modem-{i}', modem.url, None) for i, modem in enumerate(modems)]
+        replicas = [create_replica(index, 3, fleet) for index in range(3)]
+
+        owners = {}
+        for index, replica in enumerate(replicas):
+            for group in replica.get('/sd').json():
+                assert group['targets'] == [f'replica-{index}:8666']
+                labels = group['labels']
+                response = replica.get(labels['__metrics_path__'], params={
+                    'target': labels['__param_target'], 'module': labels['__param_module'],
+                    'modem_id': labels['__param_modem_id']})
+                assert response.status_code == 200
+                assert 'att_modem_probe_success 1.0' in response.text
+                owners[labels['__param_modem_id']] = index
+
+        assert sorted(owners) == sorted(m.id for m in fleet)
+        assert all(modem.requests['/cgi-bin/sysinfo.ha'] == 1 for modem in modems)
+
+    def test_replica_refuses_modems_of_other_replicas(self, modems):
+        """A probe sent to the wrong replica should be refused without contacting the modem."""
+        fleet = [ModemConfig(f'modem-{i}', modem.url, None) for i, modem in enumerate(modems)]
+        replicas = [create_replica(index, 2, fleet) for index in range(2)]
+        owner, groups = next((i, g) for i, g in enumerate(r.get('/sd').json() for r in replicas) if g)
+
+        response = replicas[1 - owner].get('/probe', params={'target': groups[0]['labels']['__param_target']})
+
+        assert response.status_code == 421
+        assert sum(sum(modem.requests.values()) for modem in modems) == 0
@@ -0,0 +1,75 @@
+"""
+Unit tests for debug_exporters module.
+"""
+import asyncio
+import threading
+import tracemalloc
+
+import pytest
+
+from debug_exporters import (DebugConfig, MemoryDataExporter, ProfileDataExporter, StackSampler,
+                             create_debug_exporters, format_collapsed)
+
+
+def busy_function(stopped: threading.Event):
+    while not stopped.is_set():
+        sum(range(1000))
+
+
+@pytest.mark.unit
+class TestDebugExporters:
+    """Test suite for the profiling and memory debug exporters."""
+
+    def test_disabled_config_registers_nothing(self):
+        """No debug exporters should be created unless enabled."""
+        assert create_debug_exporters(DebugConfig(enabled=False)) == []
+
+    def test_enabled_config_registers_debug_routes(self):
+        """Enabled config should register /debug/profile and /debug/memory."""
+        exporters = create_debug_exporters(DebugConfig(enabled=True))
+        try:
+            assert [e.get_export_endpoint() for e in exporters] == ['/debug/profile', '/debug/memory']
+        finally:
+            tracemalloc.stop()
+
+    def test_sampler_collects_stacks_of_other_threads(self):
+        """StackSampler should record the stacks of running threads."""
+        stopped = threading.Event()
+        worker = threading.Thread(target=busy_function, args=(stopped,))
+        worker.start()
+        sampler = StackSampler(0.001)
+        sampler.start()
+        try:
+            while sampler.get_samples() < 5:
+                stopped.wait(0.01)
+        finally:
+            sampler.stop()
+            stopped.set()
+            worker.join()
+
+        assert any('busy_function' in line for line in format_collapsed(sampler.get_stacks()).splitlines())
+
+    def test_profile_returns_collapsed_stacks(self):
+        """Profiling should return a text response with one stack per line."""
+        exporter = ProfileDataExporter(DebugConfig(enabled=True, sample_interval_seconds=0.001))
+
+        response = asyncio.run(exporter._profile(0.05, 'collapsed'))
+
+        assert response.media_type == 'text/plain'
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in response.body.decode().splitlines())
+
+    def test_memory_reports_top_allocations_and_diff(self):
+        """Memory export should report top allocations and growth since the baseline."""
+        exporter = MemoryDataExporter(DebugConfig(enabled=True))
+        try:
+            retained = [bytearray(1024) for _ in range(100)]
+            result = exporter._export(10, reset=True)
+            after_reset = exporter._export(10, reset=False)
+        finally:
+            tracemalloc.stop()
+
+        assert result['traced_memory_bytes'] > 0
+        assert len(result['top']) <= 10
+        assert any(d['size_diff_bytes'] >= 100 * 1024 for d in result['diff'])
+        assert all(d['size_diff_bytes'] < 100 * 1024 for d in after_reset['diff'])
+        assert len(retained) == 100
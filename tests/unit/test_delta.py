@@ -0,0 +1,166 @@
+"""
+Unit tests for versioned snapshots and JSON Patch delta responses.
+
+Gatherers return prepared snapshots, so no modem is contacted. Patches are
+checked by applying them with a minimal RFC 6902 implementation.
+"""
+import copy
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from exporters import DataGathererExporter
+from exporters.delta import DeltaConfig, SnapshotVersions, json_patch
+from tests.conftest import CountingGatherer, make_request
+
+
+def apply_patch(document, patch):
+    document = copy.deepcopy(document)
+    for op in patch:
+        keys = [k.replace('~1', '/').replace('~0', '~') for k in op['path'].split('/')[1:]]
+        if not keys:
+            document = op['value']
+            continue
+        parent = document
+        for key in keys[:-1]:
+            parent = parent[int(key) if isinstance(parent, list) else key]
+        key = int(keys[-1]) if isinstance(parent, list) else keys[-1]
+        if op['op'] == 'remove':
+            del parent[key]
+        else:
+            parent[key] = op['value']
+    return document
+
+
+def make_ports(rx):
+    return [{'lan_port': port, 'receive_bytes': value, 'transmit_bytes': 100} for port, value in enumerate(rx, 1)]
+
+
+def export(exporter, **params):
+    response = exporter.export_request(make_request(**params))
+    return response, json.loads(response.body)
+
+
+@pytest.mark.unit
+class TestJsonPatch:
+    """Test suite for json_patch()."""
+
+    @pytest.mark.parametrize('old,new', [
+        ({'a': 1, 'b': 2}, {'a': 1, 'b': 3}),
+        ({'a': 1, 'b': 2}, {'a': 1, 'c': {'d': 4}}),
+        ({'a/b': 1, 'c~d': [1, 2]}, {'a/b': 2, 'c~d': [1, 3]}),
+        ({'ports': [1, 2, 3]}, {'ports': [1, 2]}),
+        ({'a': 1}, {'a': 1.0}),
+        ([1, 2], {'a': 1}),
+    ])
+    def test_patch_turns_old_into_new(self, old, new):
+        """Applying the patch to the old document should give the new one."""
+        patch = json_patch(old, new)
+
+        assert apply_patch(old, patch) == new
+        assert json.dumps(apply_patch(old, patch)) == json.dumps(new)
+
+    def test_unchanged_document_has_empty_patch(self):
+        """Equal documents should produce no operations."""
+        assert json_patch(make_ports([1, 2]), make_ports([1, 2])) == []
+
+    def test_patch_only_touches_changed_counters(self):
+        """A changed counter should be one replace operation at its path."""
+        assert json_patch(make_ports([1, 2]), make_ports([1, 5])) == [
+            {'op': 'replace', 'path': '/1/receive_bytes', 'value': 5}]
+
+
+@pytest.mark.unit
+class TestSnapshotVersions:
+    """Test suite for SnapshotVersions."""
+
+    def test_versions_increase_with_new_snapshots(self):
+        """A new snapshot object should get a higher version, the same object the same version."""
+        versions = SnapshotVersions(4)
+        first = versions.observe({'a': 1})
+        value = {'a': 2}
+
+        second = versions.observe(value)
+
+        assert second > first and versions.observe(value) == second
+
+    def test_window_keeps_latest_versions(self):
+        """Only the last window versions should be kept."""
+        versions = SnapshotVersions(2)
+        seen = [versions.observe({'a': i}) for i in range(3)]
+
+        assert versions.get(seen[0]) is None
+        assert versions.get(seen[2]) == {'a': 2}
+
+    def test_invalid_window(self):
+        """The window must hold at least one version."""
+        with pytest.raises(ValueError):
+            DeltaConfig(0)
+
+
+@pytest.mark.unit
+class TestDeltaResponses:
+    """Test suite for ?since_version= on gatherer exporters."""
+
+    def test_delta_from_previous_version(self):
+        """since_version should return a JSON Patch from that version to the current one."""
+        gatherer = CountingGatherer(make_ports([1, 2, 3, 4]))
+        exporter = DataGathererExporter(gatherer)
+        response, full = export(exporter)
+        version = response.headers['X-Snapshot-Version']
+        gatherer.snapshot = make_ports([1, 2, 3, 9])
+
+        response, patch = export(exporter, since_version=version)
+
+        assert response.media_type == 'application/json-patch+json'
+        assert response.headers['X-Snapshot-Base-Version'] == version
+        assert int(response.headers['X-Snapshot-Version']) > int(version)
+        assert patch == [{'op': 'replace', 'path': '/3/receive_bytes', 'value': 9}]
+        assert apply_patch(full, patch) == make_ports([1, 2, 3, 9])
+
+    def test_current_version_gives_empty_patch(self):
+        """Asking for changes since the current version should return an empty patch."""
+        exporter = DataGathererExporter(CountingGatherer(make_ports([1])))
+        response, _ = export(exporter)
+
+        _, patch = export(exporter, since_version=response.headers['X-Snapshot-Version'])
+
+        assert patch == []
+
+    def test_version_outside_window_falls_back_to_full_document(self):
+        """A version that has left the window should get the full document."""
+        gatherer = CountingGatherer(make_ports([0]))
+        exporter = DataGathererExporter(gatherer, DeltaConfig(window=2))
+        response, _ = export(exporter)
+        for rx in (1, 2):
+            gatherer.snapshot = make_ports([rx])
+            export(exporter)
+
+        response, body = export(exporter, since_version=response.headers['X-Snapshot-Version'])
+
+        assert response.media_type == 'application/json'
+        assert 'X-Snapshot-Base-Version' not in response.headers
+        assert body == make_ports([2])
+
+    def test_delta_of_projected_fields(self):
+        """With fields, the patch should cover only the projected document."""
+        gatherer = CountingGatherer(make_ports([1, 2]))
+        exporter = DataGathererExporter(gatherer)
+        response, _ = export(exporter, fields='lan_port,transmit_bytes')
+        gatherer.snapshot = make_ports([5, 6])
+
+        _, patch = export(exporter, fields='lan_port,transmit_bytes',
+                          since_version=response.headers['X-Snapshot-Version'])
+
+        assert patch == []
+
+    @pytest.mark.parametrize('since_version', ['', 'latest', '-1', '²', '١٢'])
+    def test_invalid_version(self, since_version):
+        """since_version that is not a version number should be a 400 error."""
+        exporter = DataGathererExporter(CountingGatherer(make_ports([1])))
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(make_request(since_version=since_version))
+
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,120 @@
+"""
+Unit tests for MessagePack and CBOR responses negotiated with Accept.
+
+Encoders are checked against the examples of RFC 8949 and the MessagePack
+specification. Gatherers return prepared snapshots, so no modem is contacted.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from exporters import DataGathererExporter
+from exporters.encoding import choose_encoding, encode_cbor, encode_json, encode_msgpack
+from server import Server, ServerConfig
+from tests.conftest import CountingGatherer, make_request
+
+
+class CountingPort(dict):
+    """Port statistics counting how often they are read for encoding."""
+
+    reads = 0
+
+    def items(self):
+        CountingPort.reads += 1
+        return super().items()
+
+
+@pytest.mark.unit
+class TestEncoders:
+    """Test suite for encode_msgpack() and encode_cbor()."""
+
+    @pytest.mark.parametrize('value,expected', [
+        (0, '00'), (23, '17'), (24, '1818'), (1000, '1903e8'), (1000000, '1a000f4240'),
+        (1000000000000, '1b000000e8d4a51000'), (-1, '20'), (-1000, '3903e7'), (1.1, 'fb3ff199999999999a'),
+        (True, 'f5'), (None, 'f6'), ('IETF', '6449455446'), ([1, 2, 3], '83010203'),
+        ({'a': 1, 'b': [2, 3]}, 'a26161016162820203'),
+        (datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc), 'c11a514b67b0'),
+        (datetime(2013, 3, 21, 20, 4, 0, 500000, tzinfo=timezone.utc), 'c1fb41d452d9ec200000'),
+        (timedelta(seconds=90), 'd903eaa101185a'),
+    ])
+    def test_cbor(self, value, expected):
+        """Values should encode as in RFC 8949, with durations as tag 1002."""
+        assert encode_cbor(value).hex() == expected
+
+    @pytest.mark.parametrize('value,expected', [
+        (0, '00'), (-1, 'ff'), (128, 'cc80'), (-33, 'd0df'), (70000, 'ce00011170'), (-2 ** 40, 'd3ffffff0000000000'),
+        (1.5, 'cb3ff8000000000000'), (False, 'c2'), (None, 'c0'), ('a', 'a161'), ('a' * 32, 'd920' + '61' * 32),
+        ([1, 2], '920102'), ({'a': 1}, '81a16101'),
+        (datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc), 'd6ff514b67b0'),
+        (datetime(2013, 3, 21, 20, 4, 0, 500000, tzinfo=timezone.utc), 'd7ff77359400514b67b0'),
+        (timedelta(seconds=-1.5), 'c70c011dcd6500fffffffffffffffe'),
+    ])
+    def test_msgpack(self, value, expected):
+        """Values should encode as in the MessagePack specification, with durations as extension type 1."""
+        assert encode_msgpack(value).hex() == expected
+
+    def test_naive_datetimes_use_local_time(self):
+        """Modem times without a time zone should be taken to be in the exporter's time zone."""
+        value = datetime(2019, 4, 11, 18, 22, 51)
+
+        assert encode_cbor(value) == encode_cbor(value.astimezone())
+
+
+@pytest.mark.unit
+class TestNegotiation:
+    """Test suite for choosing a format from the Accept header."""
+
+    @pytest.mark.parametrize('accept,media_type', [
+        (None, 'application/json'), ('text/html', 'application/json'), ('*/*', 'application/json'),
+        ('application/msgpack', 'application/msgpack'), ('application/vnd.msgpack', 'application/vnd.msgpack'),
+        ('application/cbor;q=0.9, application/json;q=0.5', 'application/cbor'),
+        ('application/cbor;q=0, application/msgpack;q=0.1', 'application/msgpack'),
+    ])
+    def test_choose_encoding(self, accept, media_type):
+        """The highest quality supported media type should win, with JSON otherwise."""
+        assert choose_encoding(accept)[1] == media_type
+
+    def test_cached_per_snapshot(self):
+        """A snapshot should be encoded once per format, and again only once it changes."""
+        gatherer = CountingGatherer([CountingPort(lan_port=1, receive_bytes=10)], 'HomeNetworkStatusGatherer')
+        exporter = DataGathererExporter(gatherer)
+        CountingPort.reads = 0
+
+        first = exporter.export_request(make_request({'accept': 'application/cbor'}))
+        second = exporter.export_request(make_request({'accept': 'application/cbor'}))
+        exporter.export_request(make_request({'accept': 'application/msgpack'}))
+        assert first.body is second.body and CountingPort.reads == 2
+        gatherer.snapshot = [CountingPort(lan_port=1, receive_bytes=20)]
+
+        assert exporter.export_request(make_request({'accept': 'application/cbor'})).body != first.body
+        assert CountingPort.reads == 3
+
+    def test_delta_in_negotiated_format(self):
+        """since_version should return the JSON Patch operations in the negotiated format."""
+        gatherer = CountingGatherer([{'lan_port': 1, 'receive_bytes': 10}], 'HomeNetworkStatusGatherer')
+        exporter = DataGathererExporter(gatherer)
+        version = exporter.export_request(make_request()).headers['X-Snapshot-Version']
+        gatherer.snapshot = [{'lan_port': 1, 'receive_bytes': 20}]
+
+        response = exporter.export_request(make_request({'accept': 'application/msgpack'}, since_version=version))
+
+        assert response.media_type == 'application/msgpack'
+        assert response.headers['X-Snapshot-Base-Version'] == version
+        assert response.body == encode_msgpack([{'op': 'replace', 'path': '/0/receive_bytes', 'value': 20}])
+
+    def test_server_routes(self):
+        """Data and other JSON routes should answer in the negotiated format, and say they vary by Accept."""
+        snapshot = {'uptime': timedelta(seconds=90), 'checked': datetime(2013, 3, 21, 20, 4, tzinfo=timezone.utc)}
+        exporters = [DataGathererExporter(CountingGatherer(snapshot, 'HomeNetworkStatusGatherer'))]
+        client = TestClient(Server(ServerConfig('127.0.0.1', 8666), exporters).get_app())
+
+        data = client.get('/gatherer/home-network-status', headers={'Accept': 'application/cbor'})
+        health = client.get('/health', headers={'Accept': 'application/msgpack'})
+        default = client.get('/gatherer/home-network-status')
+
+        assert data.headers['content-type'] == 'application/cbor' and data.content == encode_cbor(snapshot)
+        assert health.headers['content-type'] == 'application/msgpack' and health.headers['vary'] == 'Accept'
+        assert health.content == encode_msgpack({'status': 'UP', 'exporters': 3})
+        assert default.json() == {'uptime': 90.0, 'checked': '2013-03-21T20:04:00+00:00'}
+        assert default.content == encode_json(default.json())
@@ -0,0 +1,188 @@
+"""
+Unit tests for prometheus_exporters.exposition.
+
+The protobuf output is checked with a minimal wire-format decoder, so the
+tests do not need the protobuf package.
+"""
+import struct
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from unittest.mock import Mock, patch
+
+from prometheus_exporters import PrometheusMapper
+from prometheus_exporters.exposition import (OPENMETRICS_CONTENT_TYPE, PROTOBUF_CONTENT_TYPE, TEXT_CONTENT_TYPE,
+                                             choose_exposition, generate_protobuf, generate_text,
+                                             render_text_samples)
+
+PROMETHEUS_ACCEPT = ('application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;encoding=delimited;q=0.7,'
+                     'text/plain;version=0.0.4;q=0.3,*/*;q=0.1')
+
+
+class SnapshotMapper(PrometheusMapper):
+    """Mapper exporting a gauge and a counter with a _created sample for each snapshot it gathers."""
+
+    def __init__(self, modem_id, registry, snapshots):
+        gatherer = Mock()
+        gatherer.get_source_id.return_value = modem_id
+        gatherer.gather.side_effect = snapshots
+        super().__init__(gatherer, registry)
+        self.modem_id = modem_id
+
+    def _map(self, data):
+        gauge = GaugeMetricFamily('att_modem_fake', 'Fake "gauge"\nvalue', labels=['modem_id', 'note'])
+        gauge.add_metric([self.modem_id, 'a "quoted"\\value'], data['value'])
+        counter = CounterMetricFamily('att_modem_fake_events', 'Fake events', labels=['modem_id'])
+        counter.add_metric([self.modem_id], data['value'], created=1700000000.5)
+        return [gauge, counter]
+
+
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def decode_message(data: bytes) -> dict:
+    """Decode one protobuf message into {field: [values]}."""
+    fields, pos = {}, 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = struct.unpack('<d', data[pos:pos + 8])[0], pos + 8
+        else:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def decode_families(data: bytes) -> dict:
+    """Decode varint-delimited MetricFamily messages keyed by name."""
+    families, pos = {}, 0
+    while pos < len(data):
+        length, pos = read_varint(data, pos)
+        family = decode_message(data[pos:pos + length])
+        pos += length
+        families[family[1][0].decode()] = family
+    return families
+
+
+@pytest.mark.unit
+class TestChooseExposition:
+    """Test suite for Accept header negotiation."""
+
+    @pytest.mark.parametrize('accept,content_type', [
+        (None, TEXT_CONTENT_TYPE),
+        ('', TEXT_CONTENT_TYPE),
+        ('text/plain;version=0.0.4', TEXT_CONTENT_TYPE),
+        ('application/openmetrics-text;version=1.0.0,text/plain;version=0.0.4;q=0.5', OPENMETRICS_CONTENT_TYPE),
+        (PROMETHEUS_ACCEPT, PROTOBUF_CONTENT_TYPE),
+        ('application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;encoding=text', TEXT_CONTENT_TYPE),
+        ('application/openmetrics-text;q=0,text/plain', TEXT_CONTENT_TYPE),
+        ('application/json', TEXT_CONTENT_TYPE),
+    ])
+    def test_negotiates_content_type(self, accept, content_type):
+        """choose_exposition() should honour media types and q values, falling back to text."""
+        _, chosen = choose_exposition(accept)
+
+        assert chosen == content_type
+
+    def test_openmetrics_output_ends_with_eof(self):
+        """OpenMetrics output should end with the # EOF marker."""
+        registry = CollectorRegistry()
+        Gauge('att_modem_test', 'Test gauge', registry=registry).set(1)
+        generate, _ = choose_exposition('application/openmetrics-text')
+
+        assert generate(registry).endswith(b'# EOF\n')
+
+
+@pytest.mark.unit
+class TestGenerateProtobuf:
+    """Test suite for the protobuf exposition encoder."""
+
+    def test_encodes_gauge_with_labels(self):
+        """Gauges should be encoded with their labels and value."""
+        registry = CollectorRegistry()
+        Gauge('att_modem_lan_state', 'Port state', ['lan_port'], registry=registry).labels('1').set(1)
+
+        family = decode_families(generate_protobuf(registry))['att_modem_lan_state']
+        metric = decode_message(family[4][0])
+        label = decode_message(metric[1][0])
+
+        assert family[3] == [1]
+        assert (label[1][0], label[2][0]) == (b'lan_port', b'1')
+        assert decode_message(metric[2][0])[1] == [1.0]
+
+    def test_encodes_counter_with_total_suffix(self):
+        """Counters should use the _total family name and the counter field."""
+        registry = CollectorRegistry()
+        Counter('att_modem_exporter_errors', 'Errors', registry=registry).inc(3)
+
+        family = decode_families(generate_protobuf(registry))['att_modem_exporter_errors_total']
+        metric = decode_message(family[4][0])
+
+        assert family[3] == [0]
+        assert decode_message(metric[3][0])[1] == [3.0]
+
+    def test_encodes_histogram_buckets(self):
+        """Histograms should carry count, sum and cumulative finite buckets."""
+        registry = CollectorRegistry()
+        histogram = Histogram('att_modem_exporter_duration_seconds', 'Duration', buckets=(1, 2), registry=registry)
+        histogram.observe(0.5)
+        histogram.observe(1.5)
+
+        family = decode_families(generate_protobuf(registry))['att_modem_exporter_duration_seconds']
+        value = decode_message(decode_message(family[4][0])[7][0])
+        buckets = [decode_message(b) for b in value[3]]
+
+        assert family[3] == [4]
+        assert value[1] == [2]
+        assert value[2] == [2.0]
+        assert [(b[2][0], b[1][0]) for b in buckets] == [(1.0, 1), (2.0, 2)]
+
+
+@pytest.mark.unit
+class TestGenerateText:
+    """Test suite for text exposition from cached mapper fragments."""
+
+    def test_matches_generate_latest(self):
+        """Fragments of several mappers, merged by name, should render exactly like generate_latest."""
+        registry = CollectorRegistry()
+        mappers = [SnapshotMapper(modem_id, registry, [{'value': 1}, {'value': 2}]) for modem_id in ('m1', 'm2')]
+        Counter('att_modem_exporter_errors', 'Errors', ['exception'], registry=registry).labels('x').inc()
+
+        for mapper in mappers:
+            mapper.refresh()
+        first = generate_text(registry)
+        first_expected = generate_latest(registry)
+        mappers[1].refresh()
+
+        assert first == first_expected
+        assert first.count(b'# TYPE att_modem_fake_events_created gauge') == 1
+        assert generate_text(registry) == generate_latest(registry)
+
+    def test_renders_only_changed_mappers(self):
+        """A mapper whose families did not change should not render its samples again."""
+        registry = CollectorRegistry()
+        unchanged = SnapshotMapper('m1', registry, [{'value': 1}])
+        changed = SnapshotMapper('m2', registry, [{'value': 1}, {'value': 2}])
+        for mapper in (unchanged, changed):
+            mapper.refresh()
+        generate_text(registry)
+        changed.refresh()
+
+        with patch('prometheus_exporters.render_text_samples', wraps=render_text_samples) as render:
+            output = generate_text(registry)
+
+        assert [call.args[0].samples[0].labels['modem_id'] for call in render.call_args_list] == ['m2', 'm2']
+        assert b'att_modem_fake_events_total{modem_id="m2"} 2.0' in output
@@ -0,0 +1,177 @@
+"""
+Unit tests for the in-memory fleet table and the /fleet/aggregate exporter.
+
+Modem data is recorded directly with explicit timestamps, so no modem is
+contacted and rates do not depend on the clock.
+"""
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+from fastapi import HTTPException
+
+from fleet import AggregateError, Fleet, FleetConfig, configure_fleet, percentile
+from fleet_exporters import FleetAggregateExporter
+from gatherers import CachingDataGatherer, DataGatherer
+from tests.conftest import make_request
+
+LAN = 'HomeNetworkStatusGatherer'
+
+
+def make_ports(states, receive_errors):
+    return [{'lan_port': port, 'state': state, 'receive_errors': errors}
+            for port, (state, errors) in enumerate(zip(states, receive_errors))]
+
+
+def make_fleet(**kwargs) -> Fleet:
+    fleet = Fleet(FleetConfig(enabled=True, **kwargs))
+    fleet.record('modem-1', LAN, make_ports(['UP', 'DOWN'], [0, 0]), now=100)
+    fleet.record('modem-2', LAN, make_ports(['UP', 'UP'], [10, 0]), now=100)
+    fleet.record('modem-1', LAN, make_ports(['UP', 'DOWN'], [20, 0]), now=110)
+    fleet.record('modem-2', LAN, make_ports(['UP', 'UP'], [30, 40]), now=110)
+    return fleet
+
+
+class ModemGatherer(DataGatherer):
+    """Gatherer returning fixed LAN ports for one modem."""
+
+    def gather(self):
+        return make_ports(['UP'], [5])
+
+    def get_name(self) -> str:
+        return LAN
+
+    def get_source_id(self) -> str:
+        return 'modem-1'
+
+
+@pytest.mark.unit
+class TestFleet:
+    """Test suite for Fleet."""
+
+    @pytest.mark.parametrize('op,expected', [('sum', 90), ('mean', 22.5), ('min', 0), ('max', 40), ('count', 4)])
+    def test_values(self, op, expected):
+        """Ops should apply to the latest value of every row."""
+        assert make_fleet().aggregate(LAN, 'receive_errors', op, now=110) == {'value': expected}
+
+    @pytest.mark.parametrize('op,expected', [('sum', 50), ('mean', 50 / 3), ('min', 0), ('max', 30), ('count', 3),
+                                             ('p100', 30)])
+    def test_values_skip_missing_rows(self, op, expected):
+        """Rows freed when a modem reports fewer ports should be left out of every op."""
+        fleet = make_fleet()
+        fleet.record('modem-2', LAN, make_ports(['UP'], [30]), now=120)
+
+        assert fleet.aggregate(LAN, 'receive_errors', op, now=120) == {'value': expected}
+
+    def test_rates(self):
+        """Rates should be per second since the previous refresh of each row."""
+        fleet = make_fleet()
+
+        assert fleet.aggregate(LAN, 'receive_errors', 'sum', rate=True, now=110) == {'value': 8.0}
+        assert fleet.aggregate(LAN, 'receive_errors', 'max', rate=True, group_by='modem_id', now=110) == \
+            {'groups': {'modem-1': 2.0, 'modem-2': 4.0}}
+
+    def test_counter_reset_has_no_rate(self):
+        """A counter that went down should have no rate rather than a negative one."""
+        fleet = make_fleet()
+        fleet.record('modem-2', LAN, make_ports(['UP', 'UP'], [1, 50]), now=120)
+
+        assert fleet.aggregate(LAN, 'receive_errors', 'count', rate=True, now=120) == {'value': 3}
+
+    def test_count_by_label(self):
+        """Text fields should group rows, and be counted."""
+        fleet = make_fleet()
+
+        assert fleet.aggregate(LAN, 'lan_port', 'count', group_by='state', now=110) == {'groups': {'UP': 3, 'DOWN': 1}}
+        assert fleet.aggregate(LAN, 'state', 'count', now=110) == {'value': 4}
+
+    def test_percentile(self):
+        """Percentiles should interpolate between the closest ranks."""
+        assert percentile([40, 10, 20, 30], 50) == 25
+        assert make_fleet().aggregate(LAN, 'receive_errors', 'p100', now=110) == {'value': 40}
+
+    def test_stale_modems_expire(self):
+        """Modems not refreshed within max_age should leave the aggregates and free their rows."""
+        fleet = make_fleet(max_age=timedelta(seconds=30))
+        fleet.record('modem-2', LAN, make_ports(['UP', 'UP'], [30, 40]), now=135)
+
+        assert fleet.aggregate(LAN, 'receive_errors', 'sum', group_by='modem_id', now=145) == \
+            {'groups': {'modem-2': 70}}
+        fleet.record('modem-3', LAN, make_ports(['DOWN'], [1]), now=145)
+        assert len(fleet._tables[LAN]._modem_ids) == 4
+
+    def test_max_modems(self):
+        """Modems past max_modems should not be recorded while the others are current."""
+        fleet = make_fleet(max_modems=2)
+        fleet.record('modem-3', LAN, make_ports(['UP'], [1]), now=110)
+
+        assert fleet.aggregate(LAN, 'receive_errors', 'count', group_by='modem_id', now=110) == \
+            {'groups': {'modem-1': 2, 'modem-2': 2}}
+
+    def test_nested_fields_and_fewer_rows(self):
+        """Nested dicts should be dotted fields, and list elements that are gone should leave the table."""
+        fleet = Fleet(FleetConfig(enabled=True))
+        fleet.record('modem-1', 'BroadbandStatusGatherer', {'ipv4_statistics': {'receive_bytes': 5}}, now=1)
+        fleet.record('modem-1', LAN, make_ports(['UP', 'UP'], [1, 2]), now=1)
+        fleet.record('modem-1', LAN, make_ports(['UP'], [1]), now=2)
+
+        assert fleet.aggregate('BroadbandStatusGatherer', 'ipv4_statistics.receive_bytes', 'sum', now=2) == \
+            {'value': 5}
+        assert fleet.aggregate(LAN, 'receive_errors', 'count', now=2) == {'value': 1}
+
+    @pytest.mark.parametrize('field,op,rate', [('missing', 'sum', False), ('receive_errors', 'median', False),
+                                               ('receive_errors', 'p101', False), ('state', 'sum', False),
+                                               ('state', 'count', True)])
+    def test_invalid_aggregates(self, field, op, rate):
+        """Unknown fields and ops, and numeric ops on text fields, should raise AggregateError."""
+        with pytest.raises(AggregateError):
+            make_fleet().aggregate(LAN, field, op, rate=rate, now=110)
+
+    def test_caching_gatherer_records_refreshes(self):
+        """With a fleet configured, each refresh of a caching gatherer should be recorded."""
+        fleet = configure_fleet(FleetConfig(enabled=True))
+        try:
+            CachingDataGatherer(ModemGatherer()).gather()
+        finally:
+            configure_fleet(None)
+
+        assert fleet.aggregate(LAN, 'receive_errors', 'sum') == {'value': 5}
+
+    def test_recording_errors_do_not_fail_gathering(self):
+        """A value the fleet cannot record should still be cached and returned to the caller."""
+        fleet = configure_fleet(FleetConfig(enabled=True))
+        fleet.record = Mock(side_effect=ValueError('Missing required value: MTU'))
+        gatherer = CachingDataGatherer(ModemGatherer())
+        try:
+            value = gatherer.gather()
+        finally:
+            configure_fleet(None)
+
+        assert value == make_ports(['UP'], [5])
+        assert gatherer.gather() is value
+
+
+@pytest.mark.unit
+class TestFleetAggregateExporter:
+    """Test suite for FleetAggregateExporter."""
+
+    def test_aggregate(self):
+        """Fields should be named after the data endpoints."""
+        exporter = FleetAggregateExporter(make_fleet(max_age=timedelta(days=365 * 100)))
+
+        result = exporter.export_request(make_request(field='home-network-status.lan_port', op='count',
+                                                      group_by='state'))
+
+        assert result == {'field': 'home-network-status.lan_port', 'op': 'count', 'rate': False,
+                          'group_by': 'state', 'groups': {'UP': 3, 'DOWN': 1}}
+
+    @pytest.mark.parametrize('params', [{}, {'field': 'receive_errors'}, {'field': 'broadband-status.mtu'},
+                                        {'field': 'home-network-status.receive_errors', 'op': 'median'}])
+    def test_invalid_requests(self, params):
+        """Missing or unknown fields and ops should be a 400 error."""
+        exporter = FleetAggregateExporter(make_fleet(max_age=timedelta(days=365 * 100)))
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(make_request(**params))
+
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,152 @@
+"""
+Unit tests for history_exporters module.
+
+Stores are written to pytest temporary directories with synthetic
+timestamps, so segments are sealed without waiting for real time to pass.
+"""
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from history_exporters import HistoryConfig, HistoryDataExporter, HistoryStore, flatten_numeric
+from history_exporters.storage import ColumnTier
+from tests.conftest import make_request
+
+START = 1_700_000_000 // 86400 * 86400
+
+
+def make_store(path, interval=10, **retention_days):
+    retention = {'raw': 2, '1m': 30, '1h': 365, '1d': 1825}
+    retention.update(retention_days)
+    config = HistoryConfig(str(path), timedelta(seconds=interval),
+                           {k: timedelta(days=v) for k, v in retention.items()}, max_points=1000)
+    return HistoryStore(str(path), config)
+
+
+@pytest.mark.unit
+class TestColumnTier:
+    """Test suite for ColumnTier."""
+
+    def test_reads_back_across_sealed_and_open_segments(self, tmp_path):
+        """Rows should be readable from sealed segments and the open one, in time order."""
+        tier = ColumnTier(str(tmp_path), 'raw', 10, 100, 86400)
+        for i in range(25):
+            tier.append(START + i * 10, {'wan.rx': float(i)})
+
+        timestamps, series = tier.query(START, START + 1000, ['*'])
+
+        assert timestamps == [START + i * 10 for i in range(25)]
+        assert series['wan.rx'] == [float(i) for i in range(25)]
+        assert len([f for f in os.listdir(tmp_path) if f.endswith('.seg')]) == 2
+
+    def test_pads_series_that_appear_or_disappear(self, tmp_path):
+        """Missing values should read back as None for both new and dropped series."""
+        tier = ColumnTier(str(tmp_path), 'raw', 10, 100, 86400)
+        tier.append(START, {'a': 1.0})
+        tier.append(START + 10, {'b': 2.0})
+
+        _, series = tier.query(START, START + 10, ['*'])
+
+        assert series == {'a': [1.0, None], 'b': [None, 2.0]}
+
+    def test_filters_series_and_time_range(self, tmp_path):
+        """Queries should only return matching series within the requested range."""
+        tier = ColumnTier(str(tmp_path), 'raw', 10, 100, 86400)
+        for i in range(30):
+            tier.append(START + i * 10, {'lan.0.rx': float(i), 'wan.rx': 0.0})
+
+        timestamps, series = tier.query(START + 95, START + 205, ['lan.*'])
+
+        assert timestamps == [START + i * 10 for i in range(10, 21)]
+        assert list(series) == ['lan.0.rx']
+
+    def test_reopens_open_segment(self, tmp_path):
+        """A new tier on the same directory should continue the open segment."""
+        tier = ColumnTier(str(tmp_path), 'raw', 10, 100, 86400)
+        tier.append(START, {'a': 1.0})
+        tier.close()
+
+        reopened = ColumnTier(str(tmp_path), 'raw', 10, 100, 86400)
+
+        assert not reopened.append(START, {'a': 9.0})
+        assert reopened.append(START + 10, {'a': 2.0})
+        assert reopened.query(START, START + 10, ['*'])[1] == {'a': [1.0, 2.0]}
+
+    def test_drops_segments_past_retention(self, tmp_path):
+        """Sealed segments older than the retention should be deleted."""
+        tier = ColumnTier(str(tmp_path), 'raw', 10, 100, 250)
+        for i in range(60):
+            tier.append(START + i * 10, {'a': float(i)})
+
+        timestamps, _ = tier.query(START, START + 1000, ['*'])
+
+        assert timestamps[0] == START + 200
+
+
+@pytest.mark.unit
+class TestHistoryStore:
+    """Test suite for HistoryStore."""
+
+    def test_rolls_up_last_value_per_bucket(self, tmp_path):
+        """Rollup tiers should keep the last value recorded in each bucket."""
+        store = make_store(tmp_path)
+        for i in range(13):
+            store.record(START + i * 10, {'wan.rx': float(i)})
+
+        result = store.query(START, START + 120, ['*'], tier='1m')
+
+        assert result['timestamps'] == [START, START + 60, START + 120]
+        assert result['series']['wan.rx'] == [5.0, 11.0, 12.0]
+
+    def test_chooses_tier_by_retention_and_points(self, tmp_path):
+        """The finest tier covering the range within max_points should be chosen."""
+        store = make_store(tmp_path)
+        now = START + 100 * 86400
+
+        assert store.choose_tier(now - 3600, now, now).name == 'raw'
+        assert store.choose_tier(now - 12 * 3600, now, now).name == '1m'
+        assert store.choose_tier(now - 60 * 86400, now - 59 * 86400, now).name == '1h'
+        assert store.choose_tier(now - 90 * 86400, now, now).name == '1d'
+
+    def test_rejects_unknown_tier(self, tmp_path):
+        """Unknown tier names should raise ValueError."""
+        with pytest.raises(ValueError):
+            make_store(tmp_path).query(START, START + 60, ['*'], tier='5m')
+
+
+@pytest.mark.unit
+class TestHistoryDataExporter:
+    """Test suite for HistoryDataExporter."""
+
+    def test_exports_relative_range(self, tmp_path):
+        """Negative start values should be relative to now."""
+        store = make_store(tmp_path)
+        store.record(time.time() - 120, {'a': 0.0})
+        store.record(time.time() - 30, {'a': 1.0})
+        exporter = HistoryDataExporter('history', '/history', store)
+
+        result = exporter.export_request(make_request(start='-60', tier='raw'))
+
+        assert result['series'] == {'a': [1.0]}
+
+    @pytest.mark.parametrize('params', [{'start': 'yesterday'}, {'start': '200', 'end': '100'}, {'tier': '5m'}])
+    def test_rejects_invalid_parameters(self, tmp_path, params):
+        """Invalid parameters should be rejected with 400."""
+        exporter = HistoryDataExporter('history', '/history', make_store(tmp_path))
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(make_request(**params))
+
+        assert exc_info.value.status_code == 400
+
+
+@pytest.mark.unit
+def test_flatten_numeric_keeps_only_numbers():
+    """flatten_numeric() should keep numeric leaves and drop strings and booleans."""
+    data = [{'lan_port': 1, 'state': 'UP', 'receive_bytes': 10, 'enabled': True}]
+
+    assert flatten_numeric('home-network-status', data) == {
+        'home-network-status.0.lan_port': 1.0, 'home-network-status.0.receive_bytes': 10.0}
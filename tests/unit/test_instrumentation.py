@@ -0,0 +1,97 @@
+"""
+Unit tests for instrumentation module.
+
+Each test configures instrumentation against its own CollectorRegistry
+and restores the disabled default afterwards.
+"""
+import pytest
+from datetime import timedelta
+
+from prometheus_client import CollectorRegistry
+
+from gatherers import CachingDataGatherer
+from instrumentation import ExporterInstrumentation, configure_instrumentation, get_instrumentation
+from modem_gatherers import ModemClientDataGatherer
+from tests.conftest import CountingGatherer
+
+
+class TableGatherer(ModemClientDataGatherer):
+    """Modem gatherer mapping parsed tables as-is."""
+
+    def _map(self, stats: dict):
+        return stats
+
+
+@pytest.fixture
+def registry():
+    """Fresh registry with instrumentation enabled for the test."""
+    registry = CollectorRegistry()
+    configure_instrumentation(registry)
+    yield registry
+    configure_instrumentation(None)
+
+
+@pytest.mark.unit
+class TestExporterInstrumentation:
+    """Test suite for ExporterInstrumentation."""
+
+    def test_disabled_by_default(self):
+        """Instrumentation should be a no-op until configured."""
+        instrumentation = ExporterInstrumentation()
+
+        with instrumentation.time_stage('fetch', 'g', 'm'):
+            pass
+        instrumentation.count_cache_request('g', 'm', 'hit')
+
+        assert not instrumentation.is_enabled()
+
+    def test_time_stage_observes_duration(self, registry):
+        """time_stage() should record one observation per stage."""
+        with get_instrumentation().time_stage('parse', 'TestGatherer', 'test-modem'):
+            pass
+
+        count = registry.get_sample_value('att_modem_exporter_stage_duration_seconds_count',
+                                          {'stage': 'parse', 'gatherer': 'TestGatherer', 'modem_id': 'test-modem'})
+        assert count == 1
+
+    def test_caching_gatherer_counts_miss_hit_and_stale(self, registry):
+        """CachingDataGatherer should report miss, hit and stale lookups."""
+        caching = CachingDataGatherer(CountingGatherer(), cache_duration=timedelta(seconds=60))
+
+        caching.gather()
+        caching.gather()
+        caching._cache.clear()
+        caching.gather()
+
+        def count(result):
+            return registry.get_sample_value('att_modem_exporter_cache_requests_total',
+                                             {'gatherer': 'CountingGatherer', 'modem_id': '', 'result': result})
+        assert (count('miss'), count('hit'), count('stale')) == (1, 1, 1)
+
+    def test_modem_gatherer_records_stages_and_size(self, registry, mock_modem_client, mock_response):
+        """ModemClientDataGatherer should time fetch, parse and map and record response size."""
+        mock_response.text = '<table><tr><th>Label</th><td>1</td></tr></table>'
+        mock_response.content = mock_response.text.encode()
+        mock_modem_client._fetch.return_value = mock_response
+        gatherer = TableGatherer(mock_modem_client, '/test')
+
+        assert gatherer.gather() == {'Label': ['1']}
+
+        labels = {'gatherer': 'TableGatherer', 'modem_id': 'test-modem'}
+        for stage in ('fetch', 'parse', 'map'):
+            assert registry.get_sample_value('att_modem_exporter_stage_duration_seconds_count',
+                                             {'stage': stage, **labels}) == 1
+        assert registry.get_sample_value('att_modem_exporter_response_size_bytes_sum', labels) == len(mock_response.content)
+
+    def test_modem_gatherer_counts_errors_by_exception_type(self, registry, mock_modem_client, mock_response):
+        """Gather errors should be counted with the exception type as label."""
+        mock_response.content = mock_response.text.encode()
+        mock_modem_client._fetch.return_value = mock_response
+        gatherer = TableGatherer(mock_modem_client, '/test')
+
+        with pytest.raises(ValueError, match="No statistics found"):
+            gatherer.gather()
+
+        assert registry.get_sample_value('att_modem_exporter_scrape_errors_total',
+                                         {'gatherer': 'TableGatherer', 'modem_id': 'test-modem',
+                                          'exception': 'ValueError'}) == 1
@@ -0,0 +1,158 @@
+"""
+Unit tests for the mapper label policy and per-modem series budget.
+
+Each test configures the policy it needs and restores the default policy,
+which leaves the exposition unchanged, afterwards.
+"""
+import gc
+import hashlib
+from datetime import timedelta
+
+import pytest
+from prometheus_client import CollectorRegistry, generate_latest
+
+from instrumentation import configure_instrumentation
+from modem_client import ModemClient, ModemConfig
+from modem_gatherers.home_network_status import HomeNetworkStatusGatherer
+from modem_gatherers.system_information import SystemInformationGatherer
+from modem_prometheus_mappers.home_network_status_mapper import HomeNetworkStatusPrometheusMapper
+from modem_prometheus_mappers.label_policy import LabelPolicy, configure_label_policy
+from modem_prometheus_mappers.system_information_mapper import SystemInformationPrometheusMapper
+
+
+def make_gatherer(cls, data):
+    gatherer = cls(ModemClient(ModemConfig('modem-1', 'http://modem-1', None)))
+    gatherer.gather = lambda: data
+    return gatherer
+
+
+SYSTEM_INFORMATION = {'manufacturer': 'Pace Plc', 'model_number': 'BGW210-700', 'serial_number': 'SN123',
+                      'mac_address': 'aa:bb:cc:dd:ee:ff', 'time_since_last_reboot': timedelta(seconds=90)}
+
+
+def render(policy, cls, gatherer_cls, data):
+    configure_label_policy(policy)
+    registry = CollectorRegistry()
+    cls(make_gatherer(gatherer_cls, data), registry).refresh()
+    return generate_latest(registry).decode()
+
+
+@pytest.fixture(autouse=True)
+def default_policy():
+    """Restore the default label policy after each test."""
+    yield
+    configure_label_policy(LabelPolicy())
+
+
+@pytest.mark.unit
+class TestLabelPolicy:
+    """Test suite for label policies applied by the modem mappers."""
+
+    def test_default_policy_keeps_identity_labels(self):
+        """Without a policy the identity labels stay on the uptime series."""
+        output = render(LabelPolicy(), SystemInformationPrometheusMapper, SystemInformationGatherer,
+                        SYSTEM_INFORMATION)
+
+        assert 'att_modem_info' not in output
+        assert ('att_modem_uptime_seconds{mac_address="aa:bb:cc:dd:ee:ff",manufacturer="Pace Plc",'
+                'model_number="BGW210-700",modem_id="modem-1",modem_url="http://modem-1",'
+                'serial_number="SN123"} 90.0') in output
+
+    def test_info_metric_moves_identity_labels(self):
+        """The info metric should carry the identity labels and other series only modem_id."""
+        output = render(LabelPolicy(info_metric=True), SystemInformationPrometheusMapper,
+                        SystemInformationGatherer, SYSTEM_INFORMATION)
+
+        assert ('att_modem_info{mac_address="aa:bb:cc:dd:ee:ff",manufacturer="Pace Plc",'
+                'model_number="BGW210-700",modem_id="modem-1",modem_url="http://modem-1",'
+                'serial_number="SN123"} 1.0') in output
+        assert 'att_modem_uptime_seconds{modem_id="modem-1"} 90.0' in output
+
+    def test_drop_modem_url(self):
+        """A dropped label should not appear on any series."""
+        output = render(LabelPolicy(drop=['modem_url']), HomeNetworkStatusPrometheusMapper,
+                        HomeNetworkStatusGatherer, [{'lan_port': 1, 'receive_bytes': 100}])
+
+        assert 'att_modem_lan_receive_bytes{lan_port="1",modem_id="modem-1"} 100.0' in output
+        assert 'modem_url' not in output
+
+    def test_hash_serial_number(self):
+        """A hashed label should be exported as a stable truncated SHA-256."""
+        output = render(LabelPolicy(hash=['serial_number']), SystemInformationPrometheusMapper,
+                        SystemInformationGatherer, SYSTEM_INFORMATION)
+
+        assert f'serial_number="{hashlib.sha256(b"SN123").hexdigest()[:16]}"' in output
+        assert 'SN123' not in output
+
+    @pytest.mark.parametrize('kwargs', [{'drop': ['modem_id']}, {'hash': ['lan_port']},
+                                        {'drop': ['serial_number'], 'hash': ['serial_number']},
+                                        {'series_budget': -1}])
+    def test_invalid_policy(self, kwargs):
+        """Only identity labels may be dropped or hashed, once, and the budget cannot be negative."""
+        with pytest.raises(ValueError):
+            LabelPolicy(**kwargs)
+
+
+@pytest.mark.unit
+class TestSeriesBudget:
+    """Test suite for the per-modem series budget."""
+
+    def test_budget_shared_by_mappers_of_a_modem(self):
+        """Mappers of one modem should share the budget and count each refresh that drops series."""
+        instrumentation_registry = CollectorRegistry()
+        configure_instrumentation(instrumentation_registry)
+        configure_label_policy(LabelPolicy(series_budget=3))
+        try:
+            registry = CollectorRegistry()
+            SystemInformationPrometheusMapper(
+                make_gatherer(SystemInformationGatherer, SYSTEM_INFORMATION), registry).refresh()
+            lan = HomeNetworkStatusPrometheusMapper(make_gatherer(
+                HomeNetworkStatusGatherer, [{'lan_port': port, 'receive_bytes': 100} for port in (1, 2, 3)]),
+                registry)
+            lan.refresh()
+            lan.refresh()
+            output = generate_latest(registry).decode()
+        finally:
+            configure_instrumentation(None)
+
+        assert output.count('att_modem_uptime_seconds{') == 1
+        assert output.count('att_modem_lan_receive_bytes{') == 2
+        assert instrumentation_registry.get_sample_value('att_modem_exporter_series_budget_violations_total',
+                                                         {'modem_id': 'modem-1'}) == 1
+
+    def test_budget_released_by_discarded_mappers(self):
+        """Series of a mapper that no longer exists should not count against the budget."""
+        configure_label_policy(LabelPolicy(series_budget=2))
+        ports = [{'lan_port': port, 'receive_bytes': 100} for port in (1, 2)]
+        HomeNetworkStatusPrometheusMapper(make_gatherer(HomeNetworkStatusGatherer, ports), None).refresh()
+        gc.collect()
+        registry = CollectorRegistry()
+        HomeNetworkStatusPrometheusMapper(make_gatherer(HomeNetworkStatusGatherer, ports), registry).refresh()
+
+        assert generate_latest(registry).decode().count('att_modem_lan_receive_bytes{') == 2
+
+    def test_budget_allocated_in_creation_order(self):
+        """Mappers created first should keep their series, whichever mapper refreshes first."""
+        instrumentation_registry = CollectorRegistry()
+        configure_instrumentation(instrumentation_registry)
+        configure_label_policy(LabelPolicy(series_budget=3))
+        try:
+            first_registry = CollectorRegistry()
+            first_gatherer = make_gatherer(HomeNetworkStatusGatherer, [{'lan_port': 1, 'receive_bytes': 100}])
+            first = HomeNetworkStatusPrometheusMapper(first_gatherer, first_registry)
+            second_gatherer = make_gatherer(HomeNetworkStatusGatherer, None)
+            second_gatherer.gather = lambda: [{'lan_port': port, 'receive_bytes': 100} for port in (1, 2)]
+            second = HomeNetworkStatusPrometheusMapper(second_gatherer, CollectorRegistry())
+
+            second.refresh()
+            first.refresh()
+            ports = [{'lan_port': port, 'receive_bytes': 100} for port in (1, 2, 3)]
+            first_gatherer.gather = lambda: ports
+            first.refresh()
+            second.refresh()
+        finally:
+            configure_instrumentation(None)
+
+        assert generate_latest(first_registry).decode().count('att_modem_lan_receive_bytes{') == 3
+        assert instrumentation_registry.get_sample_value('att_modem_exporter_series_budget_violations_total',
+                                                         {'modem_id': 'modem-1'}) == 1
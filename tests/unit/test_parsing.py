@@ -0,0 +1,98 @@
+"""
+Unit tests for page parsing and the parse process pool.
+
+Pages are the BGW210 pages in benchmarks/fixtures. Tests that start a pool
+use a single worker process and close the pool afterwards.
+"""
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+
+from modem_client import ModemClient, ModemConfig
+from modem_gatherers.home_network_status import HomeNetworkStatusGatherer
+from modem_gatherers.parsing import ParseConfig, ParsePool, configure_parse_pool, parse_page
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent.parent / 'benchmarks' / 'fixtures' / 'bgw210'
+PAGE = (FIXTURES_DIR / 'lanstatistics.ha').read_bytes()
+
+
+@pytest.fixture
+def pool():
+    """Parse pool with one worker that is replaced after every page."""
+    pool = ParsePool(ParseConfig(workers=1, max_tasks_per_worker=1))
+    yield pool
+    pool.close()
+
+
+@pytest.mark.unit
+class TestParseConfig:
+    """Test suite for ParseConfig."""
+
+    @pytest.mark.parametrize('kwargs', [{'workers': -1}, {'max_tasks_per_worker': 0}, {'max_pending': 0}])
+    def test_invalid_config(self, kwargs):
+        """Worker counts and limits must be in range."""
+        with pytest.raises(ValueError):
+            ParseConfig(**kwargs)
+
+    def test_from_env(self, monkeypatch):
+        """from_env() should read the PARSE_ variables, with pending pages defaulting to four per worker."""
+        monkeypatch.setenv('PARSE_WORKERS', '3')
+        monkeypatch.setenv('PARSE_MAX_TASKS_PER_WORKER', '50')
+
+        config = ParseConfig.from_env()
+
+        assert (config.workers, config.max_tasks_per_worker, config.max_pending) == (3, 50, 12)
+
+    def test_no_pool_by_default(self):
+        """Without workers there is no pool and pages are parsed in process."""
+        assert configure_parse_pool(ParseConfig()) is None
+
+
+@pytest.mark.unit
+class TestParsePool:
+    """Test suite for parsing pages in worker processes."""
+
+    def test_parse_page_matches_gatherer(self):
+        """parse_page() should find the same tables as the gatherer, and the nonce."""
+        gatherer = HomeNetworkStatusGatherer(ModemClient(ModemConfig('modem-1', 'http://modem-1', None)))
+
+        stats, nonce = parse_page(PAGE, 'utf-8')
+
+        assert stats == gatherer._parse_html(PAGE.decode())
+        assert nonce
+
+    def test_recycled_workers_keep_parsing(self, pool):
+        """Pages should still be parsed while workers are replaced after each one."""
+        results = [pool.parse(PAGE, 'utf-8') for _ in range(3)]
+
+        assert results == [parse_page(PAGE, 'utf-8')] * 3
+
+    def test_dead_worker_falls_back_to_in_process(self, caplog):
+        """A pool whose worker died should still return the page, parsed in process, and restart."""
+        pool = ParsePool(ParseConfig(workers=1))
+        try:
+            pool.parse(PAGE, 'utf-8')
+            for process in list(pool._executor._processes.values()):
+                process.kill()
+                process.join()
+
+            assert pool.parse(PAGE, 'utf-8') == parse_page(PAGE, 'utf-8')
+            assert 'Parse worker died' in caplog.text
+            assert pool.parse(PAGE, 'utf-8') == parse_page(PAGE, 'utf-8')
+        finally:
+            pool.close()
+
+    def test_gatherer_parses_in_pool(self):
+        """With a pool configured, the gatherer should skip parsing in the fetch and take the nonce from the pool."""
+        client = ModemClient(ModemConfig('modem-1', 'http://modem-1', None))
+        client._fetch = Mock(return_value=Mock(content=PAGE, encoding='utf-8'))
+        configure_parse_pool(ParseConfig(workers=1))
+        try:
+            ports = HomeNetworkStatusGatherer(client).gather()
+        finally:
+            configure_parse_pool(None)
+
+        client._fetch.assert_called_once_with('/cgi-bin/lanstatistics.ha', find_nonce=False)
+        assert client.nonce == parse_page(PAGE, 'utf-8')[1]
+        assert len(ports) == 4
@@ -0,0 +1,207 @@
+"""
+Unit tests for probe_exporters module.
+
+Probe modules are replaced by fake mapper factories, so no modem is
+contacted.
+"""
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+from unittest.mock import Mock
+
+from instrumentation import configure_instrumentation
+from modem_prometheus_mappers.label_policy import LabelPolicy, configure_label_policy, get_series_budget
+from probe_exporters import ProbeConfig, ProbeExporter
+from prometheus_exporters import PrometheusMapper
+from tests.conftest import make_request
+
+
+class FakeMapper(PrometheusMapper):
+    """Mapper that records refreshes, optionally fails and can be held in refresh by an event."""
+
+    def __init__(self, client, registry, fail=False, release=None, refreshing=None):
+        super().__init__(Mock(**{'get_source_id.return_value': client.config.id}), registry)
+        self.client = client
+        self.fail = fail
+        self.release = release
+        self.refreshing = refreshing or threading.Event()
+        self.closed_during_refresh = None
+        self.refresh_count = 0
+
+    def refresh(self):
+        self.refresh_count += 1
+        self.refreshing.set()
+        if self.release is not None:
+            self.release.wait(5)
+            self.closed_during_refresh = self.client.close.called
+        if self.fail:
+            raise ValueError('No statistics found')
+
+    def _map(self, data):
+        pass
+
+
+class ModemMapper(PrometheusMapper):
+    """Mapper gathering one gauge for the probed modem, recording instrumentation and using the series budget."""
+
+    def __init__(self, client, registry):
+        super().__init__(Mock(**{'get_name.return_value': 'ModemGatherer', 'get_source_id.return_value': client.config.id,
+                                 'gather.return_value': {'uptime': 1}}), registry)
+        self.client = client
+
+    def _limit_families(self, families):
+        return get_series_budget().limit(self.client.config.id, self, families, 10)[0]
+
+    def _map(self, data):
+        yield GaugeMetricFamily('att_modem_uptime', 'Modem uptime', value=data['uptime'])
+
+
+class SecondMapper(FakeMapper):
+    """Fake mapper exported as a second collector."""
+
+
+def make_exporter(max_targets=2, idle_seconds=600, fail=False, release=None, refreshing=None):
+    created = []
+
+    def create_mappers(client, registry):
+        mapper = FakeMapper(client, registry, fail, release, refreshing)
+        created.append(mapper)
+        return [mapper]
+
+    return ProbeExporter({'bgw210': create_mappers}, ProbeConfig(max_targets, idle_seconds)), created
+
+
+@pytest.mark.unit
+class TestProbeExporter:
+    """Test suite for ProbeExporter."""
+
+    def test_rejects_invalid_target(self):
+        """Targets that are not http(s) URLs should be rejected with 400."""
+        exporter, _ = make_exporter()
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(make_request(target='file:///etc/passwd'))
+
+        assert exc_info.value.status_code == 400
+
+    def test_rejects_unknown_module(self):
+        """Unknown modules should be rejected with 400."""
+        exporter, _ = make_exporter()
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(make_request(target='http://192.168.1.254', module='nope'))
+
+        assert exc_info.value.status_code == 400
+
+    def test_reuses_target_between_probes(self):
+        """Repeated probes of one target should reuse its client and mappers."""
+        exporter, created = make_exporter()
+
+        exporter.export_request(make_request(target='http://192.168.1.254'))
+        output = exporter.export_request(make_request(target='http://192.168.1.254'))
+
+        assert len(created) == 1
+        assert created[0].refresh_count == 2
+        assert created[0].client.config.id == '192.168.1.254'
+        assert b'att_modem_probe_success 1.0' in output
+
+    def test_failed_probe_reports_success_zero(self):
+        """A failing probe should still return metrics with probe success 0."""
+        exporter, _ = make_exporter(fail=True)
+
+        output = exporter.export_request(make_request(target='http://192.168.1.254'))
+
+        assert b'att_modem_probe_success 0.0' in output
+
+    def test_evicts_least_recently_used_target(self):
+        """Only max_targets targets should be kept, evicting the least recently used."""
+        exporter, created = make_exporter(max_targets=2)
+
+        for target in ('http://a', 'http://b', 'http://a', 'http://c', 'http://b'):
+            exporter.export_request(make_request(target=target))
+
+        assert exporter.get_target_count() == 2
+        assert [m.client.config.url for m in created] == ['http://a', 'http://b', 'http://c', 'http://b']
+
+    def test_evicts_idle_targets(self):
+        """Targets unused for longer than idle_seconds should be evicted."""
+        exporter, _ = make_exporter(max_targets=10, idle_seconds=0.05)
+
+        exporter.export_request(make_request(target='http://a'))
+        time.sleep(0.1)
+        exporter.export_request(make_request(target='http://b'))
+
+        assert exporter.get_target_count() == 1
+
+    def test_evicts_idle_targets_without_new_probes(self):
+        """Idle targets should be evicted, and their clients closed, even when no further probe arrives."""
+        exporter, created = make_exporter(max_targets=10, idle_seconds=0.05)
+
+        exporter.export_request(make_request(target='http://a'))
+        created[0].client.close = Mock()
+        time.sleep(0.3)
+
+        assert exporter.get_target_count() == 0
+        created[0].client.close.assert_called_once_with()
+
+    def test_eviction_waits_for_running_probe(self):
+        """A target evicted while it is being probed should only be closed once the probe finishes."""
+        release, refreshing = threading.Event(), threading.Event()
+        exporter, created = make_exporter(max_targets=1, release=release, refreshing=refreshing)
+        probe = threading.Thread(target=exporter.export_request, args=(make_request(target='http://a'),))
+        probe.start()
+        refreshing.wait(5)
+        created[0].client.close = Mock()
+        evicting = threading.Thread(target=exporter.export_request, args=(make_request(target='http://b'),))
+
+        evicting.start()
+        time.sleep(0.05)
+        release.set()
+        probe.join(5)
+        evicting.join(5)
+
+        assert created[0].closed_during_refresh is False
+        assert created[0].client.close.called
+        assert exporter.get_target_count() == 1
+
+    def test_failing_mapper_does_not_skip_the_others(self):
+        """A mapper failing should still refresh the mappers after it, and report success per mapper."""
+        created = []
+
+        def create_mappers(client, registry):
+            created.extend([FakeMapper(client, registry, fail=True), SecondMapper(client, registry)])
+            return created
+        exporter = ProbeExporter({'bgw210': create_mappers}, ProbeConfig())
+
+        output = exporter.export_request(make_request(target='http://a', modem_id='modem-a'))
+
+        assert created[1].refresh_count == 1
+        assert b'att_modem_probe_success 0.0' in output
+        assert b'att_modem_scrape_success{collector="FakeMapper",modem_id="modem-a"} 0.0' in output
+        assert b'att_modem_scrape_success{collector="SecondMapper",modem_id="modem-a"} 1.0' in output
+
+    def test_evicted_modems_leave_no_series(self):
+        """Probing more modem_ids than max_targets should keep the instrumentation and budget bounded."""
+        registry = CollectorRegistry()
+        configure_instrumentation(registry)
+        configure_label_policy(LabelPolicy())
+        exporter = ProbeExporter({'bgw210': lambda client, r: [ModemMapper(client, r)]}, ProbeConfig(max_targets=2))
+
+        def sample_count():
+            return sum(len(metric.samples) for metric in registry.collect())
+        try:
+            for index in range(3):
+                exporter.export_request(make_request(target='http://a', modem_id=f'modem-{index}'))
+            bounded = sample_count()
+            for index in range(3, 50):
+                exporter.export_request(make_request(target='http://a', modem_id=f'modem-{index}'))
+
+            assert sample_count() == bounded
+            assert sorted(get_series_budget()._counts) == ['modem-48', 'modem-49']
+        finally:
+            configure_instrumentation(None)
+            configure_label_policy(LabelPolicy())
@@ -0,0 +1,139 @@
+"""
+Unit tests for field projection on JSON endpoints and lazily mapped sections.
+
+The broadband status is parsed from the BGW210 page in benchmarks/fixtures,
+so no modem is contacted.
+"""
+import json
+import pickle
+from pathlib import Path
+from unittest.mock import Mock
+
+import pytest
+from fastapi import HTTPException
+
+from prometheus_client import CollectorRegistry
+
+from exporters import FieldError, parse_fields, project, to_exportable
+from instrumentation import configure_instrumentation
+from modem_client import ModemClient, ModemConfig
+from modem_exporters import ModemDataGathererExporter
+from modem_gatherers.broadband_status import BroadbandStatusGatherer
+from tests.conftest import make_request
+
+PAGE = Path(__file__).resolve().parent.parent.parent / 'benchmarks' / 'fixtures' / 'bgw210' / 'broadbandstatistics.ha'
+
+
+class CountingBroadbandGatherer(BroadbandStatusGatherer):
+    """Broadband gatherer mapping the fixture page and counting mapped sections."""
+
+    def __init__(self):
+        super().__init__(ModemClient(ModemConfig('modem-1', 'http://modem-1', None)))
+        self.mapped = []
+
+    def gather(self):
+        return self._map(self._parse_html(PAGE.read_text()))
+
+    def _map_broadband_wan_information(self, data):
+        self.mapped.append('broadband_wan_information')
+        return super()._map_broadband_wan_information(data)
+
+    def _map_ethernet_ipv4_statistics(self, data):
+        self.mapped.append('ipv4_statistics')
+        return super()._map_ethernet_ipv4_statistics(data)
+
+    def _map_ethernet_ipv6_statistics(self, data):
+        self.mapped.append('ipv6_statistics')
+        return super()._map_ethernet_ipv6_statistics(data)
+
+
+@pytest.mark.unit
+class TestProjection:
+    """Test suite for parse_fields() and project()."""
+
+    def test_parse_fields(self):
+        """Dotted fields should build a tree, with a parent field selecting all of its children."""
+        assert parse_fields('a.b, a.c,d,') == {'a': {'b': {}, 'c': {}}, 'd': {}}
+
+    @pytest.mark.parametrize('fields', ['', ' , ', 'a..b', '.a'])
+    def test_invalid_fields(self, fields):
+        """Empty fields and empty path segments should be rejected."""
+        with pytest.raises(FieldError):
+            parse_fields(fields)
+
+    def test_project_lists_and_nested_values(self):
+        """Fields should apply to each element of a list and to nested dicts."""
+        value = [{'port': 1, 'stats': {'rx': 10, 'tx': 20}}, {'port': 2, 'stats': {'rx': 30, 'tx': 40}}]
+
+        assert project(value, parse_fields('port,stats.rx')) == [{'port': 1, 'stats': {'rx': 10}},
+                                                                 {'port': 2, 'stats': {'rx': 30}}]
+
+    @pytest.mark.parametrize('fields', ['missing', 'stats.rx.more'])
+    def test_project_unknown_fields(self, fields):
+        """Fields that do not exist should raise FieldError."""
+        with pytest.raises(FieldError):
+            project({'stats': {'rx': 10}}, parse_fields(fields))
+
+
+@pytest.mark.unit
+class TestLazySections:
+    """Test suite for the lazily mapped broadband status."""
+
+    def test_sections_are_mapped_when_read(self):
+        """Only the sections that are read should be mapped, once each."""
+        gatherer = CountingBroadbandGatherer()
+        data = gatherer.gather()
+
+        data['ipv4_statistics']
+        data['ipv4_statistics']
+
+        assert gatherer.mapped == ['ipv4_statistics']
+        assert 'broadband_wan_information' in data and len(data) == 5
+        assert gatherer.mapped == ['ipv4_statistics']
+
+    def test_missing_table_fails_while_gathering(self):
+        """A page without one of the tables should fail in gather(), counted as a scrape error, not when read."""
+        client = Mock(spec=ModemClient)
+        client.config = ModemConfig('modem-1', 'http://modem-1', None)
+        page = PAGE.read_text().replace('Summary of the most important WAN information', 'Renamed table')
+        client._fetch.return_value = Mock(text=page, content=page.encode(), encoding='utf-8')
+        registry = CollectorRegistry()
+        configure_instrumentation(registry)
+        try:
+            with pytest.raises(ValueError, match='Summary of the most important WAN information'):
+                BroadbandStatusGatherer(client).gather()
+        finally:
+            configure_instrumentation(None)
+
+        assert registry.get_sample_value('att_modem_exporter_scrape_errors_total', {
+            'gatherer': 'BroadbandStatusGatherer', 'modem_id': 'modem-1', 'exception': 'ValueError'}) == 1
+
+    def test_full_export_maps_every_section(self):
+        """Exporting the whole status, or pickling it for workers, should produce a plain dict of all sections."""
+        data = CountingBroadbandGatherer().gather()
+
+        exported = to_exportable(data)
+
+        assert type(exported) is dict and list(exported) == ['broadband_wan_information', 'ethernet_statistics',
+                                                             'ipv6_information', 'ipv4_statistics', 'ipv6_statistics']
+        assert pickle.loads(pickle.dumps(data)) == exported
+
+    def test_exporter_projects_fields(self):
+        """?fields= should return only the requested fields and map only their sections."""
+        gatherer = CountingBroadbandGatherer()
+        exporter = ModemDataGathererExporter(gatherer)
+
+        result = json.loads(exporter.export_request(make_request(fields='ipv4_statistics.receive_bytes')).body)
+
+        assert list(result) == ['ipv4_statistics'] and list(result['ipv4_statistics']) == ['receive_bytes']
+        assert isinstance(result['ipv4_statistics']['receive_bytes'], int)
+        assert gatherer.mapped == ['ipv4_statistics']
+
+    def test_exporter_rejects_unknown_fields(self):
+        """Unknown fields should be a 400 error."""
+        exporter = ModemDataGathererExporter(CountingBroadbandGatherer())
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(make_request(fields='ipv4_statistics.nope'))
+
+        assert exc_info.value.status_code == 400
@@ -0,0 +1,101 @@
+"""
+Unit tests for PrometheusExporter scrapes.
+
+Mappers are fakes that publish one gauge family and can fail or block, so
+partial failures and deadlines are tested without a modem.
+"""
+import threading
+
+import pytest
+from fastapi.responses import Response
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+from unittest.mock import Mock
+
+from prometheus_exporters import PrometheusExporter, PrometheusMapper
+from prometheus_exporters.scrape import ScrapeConfig
+from tests.conftest import make_request
+
+
+class FakeMapper(PrometheusMapper):
+    """Mapper exporting att_modem_fake{name} from a counter, optionally failing or blocking."""
+
+    def __init__(self, name, registry, fail=False, release=None):
+        gatherer = Mock()
+        gatherer.get_name.return_value = name
+        gatherer.get_source_id.return_value = 'modem-1'
+        gatherer.gather.side_effect = self._gather
+        super().__init__(gatherer, registry)
+        self.name = name
+        self.fail = fail
+        self.release = release
+        self.gather_count = 0
+
+    def get_name(self):
+        return self.name
+
+    def _gather(self):
+        self.gather_count += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.fail:
+            raise ValueError('No statistics found')
+        return {'value': self.gather_count}
+
+    def _map(self, data):
+        family = GaugeMetricFamily('att_modem_fake', 'Fake', labels=['name'])
+        family.add_metric([self.name], data['value'])
+        return [family]
+
+
+@pytest.mark.unit
+class TestPrometheusExporter:
+    """Test suite for parallel mapper refresh in PrometheusExporter."""
+
+    def test_failing_mapper_does_not_fail_scrape(self):
+        """Healthy mappers should still be exported next to a scrape_success 0 for the failing one."""
+        registry = CollectorRegistry()
+        exporter = PrometheusExporter([FakeMapper('good', registry), FakeMapper('bad', registry, fail=True)],
+                                      registry)
+
+        output = exporter.export().decode()
+
+        assert 'att_modem_fake{name="good"} 1.0' in output
+        assert 'att_modem_scrape_success{collector="good",modem_id="modem-1"} 1.0' in output
+        assert 'att_modem_scrape_success{collector="bad",modem_id="modem-1"} 0.0' in output
+
+    def test_late_mapper_is_reported_and_reused(self):
+        """A mapper past the deadline should be reported as failed and its refresh awaited by the next scrape."""
+        registry = CollectorRegistry()
+        release = threading.Event()
+        slow = FakeMapper('slow', registry, release=release)
+        exporter = PrometheusExporter([FakeMapper('fast', registry), slow], registry, ScrapeConfig(timeout=0.05))
+
+        first = exporter.export().decode()
+        # Released only after the next scrape has picked up the refresh that is still running
+        threading.Timer(0.2, release.set).start()
+        response = exporter.export_request(make_request({'X-Prometheus-Scrape-Timeout-Seconds': '5.5'}))
+        second = response.body.decode()
+
+        assert 'att_modem_scrape_success{collector="slow",modem_id="modem-1"} 0.0' in first
+        assert 'att_modem_fake{name="fast"} 1.0' in first
+        assert isinstance(response, Response)
+        assert 'att_modem_scrape_success{collector="slow",modem_id="modem-1"} 1.0' in second
+        assert slow.gather_count == 1
+
+    def test_deadline_from_scrape_timeout_header(self):
+        """The Prometheus scrape timeout header, minus the offset, should bound the wait."""
+        registry = CollectorRegistry()
+        release = threading.Event()
+        exporter = PrometheusExporter([FakeMapper('slow', registry, release=release)], registry,
+                                      ScrapeConfig(timeout=10, timeout_offset=0.45))
+
+        response = exporter.export_request(make_request({'X-Prometheus-Scrape-Timeout-Seconds': '0.5'}))
+        release.set()
+
+        assert b'att_modem_scrape_success{collector="slow",modem_id="modem-1"} 0.0' in response.body
+
+    @pytest.mark.parametrize('header,deadline', [(None, 10.0), ('15', 14.5), ('0.2', 0.0), ('soon', 10.0)])
+    def test_get_deadline_seconds(self, header, deadline):
+        """Deadlines should come from the header when it is a number, otherwise from the timeout."""
+        assert ScrapeConfig(timeout=10, timeout_offset=0.5).get_deadline_seconds(header) == deadline
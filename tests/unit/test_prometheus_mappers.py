@@ -0,0 +1,178 @@
+"""
+Unit tests for the modem Prometheus mappers.
+
+Gatherers are real modem gatherers with gather() replaced, so mappers are
+checked against the text exposition of their own registry.
+"""
+import threading
+from datetime import timedelta
+
+import pytest
+from unittest.mock import Mock
+from prometheus_client import CollectorRegistry, generate_latest
+
+from instrumentation import configure_instrumentation
+from modem_client import ModemClient, ModemConfig
+from modem_gatherers.home_network_status import HomeNetworkStatusGatherer
+from modem_gatherers.system_information import SystemInformationGatherer
+from modem_prometheus_mappers.home_network_status_mapper import HomeNetworkStatusPrometheusMapper
+from modem_prometheus_mappers.system_information_mapper import SystemInformationPrometheusMapper
+from prometheus_exporters.series import SeriesConfig, configure_series_tracking
+
+
+def make_gatherer(cls, modem_id, snapshots):
+    gatherer = cls(ModemClient(ModemConfig(modem_id, f'http://{modem_id}', None)))
+    gatherer.gather_count = 0
+
+    def gather():
+        gatherer.gather_count += 1
+        return snapshots[min(gatherer.gather_count, len(snapshots)) - 1]
+    gatherer.gather = gather
+    return gatherer
+
+
+def lan_ports(receive_bytes, state='UP'):
+    return [{'lan_port': port, 'state': state, 'receive_bytes': receive_bytes} for port in (1, 2)]
+
+
+def system_information(serial_number):
+    return {'manufacturer': 'Pace Plc', 'model_number': 'BGW210-700', 'serial_number': serial_number,
+            'mac_address': 'aa:bb:cc:dd:ee:ff', 'time_since_last_reboot': timedelta(seconds=90)}
+
+
+@pytest.fixture
+def stale_cycles():
+    """Evict series after one refresh without them, restoring the default afterwards."""
+    configure_series_tracking(SeriesConfig(stale_cycles=1))
+    yield 1
+    configure_series_tracking(SeriesConfig())
+
+
+@pytest.mark.unit
+class TestPrometheusModemMappers:
+    """Test suite for the collector-based modem mappers."""
+
+    def test_renders_snapshot(self):
+        """Refreshing should expose one sample per port and field from the snapshot."""
+        registry = CollectorRegistry()
+        mapper = HomeNetworkStatusPrometheusMapper(
+            make_gatherer(HomeNetworkStatusGatherer, 'modem-1', [lan_ports(100, 'DOWN')]), registry)
+
+        mapper.refresh()
+        output = generate_latest(registry).decode()
+
+        assert 'att_modem_lan_receive_bytes{lan_port="2",modem_id="modem-1",modem_url="http://modem-1"} 100.0' in output
+        assert 'att_modem_lan_state{lan_port="1",modem_id="modem-1",modem_url="http://modem-1"} 0.0' in output
+
+    def test_reuses_families_for_unchanged_snapshot(self):
+        """The same snapshot object should not be mapped again."""
+        registry = CollectorRegistry()
+        snapshot = lan_ports(100)
+        mapper = HomeNetworkStatusPrometheusMapper(
+            make_gatherer(HomeNetworkStatusGatherer, 'modem-1', [snapshot, snapshot]), registry)
+
+        mapper.refresh()
+        families = mapper.get_families()
+        mapper.refresh()
+
+        assert mapper.get_families() is families
+
+    def test_merges_families_of_several_modems(self):
+        """Mappers of different modems should share one family per metric name."""
+        registry = CollectorRegistry()
+        for modem_id in ('modem-1', 'modem-2'):
+            HomeNetworkStatusPrometheusMapper(
+                make_gatherer(HomeNetworkStatusGatherer, modem_id, [lan_ports(100)]), registry).refresh()
+
+        output = generate_latest(registry).decode()
+
+        assert output.count('# TYPE att_modem_lan_receive_bytes gauge') == 1
+        assert output.count('att_modem_lan_receive_bytes{') == 4
+
+    def test_collect_is_consistent_during_refresh(self):
+        """Concurrent scrapes should always see complete families while snapshots change."""
+        registry = CollectorRegistry()
+        snapshots = [lan_ports(n) for n in range(200)]
+        mapper = HomeNetworkStatusPrometheusMapper(
+            make_gatherer(HomeNetworkStatusGatherer, 'modem-1', snapshots), registry)
+        mapper.refresh()
+        counts = []
+
+        def scrape():
+            for _ in range(200):
+                counts.append(generate_latest(registry).decode().count('att_modem_lan_receive_bytes{'))
+
+        scraper = threading.Thread(target=scrape)
+        scraper.start()
+        for _ in snapshots:
+            mapper.refresh()
+        scraper.join()
+
+        assert set(counts) == {2}
+
+
+@pytest.mark.unit
+class TestStaleSeriesEviction:
+    """Test suite for stale-series tracking in mappers."""
+
+    def test_keeps_missing_series_until_stale(self, stale_cycles):
+        """A label set missing from new snapshots should be exported until it is stale, then evicted."""
+        registry = CollectorRegistry()
+        snapshots = [system_information('OLD'), system_information('NEW')]
+        mapper = SystemInformationPrometheusMapper(
+            make_gatherer(SystemInformationGatherer, 'modem-1', snapshots), registry)
+
+        mapper.refresh()
+        mapper.refresh()
+        retained = generate_latest(registry).decode()
+        mapper.refresh()
+        evicted = generate_latest(registry).decode()
+
+        assert 'serial_number="OLD"' in retained and 'serial_number="NEW"' in retained
+        assert 'serial_number="OLD"' not in evicted and 'serial_number="NEW"' in evicted
+        assert evicted.count('# TYPE att_modem_uptime_seconds gauge') == 1
+
+    def test_returning_series_is_no_longer_stale(self, stale_cycles):
+        """A label set that reappears before it is stale should be exported from the new snapshot."""
+        registry = CollectorRegistry()
+        snapshots = [lan_ports(1), lan_ports(2)[:1], lan_ports(3), lan_ports(3), lan_ports(3)]
+        mapper = HomeNetworkStatusPrometheusMapper(
+            make_gatherer(HomeNetworkStatusGatherer, 'modem-1', snapshots), registry)
+
+        for _ in snapshots:
+            mapper.refresh()
+
+        output = generate_latest(registry).decode()
+        assert 'att_modem_lan_receive_bytes{lan_port="2",modem_id="modem-1",modem_url="http://modem-1"} 3.0' in output
+        assert output.count('lan_port="2"') == 2
+
+    def test_failing_refreshes_evict_all_series(self, stale_cycles):
+        """A mapper whose gatherer keeps failing should stop exporting its last snapshot."""
+        registry = CollectorRegistry()
+        gatherer = make_gatherer(HomeNetworkStatusGatherer, 'modem-1', [lan_ports(1)])
+        mapper = HomeNetworkStatusPrometheusMapper(gatherer, registry)
+        mapper.refresh()
+        gatherer.gather = Mock(side_effect=ConnectionError('modem unreachable'))
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                mapper.refresh()
+
+        assert mapper.get_families() == ()
+
+    def test_reports_active_and_evicted_series(self, stale_cycles):
+        """Active and evicted series counts should be exported per gatherer and modem."""
+        instrumentation_registry = CollectorRegistry()
+        configure_instrumentation(instrumentation_registry)
+        try:
+            snapshots = [lan_ports(1), lan_ports(1)[:1]]
+            mapper = HomeNetworkStatusPrometheusMapper(
+                make_gatherer(HomeNetworkStatusGatherer, 'modem-1', snapshots), CollectorRegistry())
+            for _ in range(3):
+                mapper.refresh()
+        finally:
+            configure_instrumentation(None)
+
+        labels = {'gatherer': 'HomeNetworkStatusGatherer', 'modem_id': 'modem-1'}
+        assert instrumentation_registry.get_sample_value('att_modem_exporter_active_series', labels) == 2
+        assert instrumentation_registry.get_sample_value('att_modem_exporter_evicted_series_total', labels) == 2
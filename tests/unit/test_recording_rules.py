@@ -0,0 +1,62 @@
+"""
+Unit tests for the recording rules generated from the modem mappers.
+
+The checked-in rules file and the bundled Grafana dashboard are read from the
+repository, so they are checked against the mappers on every run.
+"""
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+from modem_prometheus_mappers.broadband_status_mapper import BroadbandStatusPrometheusMapper
+from modem_prometheus_mappers.home_network_status_mapper import HomeNetworkStatusPrometheusMapper
+from modem_prometheus_mappers.recording_rules import RULES_FILE, get_recording_rules, render_recording_rules
+
+ROOT_DIR = Path(__file__).resolve().parent.parent.parent
+DASHBOARD = ROOT_DIR / 'grafana' / 'att-modem-dashboard-prometheus.json'
+
+
+def get_dashboard_exprs(panels):
+    for panel in panels:
+        yield from (target['expr'] for target in panel.get('targets', []) if 'expr' in target)
+        yield from get_dashboard_exprs(panel.get('panels', []))
+
+
+@pytest.mark.unit
+class TestRecordingRules:
+    """Test suite for recording rule generation."""
+
+    def test_counter_names_come_from_mapper_types(self):
+        """Counters should be the integer keys of the mapped types, without labels or gauges."""
+        lan = HomeNetworkStatusPrometheusMapper.get_counter_names()
+        wan = BroadbandStatusPrometheusMapper.get_counter_names()
+
+        assert 'att_modem_lan_receive_bytes' in lan and 'att_modem_wan_ipv6_receive_discards' in wan
+        assert 'att_modem_lan_transmit_speed' not in lan and 'att_modem_lan_lan_port' not in lan
+        assert len(lan) == 12 and len(wan) == 21
+
+    def test_rules_per_modem_and_per_port(self):
+        """LAN counters should be summed per modem and per port, WAN counters per modem."""
+        rules = {rule['record']: rule['expr'] for rule in get_recording_rules(windows=['5m'])['att_modem_rates_5m']}
+
+        assert rules['modem_id:att_modem_lan_receive_bytes:rate5m'] == \
+            'sum by (modem_id) (rate(att_modem_lan_receive_bytes[5m]))'
+        assert rules['modem_id_lan_port:att_modem_lan_receive_bytes:rate5m'] == \
+            'sum by (modem_id, lan_port) (rate(att_modem_lan_receive_bytes[5m]))'
+        assert 'modem_id:att_modem_wan_ipv4_collisions:rate5m' in rules
+        assert not any(record.startswith('modem_id_lan_port:att_modem_wan') for record in rules)
+
+    def test_rules_file_is_up_to_date(self):
+        """The checked-in rules file should match the mappers; regenerate it with make rules."""
+        assert (ROOT_DIR / RULES_FILE).read_text() == render_recording_rules(get_recording_rules())
+
+    def test_dashboard_uses_recorded_series(self):
+        """The dashboard should query recorded series rather than computing rates itself."""
+        records = {rule['record'] for rules in get_recording_rules().values() for rule in rules}
+        exprs = list(get_dashboard_exprs(json.loads(DASHBOARD.read_text())['panels']))
+
+        recorded = [name for expr in exprs for name in re.findall(r'[\w]+:[\w]+:[\w]+', expr)]
+        assert recorded and set(recorded) <= records
+        assert not [expr for expr in exprs if 'rate(' in expr]
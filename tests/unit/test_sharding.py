@@ -0,0 +1,117 @@
+"""
+Unit tests for sharding module.
+
+Fleets are lists of ModemConfig with made-up URLs, so no modem is
+contacted.
+"""
+import pytest
+from fastapi import HTTPException
+from unittest.mock import Mock
+
+from modem_client import ModemConfig
+from probe_exporters import ProbeConfig, ProbeExporter, ServiceDiscoveryExporter
+from sharding import ModemShard, ShardConfig, get_shard
+
+
+def make_fleet(size):
+    return [ModemConfig(f'modem-{i}', f'http://10.0.{i // 250}.{i % 250 + 1}', None) for i in range(size)]
+
+
+def assign(fleet, count):
+    return {modem.id: get_shard(modem.id, count) for modem in fleet}
+
+
+@pytest.mark.unit
+class TestShardConfig:
+    """Test suite for ShardConfig."""
+
+    @pytest.mark.parametrize('index,count', [(0, 0), (-1, 2), (2, 2)])
+    def test_invalid_config(self, index, count):
+        """The index must be one of count shards."""
+        with pytest.raises(ValueError):
+            ShardConfig(index, count)
+
+    def test_from_env(self, monkeypatch):
+        """from_env() should read the SHARD_ variables."""
+        monkeypatch.setenv('SHARD_INDEX', '2')
+        monkeypatch.setenv('SHARD_COUNT', '3')
+        monkeypatch.setenv('SHARD_ADDRESS', 'exporter-2:8666')
+
+        config = ShardConfig.from_env()
+
+        assert (config.index, config.count, config.address) == (2, 3, 'exporter-2:8666')
+
+    def test_modem_list_from_env(self, monkeypatch):
+        """MODEMS should accept id=url items and bare URLs identified by their host."""
+        monkeypatch.setenv('MODEMS', 'home=http://192.168.1.254, http://10.0.0.254:8080 ,')
+
+        modems = ModemConfig.list_from_env()
+
+        assert [(m.id, m.url) for m in modems] == [('home', 'http://192.168.1.254'),
+                                                   ('10.0.0.254:8080', 'http://10.0.0.254:8080')]
+
+
+@pytest.mark.unit
+class TestModemShard:
+    """Test suite for rendezvous hashing of a modem fleet."""
+
+    def test_shards_partition_the_fleet(self):
+        """Every modem should be owned by exactly one shard, with shards roughly balanced."""
+        fleet = make_fleet(300)
+
+        owned = [ModemShard(ShardConfig(index, 3), fleet).get_modems() for index in range(3)]
+
+        assert sorted(m.id for modems in owned for m in modems) == sorted(m.id for m in fleet)
+        assert all(70 <= len(modems) <= 130 for modems in owned)
+
+    def test_adding_a_shard_moves_only_its_modems(self):
+        """Growing from 3 to 4 shards should only move modems to the new shard, about a quarter of them."""
+        fleet = make_fleet(400)
+
+        before, after = assign(fleet, 3), assign(fleet, 4)
+
+        moved = [id for id in before if before[id] != after[id]]
+        assert all(after[id] == 3 for id in moved)
+        assert 60 <= len(moved) <= 140
+
+    def test_removing_a_shard_moves_only_its_modems(self):
+        """Shrinking from 4 to 3 shards should only move the modems of the removed shard."""
+        fleet = make_fleet(400)
+
+        before, after = assign(fleet, 4), assign(fleet, 3)
+
+        assert [id for id in before if before[id] != after[id]] == [id for id in before if before[id] == 3]
+
+    def test_duplicate_ids_are_rejected(self):
+        """Modem ids are the sharding keys, so they must be unique."""
+        with pytest.raises(ValueError):
+            ModemShard(ShardConfig(), [ModemConfig('a', 'http://a', None), ModemConfig('a', 'http://b', None)])
+
+    def test_service_discovery_lists_owned_targets(self):
+        """/sd should list the owned modems as probe targets of this replica."""
+        fleet = make_fleet(20)
+        shard = ModemShard(ShardConfig(1, 2), fleet)
+        request = Mock()
+        request.headers = {'host': 'exporter-1:8666'}
+
+        groups = ServiceDiscoveryExporter(shard, 'bgw210').export_request(request)
+
+        assert [g['labels']['__param_modem_id'] for g in groups] == [m.id for m in shard.get_modems()]
+        assert groups[0] == {'targets': ['exporter-1:8666'],
+                             'labels': {'__metrics_path__': '/probe', '__param_target': shard.get_modems()[0].url,
+                                        '__param_module': 'bgw210', '__param_modem_id': shard.get_modems()[0].id,
+                                        'instance': shard.get_modems()[0].url, 'shard': '1'}}
+
+    def test_probe_rejects_targets_of_other_shards(self):
+        """A replica should refuse to probe a configured modem owned by another shard."""
+        fleet = make_fleet(20)
+        shard = ModemShard(ShardConfig(0, 2), fleet)
+        other = next(m for m in fleet if m not in shard.get_modems())
+        exporter = ProbeExporter({'bgw210': Mock()}, ProbeConfig(), shard)
+        request = Mock()
+        request.query_params = {'target': other.url}
+
+        with pytest.raises(HTTPException) as exc_info:
+            exporter.export_request(request)
+
+        assert exc_info.value.status_code == 421
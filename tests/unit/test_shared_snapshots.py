@@ -0,0 +1,190 @@
+"""
+Unit tests for shared_snapshots module.
+
+Writer and reader use separate mappings of the same file, the way the
+poller and the HTTP workers do.
+"""
+import os
+import pickle
+
+import pytest
+from datetime import timedelta
+from fastapi.testclient import TestClient
+
+from exporters import DataGathererExporter
+from shared_snapshots import SharedSnapshotGatherer, SnapshotConfig, SnapshotPublisher, SnapshotSegment
+from gatherers import DataUnavailableError
+from server import Server, ServerConfig
+from tests.conftest import CountingGatherer
+
+
+# Callbacks run once by the next PublishesWhileLoaded value to be loaded
+LOAD_CALLBACKS = []
+
+
+class PublishesWhileLoaded:
+    """Snapshot running the pending load callbacks, such as another publish, while a reader loads it."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __reduce__(self):
+        return run_load_callbacks, (self.value,)
+
+
+def run_load_callbacks(value):
+    while LOAD_CALLBACKS:
+        LOAD_CALLBACKS.pop()()
+    return value
+
+
+@pytest.fixture
+def snapshot_config(tmp_path):
+    """SnapshotConfig backed by a temporary directory."""
+    return SnapshotConfig(str(tmp_path), capacity=4096, interval=timedelta(seconds=1))
+
+
+@pytest.fixture
+def segment_path(snapshot_config):
+    return snapshot_config.get_segment_path("test-modem-CountingGatherer")
+
+
+@pytest.mark.unit
+class TestSnapshotConfig:
+    """Test suite for SnapshotConfig."""
+
+    def test_from_env_leaves_environment_alone(self, monkeypatch):
+        """Without SNAPSHOT_DIR a temporary directory should be used, without writing it to the environment."""
+        monkeypatch.delenv("SNAPSHOT_DIR", raising=False)
+
+        config = SnapshotConfig.from_env()
+
+        assert os.path.isdir(config.directory)
+        assert "SNAPSHOT_DIR" not in os.environ
+        os.rmdir(config.directory)
+
+
+@pytest.mark.unit
+class TestSnapshotSegment:
+    """Test suite for SnapshotSegment."""
+
+    def test_reader_sees_published_value(self, snapshot_config, segment_path):
+        """A value written by the publisher should be readable from another mapping."""
+        writer = SnapshotSegment(segment_path, snapshot_config.capacity, create=True)
+        reader = SnapshotSegment(segment_path, snapshot_config.capacity)
+
+        writer.write({"a": 1})
+        sequence, value, _ = reader.read()
+
+        assert sequence == 1
+        assert value == {"a": 1}
+
+    def test_read_raises_before_first_publish(self, snapshot_config, segment_path):
+        """Reading an empty segment should raise DataUnavailableError."""
+        SnapshotSegment(segment_path, snapshot_config.capacity, create=True)
+        reader = SnapshotSegment(segment_path, snapshot_config.capacity)
+
+        with pytest.raises(DataUnavailableError, match="No snapshot published yet"):
+            reader.read()
+
+    def test_read_skips_decoding_known_sequence(self, snapshot_config, segment_path):
+        """Reading with the current sequence should not decode the payload again."""
+        writer = SnapshotSegment(segment_path, snapshot_config.capacity, create=True)
+        writer.write({"a": 1})
+
+        sequence, value, _ = writer.read(known_sequence=1)
+
+        assert sequence == 1
+        assert value is None
+
+    def test_read_retries_when_published_while_loading(self, snapshot_config, segment_path):
+        """A value whose slot is being overwritten by a newer publish while it is read should not be returned."""
+        writer = SnapshotSegment(segment_path, snapshot_config.capacity, create=True)
+        reader = SnapshotSegment(segment_path, snapshot_config.capacity)
+
+        def publish_and_start_next():
+            # Publish the second snapshot, then begin writing the third into the slot the reader is loading
+            writer.write("second")
+            offset = writer._slot_offset(1)
+            payload = pickle.dumps("third")
+            writer._mmap[offset:offset + len(payload)] = payload
+        writer.write(PublishesWhileLoaded("first"))
+        LOAD_CALLBACKS.append(publish_and_start_next)
+
+        sequence, value, _ = reader.read()
+
+        assert (sequence, value) == (2, "second")
+
+    def test_write_rejects_payload_larger_than_capacity(self, snapshot_config, segment_path):
+        """Snapshots larger than a slot should raise ValueError."""
+        writer = SnapshotSegment(segment_path, snapshot_config.capacity, create=True)
+
+        with pytest.raises(ValueError, match="exceeds segment capacity"):
+            writer.write("x" * snapshot_config.capacity)
+
+    def test_open_rejects_capacity_mismatch(self, snapshot_config, segment_path):
+        """Opening a segment with a different capacity should raise ValueError."""
+        SnapshotSegment(segment_path, snapshot_config.capacity, create=True)
+
+        with pytest.raises(ValueError, match="has size"):
+            SnapshotSegment(segment_path, snapshot_config.capacity * 2)
+
+
+@pytest.mark.unit
+class TestSharedSnapshotGatherer:
+    """Test suite for SnapshotPublisher and SharedSnapshotGatherer."""
+
+    def test_workers_never_call_wrapped_gatherer(self, snapshot_config, segment_path):
+        """Shared gatherers should read snapshots instead of polling the modem."""
+        source = CountingGatherer()
+        publisher = SnapshotPublisher({"test-modem-CountingGatherer": source}, snapshot_config)
+        workers = [SharedSnapshotGatherer(CountingGatherer(), SnapshotSegment(segment_path, snapshot_config.capacity))
+                   for _ in range(3)]
+
+        publisher.publish()
+        values = [w.gather() for w in workers]
+
+        assert source.call_count == 1
+        assert values == [{"count": 1}] * 3
+        assert all(w.get_gatherer().call_count == 0 for w in workers)
+
+    def test_returns_same_object_until_next_publish(self, snapshot_config, segment_path):
+        """The decoded snapshot should be reused until a new one is published."""
+        publisher = SnapshotPublisher({"test-modem-CountingGatherer": CountingGatherer()}, snapshot_config)
+        worker = SharedSnapshotGatherer(CountingGatherer(), SnapshotSegment(segment_path, snapshot_config.capacity))
+
+        publisher.publish()
+        first = worker.gather()
+        second = worker.gather()
+        publisher.publish()
+        third = worker.gather()
+
+        assert first is second
+        assert third == {"count": 2}
+
+    def test_reports_snapshot_age(self, snapshot_config, segment_path):
+        """The age should be unknown before the first read and small right after a publish."""
+        publisher = SnapshotPublisher({"test-modem-CountingGatherer": CountingGatherer()}, snapshot_config)
+        worker = SharedSnapshotGatherer(CountingGatherer(), SnapshotSegment(segment_path, snapshot_config.capacity))
+
+        assert worker.get_snapshot_age() is None
+        publisher.publish()
+        worker.gather()
+
+        assert 0 <= worker.get_snapshot_age() < 5
+
+    def test_worker_routes_before_and_after_first_publish(self, snapshot_config, segment_path):
+        """Workers should answer 503 until a snapshot is published, then serve it with its Age."""
+        publisher = SnapshotPublisher({"test-modem-CountingGatherer": CountingGatherer()}, snapshot_config)
+        worker = SharedSnapshotGatherer(CountingGatherer(), SnapshotSegment(segment_path, snapshot_config.capacity))
+        client = TestClient(Server(ServerConfig("127.0.0.1", 8666), [DataGathererExporter(worker)]).get_app())
+
+        unavailable = client.get("/gatherer/counting")
+        publisher.publish()
+        available = client.get("/gatherer/counting")
+
+        assert unavailable.status_code == 503
+        assert "No snapshot published yet" in unavailable.json()["detail"]
+        assert available.status_code == 200
+        assert available.json() == {"count": 1}
+        assert available.headers["Age"] == "0"
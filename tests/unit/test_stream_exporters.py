@@ -0,0 +1,143 @@
+"""
+Unit tests for stream_exporters module.
+
+These tests drive the SnapshotBroadcaster directly on an event loop,
+without starting the HTTP server.
+"""
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+
+from gatherers import DataGatherer
+from stream_exporters import SnapshotBroadcaster, StreamConfig, flatten_snapshot
+
+
+class SequenceGatherer(DataGatherer):
+    """Gatherer returning a new snapshot object for each value set."""
+
+    def __init__(self, value):
+        self.value = value
+        self.call_count = 0
+
+    def gather(self):
+        self.call_count += 1
+        return self.value
+
+
+class ManualBroadcaster(SnapshotBroadcaster):
+    """Broadcaster polled only by the test, without the background poll loop."""
+
+    async def _run(self) -> None:
+        pass
+
+
+def parse_event(event: bytes) -> dict:
+    fields = dict(line.split(': ', 1) for line in event.decode().strip().split('\n'))
+    fields['data'] = json.loads(fields['data'])
+    return fields
+
+
+def make_broadcaster(gatherer, client_queue_size=16):
+    config = StreamConfig(timedelta(seconds=60), client_queue_size)
+    return ManualBroadcaster({'broadband-status': gatherer}, config)
+
+
+@pytest.mark.unit
+class TestStreamConfig:
+    """Test suite for StreamConfig."""
+
+    def test_rejects_non_positive_interval(self):
+        """Config should raise ValueError when interval is not positive."""
+        with pytest.raises(ValueError, match="interval must be positive"):
+            StreamConfig(timedelta(seconds=0), 1)
+
+    def test_rejects_empty_queue(self):
+        """Config should raise ValueError when queue size is less than one."""
+        with pytest.raises(ValueError, match="client_queue_size"):
+            StreamConfig(timedelta(seconds=1), 0)
+
+
+@pytest.mark.unit
+class TestSnapshotBroadcaster:
+    """Test suite for SnapshotBroadcaster."""
+
+    def test_flatten_snapshot_uses_dotted_paths(self):
+        """flatten_snapshot() should flatten nested dicts and lists."""
+        flat = flatten_snapshot({'a': {'b': 1}, 'c': [{'d': 2}]})
+
+        assert flat == {'a.b': 1, 'c.0.d': 2}
+
+    def test_one_poll_fans_out_to_all_subscribers(self):
+        """A single gather should be delivered to every subscriber."""
+        async def run():
+            gatherer = SequenceGatherer({'rx': 1})
+            broadcaster = make_broadcaster(gatherer)
+            subscribers = [broadcaster.subscribe() for _ in range(3)]
+            await broadcaster.poll()
+            return gatherer, [s.queue.get_nowait() for s in subscribers]
+
+        gatherer, events = asyncio.run(run())
+
+        assert gatherer.call_count == 1
+        assert len(set(events)) == 1
+        assert parse_event(events[0])['data'] == {'rx': 1}
+
+    def test_unchanged_snapshot_is_not_republished(self):
+        """Polling the same cached object again should not emit an event."""
+        async def run():
+            broadcaster = make_broadcaster(SequenceGatherer({'rx': 1}))
+            subscriber = broadcaster.subscribe()
+            await broadcaster.poll()
+            await broadcaster.poll()
+            return subscriber.queue.qsize()
+
+        assert asyncio.run(run()) == 1
+
+    def test_changes_only_subscriber_receives_changed_fields(self):
+        """Subscribers in changes mode should only receive changed paths."""
+        async def run():
+            gatherer = SequenceGatherer({'rx': 1, 'tx': 1})
+            broadcaster = make_broadcaster(gatherer)
+            subscriber = broadcaster.subscribe(changes_only=True)
+            await broadcaster.poll()
+            gatherer.value = {'rx': 2, 'tx': 1}
+            await broadcaster.poll()
+            return [subscriber.queue.get_nowait() for _ in range(2)]
+
+        first, second = asyncio.run(run())
+
+        assert parse_event(first)['data'] == {'rx': 1, 'tx': 1}
+        assert parse_event(second)['data'] == {'rx': 2}
+
+    def test_late_subscriber_receives_latest_snapshot(self):
+        """New subscribers should start from the latest full snapshot."""
+        async def run():
+            broadcaster = make_broadcaster(SequenceGatherer({'rx': 1}))
+            broadcaster.subscribe()
+            await broadcaster.poll()
+            return broadcaster.subscribe().queue.get_nowait()
+
+        assert parse_event(asyncio.run(run()))['data'] == {'rx': 1}
+
+    def test_slow_subscriber_is_evicted(self):
+        """A subscriber whose queue is full should be evicted."""
+        async def run():
+            gatherer = SequenceGatherer({'rx': 0})
+            broadcaster = make_broadcaster(gatherer, client_queue_size=2)
+            slow = broadcaster.subscribe()
+            fast = broadcaster.subscribe()
+            for i in range(3):
+                gatherer.value = {'rx': i}
+                await broadcaster.poll()
+                if not fast.evicted:
+                    fast.queue.get_nowait()
+            return broadcaster, slow, fast
+
+        broadcaster, slow, fast = asyncio.run(run())
+
+        assert slow.evicted
+        assert slow.queue.get_nowait() is None
+        assert not fast.evicted
+        assert broadcaster.get_subscriber_count() == 1
@@ -0,0 +1,231 @@
+"""
+Unit tests for tracing module.
+
+Each test configures the tracer it needs and restores the disabled
+default afterwards.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Gauge
+
+from exporters import DataGathererExporter
+from gatherers import CachingDataGatherer, DataGatherer
+from instrumentation import get_instrumentation
+from prometheus_exporters import PrometheusExporter, PrometheusMapper
+from server import Server, ServerConfig
+from tracing import JsonLinesSpanSink, OtlpSpanSink, TracingConfig, configure_tracing, get_tracer
+
+
+class StageGatherer(DataGatherer):
+    """Gatherer timing a fetch and a parse stage like a modem gatherer."""
+
+    def gather(self):
+        with get_instrumentation().time_stage('fetch', self.get_name(), 'modem-1'):
+            pass
+        with get_instrumentation().time_stage('parse', self.get_name(), 'modem-1'):
+            pass
+        return {'value': 1}
+
+
+class GaugeMapper(PrometheusMapper):
+    """Mapper setting a gauge from the gathered value."""
+
+    def __init__(self, gatherer, registry):
+        super().__init__(gatherer, registry)
+        self.gauge = Gauge('att_modem_tracing_test', 'Tracing test gauge', registry=registry)
+
+    def refresh(self):
+        with get_instrumentation().time_stage('refresh', self.get_name(), 'modem-1'):
+            self.gauge.set(self._gatherer.gather()['value'])
+
+    def _map(self, data):
+        pass
+
+
+class Collector:
+    """Stand-in OTLP/HTTP collector recording the JSON bodies it receives."""
+
+    def __init__(self):
+        collector = self
+        self.bodies = []
+        self.received = threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                collector.bodies.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                collector.received.set()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_port}/v1/traces'
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def create_client(gatherer):
+    registry = CollectorRegistry()
+    mapper = GaugeMapper(gatherer, registry)
+    server = Server(ServerConfig('127.0.0.1', 8666),
+                    [DataGathererExporter(gatherer), PrometheusExporter([mapper], registry)])
+    return TestClient(server.get_app())
+
+
+@pytest.fixture(autouse=True)
+def disabled_tracing():
+    """Restore the disabled tracer after each test."""
+    yield
+    configure_tracing(None)
+
+
+@pytest.mark.unit
+class TestTracingConfig:
+    """Test suite for TracingConfig."""
+
+    @pytest.mark.parametrize('kwargs', [{'sample_rate': 1.5}, {'sample_rate': 0.5},
+                                        {'sample_rate': 1, 'sink': 'zipkin'}, {'sample_rate': 1, 'sink': 'jsonl'}])
+    def test_invalid_config(self, kwargs):
+        """The sample rate must be a fraction and sampled traces need a usable sink."""
+        with pytest.raises(ValueError):
+            TracingConfig(**kwargs)
+
+    def test_from_env(self, monkeypatch):
+        """from_env() should read the TRACE_ variables."""
+        monkeypatch.setenv('TRACE_SAMPLE_RATE', '0.25')
+        monkeypatch.setenv('TRACE_SINK', 'jsonl')
+        monkeypatch.setenv('TRACE_FILE', '/tmp/spans.jsonl')
+        monkeypatch.setenv('TRACE_SERVER_TIMING', 'false')
+
+        config = TracingConfig.from_env()
+
+        assert (config.sample_rate, config.sink, config.file, config.server_timing) == \
+            (0.25, 'jsonl', '/tmp/spans.jsonl', False)
+
+
+@pytest.mark.unit
+class TestTracer:
+    """Test suite for traces, spans and the Server-Timing header."""
+
+    def test_spans_without_trace_are_noops(self):
+        """Spans outside of a traced request should not be recorded."""
+        configure_tracing(TracingConfig())
+
+        with get_tracer().span('fetch') as span:
+            assert span is None
+
+    def test_disabled_tracer_records_nothing(self):
+        """The default tracer should not start traces."""
+        with get_tracer().start_trace('handler') as trace:
+            assert trace is None
+
+    def test_server_timing_sums_spans_by_name(self):
+        """Spans with the same name should be summed into one Server-Timing entry."""
+        configure_tracing(TracingConfig())
+
+        with get_tracer().start_trace('handler') as trace:
+            for _ in range(2):
+                with get_tracer().span('fetch'):
+                    pass
+
+        entries = trace.get_server_timing().split(', ')
+        assert [entry.split(';')[0] for entry in entries] == ['handler', 'fetch']
+        assert all(entry.split(';')[1].startswith('dur=') for entry in entries)
+
+    def test_route_sets_server_timing_header(self):
+        """Responses should carry a Server-Timing header covering the cache and gatherer stages."""
+        configure_tracing(TracingConfig())
+        client = create_client(CachingDataGatherer(StageGatherer()))
+
+        metrics = client.get('/metrics')
+        data = client.get('/gatherer/stage')
+
+        assert metrics.status_code == 200 and data.status_code == 200
+        metrics_stages = [entry.split(';')[0] for entry in metrics.headers['Server-Timing'].split(', ')]
+        assert {'handler', 'refresh', 'cache', 'fetch', 'parse'} <= set(metrics_stages)
+        data_stages = [entry.split(';')[0] for entry in data.headers['Server-Timing'].split(', ')]
+        assert data_stages == ['handler', 'cache']
+
+    def test_server_timing_can_be_disabled(self):
+        """TRACE_SERVER_TIMING=false should leave the header out."""
+        configure_tracing(TracingConfig(server_timing=False))
+        client = create_client(CachingDataGatherer(StageGatherer()))
+
+        assert 'Server-Timing' not in client.get('/metrics').headers
+
+    def test_jsonl_sink_writes_sampled_spans(self, tmp_path):
+        """Sampled traces should be appended to the JSON-lines file with parent links."""
+        path = tmp_path / 'spans.jsonl'
+        configure_tracing(TracingConfig(sample_rate=1, sink='jsonl', file=str(path)))
+        client = create_client(CachingDataGatherer(StageGatherer()))
+
+        client.get('/gatherer/stage')
+        configure_tracing(None)
+
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+        by_name = {span['name']: span for span in spans}
+        assert set(by_name) == {'handler', 'cache', 'fetch', 'parse'}
+        assert len({span['trace_id'] for span in spans}) == 1
+        assert by_name['handler']['parent_span_id'] is None
+        assert by_name['cache']['parent_span_id'] == by_name['handler']['span_id']
+        assert by_name['fetch']['parent_span_id'] == by_name['cache']['span_id']
+        assert by_name['cache']['attributes']['result'] == 'miss'
+
+    def test_jsonl_sink_writes_off_the_request_path(self, tmp_path):
+        """Exporting a trace should only queue it, leaving the file to the sink's thread."""
+        path = tmp_path / 'spans.jsonl'
+        sink = JsonLinesSpanSink(str(path), interval=3600)
+        configure_tracing(TracingConfig())
+        with get_tracer().start_trace('handler') as trace:
+            pass
+
+        sink.export(trace)
+        written_before_close = path.exists()
+        sink.close()
+
+        assert not written_before_close
+        assert json.loads(path.read_text())['name'] == 'handler'
+
+    def test_otlp_sink_exports_to_collector(self):
+        """Sampled traces should reach an OTLP/HTTP collector as JSON resource spans."""
+        collector = Collector()
+        try:
+            configure_tracing(TracingConfig(sample_rate=1, sink='otlp', otlp_url=collector.url))
+            create_client(CachingDataGatherer(StageGatherer())).get('/gatherer/stage')
+            configure_tracing(None)
+
+            assert collector.received.wait(5)
+        finally:
+            collector.close()
+
+        resource_spans = collector.bodies[0]['resourceSpans'][0]
+        assert {'key': 'service.name', 'value': {'stringValue': 'att-modem-exporter'}} in \
+            resource_spans['resource']['attributes']
+        spans = resource_spans['scopeSpans'][0]['spans']
+        assert {span['name'] for span in spans} == {'handler', 'cache', 'fetch', 'parse'}
+
+    def test_otlp_sink_drops_when_queue_is_full(self):
+        """Traces should be dropped rather than block when the collector falls behind."""
+        sink = OtlpSpanSink('http://127.0.0.1:9/v1/traces', 'test', max_queued=1, interval=3600)
+        configure_tracing(TracingConfig())
+        try:
+            for _ in range(3):
+                with get_tracer().start_trace('handler') as trace:
+                    pass
+                sink.export(trace)
+
+            assert sink._queue.qsize() == 1
+            assert sink._dropped == 2
+        finally:
+            sink._queue.queue.clear()
+            sink.close()